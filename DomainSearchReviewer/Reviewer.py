@@ -10,15 +10,28 @@ The Reviewer component of the DomainSearch application.
 
 Messages:
 
-    ScannedDomainRequestServer -> DomainSearchReviewer: review request
+    DomainSearchReviewer -> ScannedDomainRequestServer: credit window
+
+        "request": "credit",
+        "count": 4
+
+    ScannedDomainRequestServer -> DomainSearchReviewer: review requests
 
         "response": {
-            "task": {
-                "domain": "example.com",
-                "request_id": 1
-            }
+            "tasks": [
+                {
+                    "domain": "example.com",
+                    "request_id": 1
+                },
+                ...
+            ]
         }
 
+    DomainSearchReviewer -> ScannedDomainRequestServer: tasks handled
+
+        "request": "ack",
+        "request_ids": [1, ...]
+
     ScannedDomainRequestServer -> DomainSearchReviewer: shutdown triggered
 
         "response": {
@@ -59,6 +72,9 @@ import threading
 from additional import Config
 from additional.Database import Database
 from additional.Logging import Logging
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
+from additional.Protocol import send_message
 
 from pymysql import DatabaseError
 
@@ -77,49 +93,72 @@ def start_reviewer():
 
         with socket.create_connection(scanned_domain_request_server) as sock:
 
-            while running_event.is_set():
+            reader = MessageReader(sock)
 
-                try:
+            # advertises the number of tasks the reviewer can hold, the server
+            # pushes new tasks as soon as earlier ones are acknowledged
+            send_message(sock, {
+                'request': 'credit',
+                'count': Config.task_prefetch
+            })
 
-                    # requests the server for new task
-                    sock.sendall(bytes(json.dumps({
-                        'request': 'task'
-                    }), 'UTF-8'))
+            while running_event.is_set():
 
-                    ############################################################
+                try:
 
-                    # receives the response from the server
-                    data = sock.recv(1024).decode('UTF-8').strip()
+                    # receives the next message from the server
+                    message = reader.read_message()
 
-                    if not data:
+                    if message is None:
                         raise ConnectionAbortedError
 
-                    message = json.loads(data)
-
                     ############################################################
 
                     # validates message
-                    if not 'response' in message:
-                        raise ValueError
+                    if not isinstance(message.get('response'), dict):
+                        raise MessageError(json.dumps(message))
 
                     message = message['response']
 
                     ############################################################
 
-                    if 'task' in message and 'domain' in message['task'] and \
-                        'request_id' in message['task']:
+                    if isinstance(message.get('tasks'), list):
+
+                        request_ids = []
+
+                        for task in message['tasks']:
+
+                            if not (
+                                isinstance(task, dict) and \
+                                'domain' in task and \
+                                'request_id' in task):
+
+                                log.error('Invalid task: {}'.format(task))
+
+                                continue
+
+                            domain = task['domain']
+                            domain = domain.lower().strip()
+                            request_id = task['request_id']
+
+                            request_ids.append(request_id)
+
+                            # validates task in database
+                            if not db.is_request_valid(request_id, domain):
+
+                                log.error('Invalid task: {}'.format(task))
 
-                        task = message['task']
-                        domain = task['domain']
-                        domain = domain.lower().strip()
-                        request_id = task['request_id']
+                                continue
 
-                        # validates task in database
-                        if not db.is_request_valid(request_id, domain):
-                            raise ValueError
+                            log.info(
+                                'Task received - Request ID: {} - Domain: {}'
+                                .format(request_id, domain))
 
-                        log.info('Task received - Request ID: {} - Domain: {}'
-                            .format(request_id, domain))
+                        # acknowledges the handled tasks
+                        send_message(sock, {
+                            'request': 'ack',
+                            'request_ids': request_ids
+                        })
 
                     elif 'msg' in message and message['msg'] == 'shutdown':
 
@@ -128,11 +167,11 @@ def start_reviewer():
                         running_event.clear()
 
                     else:
-                        raise ValueError
+                        raise MessageError(json.dumps(message))
 
-                except ValueError:
+                except MessageError as error:
 
-                    log.error('Invalid message: {}'.format(data))
+                    log.error('Invalid message: {}'.format(error.data))
 
                     running_event.clear()
 
@@ -142,7 +181,7 @@ def start_reviewer():
 
         clean_shutdown(1)
 
-    except ConnectionAbortedError:
+    except (ConnectionAbortedError, ConnectionResetError):
 
         log.error('Connection to server aborted')
 
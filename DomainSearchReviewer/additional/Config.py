@@ -18,12 +18,22 @@ database_connection = {
     'charset': 'utf8'
 }
 
+# parameter for the database connection pool
+database_pool = {
+    'min_size': 1,
+    'max_size': 10,
+    'health_check_interval': 30 # second(s)
+}
+
 # server to get domains to review
 scanned_domain_request_server = {
     'host': 'localhost',
     'port': 8040
 }
 
+# number of tasks held in advance
+task_prefetch = 4 # task(s)
+
 # path to the running file
 running_path = 'resources/running'
 
@@ -4,7 +4,10 @@
 The Database connection.
 """
 
+import time
 import threading
+import contextlib
+import collections
 
 import pymysql
 
@@ -12,6 +15,220 @@ from additional import Config
 
 ################################################################################
 
+class ConnectionPool:
+    """
+    This class holds a bounded pool of database connections. Every thread
+    checks out its own connection, so queries of different threads run in
+    parallel. Connections which have been idle for a while are checked for
+    health before they are handed out again.
+    """
+
+    def __init__(self, min_size, max_size, health_check_interval):
+
+        self._max_size = max(max_size, 1)
+        self._health_check_interval = health_check_interval
+
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+
+        # idle connections as (connection, time of the last release)
+        self._idle = collections.deque()
+
+        # number of open connections, idle and checked out
+        self._size = 0
+
+        for _ in range(min(min_size, self._max_size)):
+
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    ############################################################################
+
+    def _connect(self):
+        """
+        Method to open a new database connection.
+
+        @return: the connection
+        """
+
+        return pymysql.connect(**Config.database_connection)
+
+    ############################################################################
+
+    def _acquire(self):
+        """
+        Method to check out a connection. Blocks until a connection is idle if
+        the maximal size of the pool is reached.
+
+        @return: the connection
+        """
+
+        with self._condition:
+
+            while 1:
+
+                if self._closed:
+                    raise pymysql.err.InterfaceError('Connection pool closed')
+
+                if self._idle:
+
+                    connection, released = self._idle.pop()
+
+                    break
+
+                if self._size < self._max_size:
+
+                    connection = None
+                    self._size += 1
+
+                    break
+
+                self._condition.wait()
+
+        ########################################################################
+
+        try:
+
+            if connection is None:
+                connection = self._connect()
+
+            # checks the health of a connection which has been idle for a while
+            elif time.monotonic() - released > self._health_check_interval:
+                connection.ping(reconnect=True)
+
+        except pymysql.err.Error:
+
+            self._discard(connection)
+
+            raise
+
+        return connection
+
+    ############################################################################
+
+    def _release(self, connection):
+        """
+        Method to give a checked out connection back to the pool.
+
+        @param connection: the connection to release
+        """
+
+        with self._condition:
+
+            if self._closed:
+
+                self._size -= 1
+                connection.close()
+
+            else:
+                self._idle.append((connection, time.monotonic()))
+
+            self._condition.notify()
+
+    ############################################################################
+
+    def _discard(self, connection):
+        """
+        Method to drop a broken connection from the pool.
+
+        @param connection: the connection to drop
+        """
+
+        if connection is not None:
+
+            try:
+                connection.close()
+
+            except pymysql.err.Error:
+                pass
+
+        with self._condition:
+
+            self._size -= 1
+            self._condition.notify()
+
+    ############################################################################
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Method to check out a connection for the current thread. Nested
+        checkouts of the same thread share one connection.
+
+        @return: the connection
+        """
+
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+
+            yield connection
+
+            return
+
+        connection = self._acquire()
+        self._local.connection = connection
+
+        try:
+
+            yield connection
+
+        except pymysql.err.OperationalError:
+
+            self._local.connection = None
+            self._discard(connection)
+
+            raise
+
+        except BaseException:
+
+            self._local.connection = None
+
+            # resets the connection before it is used by another thread
+            try:
+                connection.rollback()
+
+            except pymysql.err.Error:
+
+                self._discard(connection)
+
+                raise
+
+            self._release(connection)
+
+            raise
+
+        self._local.connection = None
+        self._release(connection)
+
+    ############################################################################
+
+    def close(self):
+        """
+        Method to close all idle connections. Checked out connections will be
+        closed when they are released.
+        """
+
+        with self._condition:
+
+            self._closed = True
+
+            while self._idle:
+
+                connection = self._idle.pop()[0]
+                self._size -= 1
+
+                try:
+                    connection.close()
+
+                except pymysql.err.Error:
+                    pass
+
+            self._condition.notify_all()
+
+################################################################################
+
 class Database:
     """
     This class handles the connection to the database and executes queries.
@@ -22,8 +239,10 @@ class Database:
         Connects to Database with parameters from the configuration file.
         """
 
-        self._lock = threading.Lock()
-        self._connection = pymysql.connect(**Config.database_connection)
+        self._pool = ConnectionPool(
+            Config.database_pool['min_size'],
+            Config.database_pool['max_size'],
+            Config.database_pool['health_check_interval'])
 
     ############################################################################
 
@@ -32,7 +251,7 @@ class Database:
         Method to close the database connection.
         """
 
-        self._connection.close()
+        self._pool.close()
 
     ############################################################################
 
@@ -43,12 +262,12 @@ class Database:
         @param create_query: the query to create the table
         """
 
-        with self._lock:
+        with self._pool.connection() as connection:
 
-            cursor = self._connection.cursor()
+            cursor = connection.cursor()
             cursor.execute(create_query)
             cursor.close()
-            self._connection.commit()
+            connection.commit()
 
     ############################################################################
 
@@ -62,9 +281,9 @@ class Database:
         @return: last row id
         """
 
-        with self._lock:
+        with self._pool.connection() as connection:
 
-            cursor = self._connection.cursor()
+            cursor = connection.cursor()
 
             if insert_values:
                 cursor.execute(insert_query, insert_values)
@@ -75,12 +294,42 @@ class Database:
             last_row_id = cursor.lastrowid
 
             cursor.close()
-            self._connection.commit()
+            connection.commit()
 
             return last_row_id
 
     ############################################################################
 
+    def insert_many_data(self, insert_query, insert_values):
+        """
+        Method to insert multiple entries into the database by the given query
+        and list of values. All entries are sent at once and committed together.
+
+        @param insert_query:  the query to insert an entry
+        @param insert_values: a list of values for the query
+
+        @return: number of inserted rows
+        """
+
+        insert_values = list(insert_values)
+
+        if not insert_values:
+            return 0
+
+        with self._pool.connection() as connection:
+
+            cursor = connection.cursor()
+            cursor.executemany(insert_query, insert_values)
+
+            row_count = cursor.rowcount
+
+            cursor.close()
+            connection.commit()
+
+            return row_count
+
+    ############################################################################
+
     def update_data(self, update_query, update_values=None):
         """
         Method to update data in the database by the given query.
@@ -89,9 +338,9 @@ class Database:
         @param update_values: the values for the query
         """
 
-        with self._lock:
+        with self._pool.connection() as connection:
 
-            cursor = self._connection.cursor()
+            cursor = connection.cursor()
 
             if update_values:
                 cursor.execute(update_query, update_values)
@@ -100,7 +349,7 @@ class Database:
                 cursor.execute(update_query)
 
             cursor.close()
-            self._connection.commit()
+            connection.commit()
 
     ############################################################################
 
@@ -114,9 +363,9 @@ class Database:
         @return: the selected entries
         """
 
-        with self._lock:
+        with self._pool.connection() as connection:
 
-            cursor = self._connection.cursor()
+            cursor = connection.cursor()
 
             if select_values:
                 cursor.execute(select_query, select_values)
@@ -130,7 +379,7 @@ class Database:
                 result.append(line)
 
             cursor.close()
-            self._connection.commit()
+            connection.commit()
 
             return result
 
@@ -154,3 +403,33 @@ class Database:
             AND requests.id = %s'''
 
         return self.select_data(query, (domain, request_id))
+
+    ############################################################################
+
+    def get_valid_requests(self, entries):
+        """
+        Method to check with a single query which of the given requests exist.
+
+        @param entries: list of (request_id, domain)
+
+        @result: set of the valid (request_id, domain)
+        """
+
+        entries = list(entries)
+
+        if not entries:
+            return set()
+
+        query = '''
+            SELECT requests.id, domains.name
+            FROM domains, requests
+            WHERE domains.id = requests.domain_id
+            AND (requests.id, domains.name) IN ({})'''.format(
+                ', '.join(['(%s, %s)'] * len(entries)))
+
+        values = []
+
+        for request_id, domain in entries:
+            values.extend((request_id, domain))
+
+        return set(tuple(row) for row in self.select_data(query, values))
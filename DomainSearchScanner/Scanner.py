@@ -10,19 +10,28 @@ The Scanner component of the DomainSearch application.
 
 Messages:
 
-    DomainSearchScanner -> QueuedDomainRequestServer:
+    DomainSearchScanner -> QueuedDomainRequestServer: credit window
 
-        "request": "task"
+        "request": "credit",
+        "count": 8
 
-    QueuedDomainRequestServer -> DomainSearchScanner: scan request
+    QueuedDomainRequestServer -> DomainSearchScanner: scan requests
 
         "response": {
-            "task": {
-                "domain": "example.com",
-                "request_id": 1
-            }
+            "tasks": [
+                {
+                    "domain": "example.com",
+                    "request_id": 1
+                },
+                ...
+            ]
         }
 
+    DomainSearchScanner -> QueuedDomainRequestServer: tasks handled
+
+        "request": "ack",
+        "request_ids": [1, ...]
+
     QueuedDomainRequestServer -> DomainSearchScanner: shutdown triggered
 
         "response": {
@@ -35,16 +44,25 @@ Messages:
 import os
 import sys
 import json
-import queue
+import select
 import signal
 import socket
 import threading
 
 from additional import Config
 from additional.Logging import Logging
+from additional.Metrics import Metrics
 from additional.Database import Database
 from additional.Scheduler import Scheduler
 from additional.Watchdog import Watchdog
+from additional.Watchdog import encode_task
+from additional.Watchdog import decode_task
+from additional.PersistentQueue import PersistentQueue
+from additional.StatsServer import StatsServer
+from additional.StatsServer import StatsHandler
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
+from additional.Protocol import send_message
 
 from pymysql import DatabaseError
 from additional.Scheduler import DependencyError
@@ -53,6 +71,150 @@ from additional.Scheduler import SubClassError
 
 ################################################################################
 
+def start_scan(sock, request_id, domain):
+    """
+    Method to scan a domain in its own thread as soon as a scan slot is free.
+
+    @param sock:       the connection to the server
+    @param request_id: the request id of the current request
+    @param domain:     the domain to scan
+    """
+
+    def run():
+
+        # waits for a free scan slot, the server adds the task back to the
+        # queue if the scanner shuts down before
+        if not acquire_scan_slot():
+            return
+
+        try:
+            scheduler.start_modules(request_id, domain)
+
+        finally:
+
+            # frees the scan slot for the next task
+            scan_slots.release()
+
+            acknowledge_tasks(sock, [request_id])
+
+    thread = threading.Thread(target=run)
+    thread.start()
+
+    with scan_threads_lock:
+
+        # forgets finished scans
+        for finished_thread in [t for t in scan_threads if not t.is_alive()]:
+            scan_threads.remove(finished_thread)
+
+        scan_threads.append(thread)
+
+################################################################################
+
+def join_scan_threads():
+    """
+    Method to wait until all running scans are finished.
+    """
+
+    with scan_threads_lock:
+        threads = list(scan_threads)
+
+    for thread in threads:
+        thread.join()
+
+################################################################################
+
+def acquire_scan_slot():
+    """
+    Method to wait for a free scan slot.
+
+    @return: True if a slot was acquired, False if the scanner shuts down
+    """
+
+    while running_event.is_set():
+
+        if scan_slots.acquire(timeout=1):
+            return True
+
+    return False
+
+################################################################################
+
+def acknowledge_tasks(sock, request_ids, rejected=False):
+    """
+    Method to inform the server that tasks have been handled.
+
+    @param sock:        the connection to the server
+    @param request_ids: the request ids of the handled tasks
+    @param rejected:    True if the tasks have been rejected without a scan,
+                        False otherwise
+    """
+
+    message = {
+        'request': 'ack',
+        'request_ids': request_ids
+    }
+
+    if rejected:
+        message['rejected'] = True
+
+    try:
+
+        with send_lock:
+            send_message(sock, message)
+
+    except OSError:
+
+        log.error('Acknowledgement failed - Request IDs: {}'
+            .format(request_ids))
+
+################################################################################
+
+def start_tasks(sock, tasks):
+    """
+    Method to validate received tasks and to start a scan for each of them.
+
+    @param sock:  the connection to the server
+    @param tasks: the list of received tasks
+    """
+
+    # request ids of invalid tasks, which will not be scanned
+    rejected_ids = []
+
+    for task in tasks:
+
+        if not (
+            isinstance(task, dict) and \
+            'domain' in task and \
+            'request_id' in task):
+
+            log.error('Invalid task: {}'.format(task))
+
+            continue
+
+        domain = task['domain']
+        domain = domain.lower().strip()
+        request_id = task['request_id']
+
+        # validates task in database
+        if not db.is_request_valid(request_id, domain):
+
+            log.error('Invalid task: {}'.format(task))
+
+            rejected_ids.append(request_id)
+
+            continue
+
+        log.info('Task received - Request ID: {} - Domain: {}'
+            .format(request_id, domain))
+
+        # scheduler starts processing in its own thread
+        start_scan(sock, request_id, domain)
+
+    if rejected_ids:
+        acknowledge_tasks(sock, rejected_ids, rejected=True)
+
+################################################################################
+
 def start_scanner():
     """
     Method to start the scanner.
@@ -66,80 +228,71 @@ def start_scanner():
 
         with socket.create_connection(queued_domain_request_server) as sock:
 
+            reader = MessageReader(sock)
+
+            # advertises the number of tasks the scanner can hold, the server
+            # pushes new tasks as soon as earlier ones are acknowledged
+            with send_lock:
+
+                send_message(sock, {
+                    'request': 'credit',
+                    'count': Config.max_concurrent_scans + Config.task_prefetch
+                })
+
             while running_event.is_set():
 
                 try:
 
-                    # requests the server for new task
-                    sock.sendall(bytes(json.dumps({
-                        'request': 'task'
-                    }), 'UTF-8'))
+                    message = reader.parse_message()
 
-                    ############################################################
+                    # waits for further messages from the server
+                    if message is None:
 
-                    # receives the response from the server
-                    data = sock.recv(1024).decode('UTF-8').strip()
+                        readable = select.select([sock], [], [], 1)[0]
 
-                    if not data:
-                        raise ConnectionAbortedError
+                        if readable and not reader.receive():
+                            raise ConnectionAbortedError
 
-                    message = json.loads(data)
+                        continue
 
                     ############################################################
 
                     # validates message
-                    if not 'response' in message:
-                        raise ValueError
+                    if not isinstance(message.get('response'), dict):
+                        raise MessageError(json.dumps(message))
 
                     message = message['response']
 
                     ############################################################
 
-                    if 'task' in message and 'domain' in message['task'] and \
-                        'request_id' in message['task']:
-
-                        task = message['task']
-                        domain = task['domain']
-                        domain = domain.lower().strip()
-                        request_id = task['request_id']
-
-                        # validates task in database
-                        if not db.is_request_valid(request_id, domain):
-                            raise ValueError
+                    if isinstance(message.get('tasks'), list):
+                        start_tasks(sock, message['tasks'])
 
-                        log.info('Task received - Request ID: {} - Domain: {}'
-                            .format(request_id, domain))
-
-                        # scheduler startes processing
-                        scheduler_event.clear()
-
-                        scheduler.start_modules(request_id, domain)
-
-                        # scheduler finished processing
-                        scheduler_event.set()
-
-                    elif 'msg' in message and message['msg'] == 'shutdown':
+                    elif message.get('msg') == 'shutdown':
 
                         log.info('Server is shutting down')
 
                         running_event.clear()
 
                     else:
-                        raise ValueError
+                        raise MessageError(json.dumps(message))
 
-                except ValueError:
+                except MessageError as error:
 
-                    log.error('Invalid message: {}'.format(data))
+                    log.error('Invalid message: {}'.format(error.data))
 
                     running_event.clear()
 
+            # acknowledges the running scans before the connection is closed
+            join_scan_threads()
+
     except ConnectionRefusedError:
 
         log.error('Connection to server refused')
 
         clean_shutdown(1)
 
-    except ConnectionAbortedError:
+    except (ConnectionAbortedError, ConnectionResetError):
 
         log.error('Connection to server aborted')
 
@@ -159,8 +312,9 @@ def clean_shutdown(exit_code):
 
     ############################################################################
 
-    # waits until scheduler finished processing
-    scheduler_event.wait()
+    # waits until all running scans are finished
+    if 'scan_threads' in globals():
+        join_scan_threads()
 
     ############################################################################
 
@@ -168,6 +322,31 @@ def clean_shutdown(exit_code):
     if 'watchdog' in globals():
         watchdog.join()
 
+    # closes the journal of the rerun queue
+    if 'rerun_queue' in globals():
+        rerun_queue.close()
+
+    ############################################################################
+
+    # stops the worker threads of the scheduler
+    if 'scheduler' in globals():
+        scheduler.shutdown()
+
+    ############################################################################
+
+    # stops serving the metrics and writes them to disk
+
+    if 'stats_server' in globals():
+
+        stats_server.shutdown()
+        stats_server.server_close()
+
+    if 'metrics' in globals():
+
+        metrics.stop()
+
+        dump_metrics()
+
     ############################################################################
 
     # closes the databse connection
@@ -188,6 +367,28 @@ def clean_shutdown(exit_code):
 
 ################################################################################
 
+def dump_metrics():
+    """
+    Method to write the collected metrics to the metrics file.
+    """
+
+    try:
+
+        with open(Config.metrics_dump_path, 'w', encoding='utf-8') as \
+            metrics_file:
+
+            json.dump(metrics.get_stats(), metrics_file, indent=4)
+
+    except OSError as e:
+
+        log.error('Writing the metrics failed: {}'.format(e))
+
+        return
+
+    log.info('Metrics written to {}'.format(Config.metrics_dump_path))
+
+################################################################################
+
 def validate_configuration():
     """
     Method to validate the configuration file.
@@ -237,9 +438,15 @@ if __name__ == '__main__':
     running_event = threading.Event()
     running_event.set()
 
-    # scheduler event will be set if the scheduler finished processing
-    scheduler_event = threading.Event()
-    scheduler_event.set()
+    # limits the number of domains scanned at once
+    scan_slots = threading.BoundedSemaphore(Config.max_concurrent_scans)
+
+    # list of threads running a scan
+    scan_threads = []
+    scan_threads_lock = threading.Lock()
+
+    # serialises the messages sent to the server by the scan threads
+    send_lock = threading.Lock()
 
     # forwards interrupt signal to application
     signal.signal(signal.SIGINT, signal_handler)
@@ -293,15 +500,22 @@ if __name__ == '__main__':
 
     ############################################################################
 
-    # queue for rerun failed modules and modules depending on them
-    rerun_queue = queue.Queue()
+    # queue for rerun failed modules and modules depending on them, restored
+    # from its journal
+    rerun_queue = PersistentQueue(Config.rerun_queue_journal_path,
+        encode_task, decode_task)
+
+    ############################################################################
+
+    # collects the run times and outcomes of the modules
+    metrics = Metrics()
 
     ############################################################################
 
     # initialises the scheduler to communicate with the modules
 
     try:
-        scheduler = Scheduler(db, rerun_queue)
+        scheduler = Scheduler(db, rerun_queue, metrics)
 
     except (DependencyError, VersionError, SubClassError, DatabaseError) as e:
 
@@ -314,6 +528,24 @@ if __name__ == '__main__':
 
     ############################################################################
 
+    # samples the rerun queue and serves the metrics
+
+    metrics.add_gauge('rerun_queue', rerun_queue.qsize)
+
+    metrics.start()
+
+    stats_server = StatsServer((
+        Config.stats_server['host'],
+        Config.stats_server['port']),
+        StatsHandler,
+        (metrics,))
+
+    stats_server_thread = threading.Thread(target=stats_server.serve_forever)
+    stats_server_thread.daemon = True
+    stats_server_thread.start()
+
+    ############################################################################
+
     # initialises and starts the watchdog to check the rerun_queue for new tasks
 
     watchdog = Watchdog(scheduler, db, running_event, rerun_queue)
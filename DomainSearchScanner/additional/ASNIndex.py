@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+
+"""
+The ASNIndex maps ip addresses to their Autonomous System Number (ASN).
+"""
+
+"""
+################################################################################
+
+Index file structur:
+
+    header = (magic, byte order, interval count, name count, string size)
+
+        magic = b'ASNI' followed by the format version
+        byte order = 0x01020304 written in the native byte order
+
+    starts = interval count * uint32, first address of every interval
+    ends = interval count * uint32, last address of every interval
+    asns = interval count * uint32, ASN of every interval
+    name_asns = name count * uint32, ASNs with a name in ascending order
+    name_offsets = (name count + 1) * uint32, offsets into the string table
+    strings = string size bytes, the UTF-8 encoded names
+
+    The intervals are sorted and do not overlap. Every address of an interval
+    belongs to the most specific prefix of the data-raw-table containing it.
+
+################################################################################
+"""
+
+import os
+import mmap
+import time
+import array
+import bisect
+import socket
+import struct
+import threading
+
+from additional.Logging import Logging
+
+################################################################################
+
+# identifies the format of the index file
+MAGIC = b'ASNI0001'
+
+# detects index files of another byte order
+BYTE_ORDER = 0x01020304
+
+HEADER = struct.Struct('=8sIIII')
+
+################################################################################
+
+class ASNIndex:
+    """
+    This class compiles the prefixes of the data-raw-table into sorted,
+    disjoint address intervals, so the ASN of an address is found by binary
+    search. The compiled index is a file of packed arrays which is mapped into
+    memory, so all scanner processes share its pages. The index is rebuilt if
+    a source file is newer and swapped without a restart as soon as another
+    index file appears. An existing index stays in use if a source file is
+    missing or can not be compiled.
+    """
+
+    def __init__(self, data_raw_table_path, data_used_autnums_path, index_path,
+        reload_interval):
+        """
+        Loads the index and builds it first if it is missing or outdated.
+
+        @param data_raw_table_path:    path to the prefixes and their ASN
+        @param data_used_autnums_path: path to the ASNs and their names
+        @param index_path:             path to the compiled index
+        @param reload_interval:        the time between two checks for changes
+        """
+
+        self._data_raw_table_path = data_raw_table_path
+        self._data_used_autnums_path = data_used_autnums_path
+        self._index_path = index_path
+        self._reload_interval = reload_interval
+
+        self._reload_lock = threading.Lock()
+        self._checked = time.monotonic()
+
+        self._table = None
+        self._table_identity = None
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+        self._reload()
+
+    ############################################################################
+
+    def lookup(self, ip):
+        """
+        Method to get the ASN and its name of an ip address.
+
+        @param ip: the IPv4 address
+
+        @return: (asn, name) or None if the address is not announced; the name
+                 is None if the ASN is unknown
+        """
+
+        if time.monotonic() - self._checked > self._reload_interval:
+
+            # only one thread checks, the others use the current table
+            if self._reload_lock.acquire(blocking=False):
+
+                try:
+                    self._reload()
+
+                except (OSError, ValueError) as e:
+                    self._log.error('ASN index not reloaded: {}'.format(e))
+
+                finally:
+
+                    self._checked = time.monotonic()
+                    self._reload_lock.release()
+
+        return self._table.lookup(_to_int(ip))
+
+    ############################################################################
+
+    def __len__(self):
+
+        return len(self._table)
+
+    ############################################################################
+
+    def _reload(self):
+        """
+        Method to build the index file if a source file is newer and to map a
+        changed index file.
+        """
+
+        if self._is_outdated():
+
+            try:
+
+                build_index(self._data_raw_table_path,
+                    self._data_used_autnums_path, self._index_path)
+
+            except (OSError, ValueError) as e:
+
+                # keeps the existing index if a source file is broken
+                if not os.path.isfile(self._index_path):
+                    raise
+
+                self._log.error('ASN index not rebuilt, using {}: {}'
+                    .format(self._index_path, e))
+
+        stat = os.stat(self._index_path)
+        identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+        if identity != self._table_identity:
+
+            # a single assignment, so running lookups keep the old table
+            self._table = _Table(self._index_path)
+            self._table_identity = identity
+
+    ############################################################################
+
+    def _is_outdated(self):
+        """
+        Method to check if the index file is missing or older than a source.
+        Missing source files do not outdate an existing index.
+
+        @return: True if the index has to be built, False otherwise
+        """
+
+        try:
+            index_time = os.stat(self._index_path).st_mtime_ns
+
+        except FileNotFoundError:
+            return True
+
+        for path in (self._data_raw_table_path, self._data_used_autnums_path):
+
+            try:
+
+                if os.stat(path).st_mtime_ns > index_time:
+                    return True
+
+            except FileNotFoundError:
+                continue
+
+        return False
+
+################################################################################
+
+class _Table:
+    """
+    This class reads the arrays of a mapped index file without copying them.
+    """
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as file:
+
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, byte_order, count, name_count, string_size = \
+            HEADER.unpack_from(self._mmap)
+
+        if magic != MAGIC or byte_order != BYTE_ORDER or \
+            len(self._mmap) != HEADER.size + \
+            (3 * count + 2 * name_count + 1) * 4 + string_size:
+
+            raise OSError('Invalid ASN index: {}'.format(path))
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take(size):
+
+            nonlocal offset
+
+            part = view[offset:offset + size]
+            offset += size
+
+            return part
+
+        self._starts = take(count * 4).cast('I')
+        self._ends = take(count * 4).cast('I')
+        self._asns = take(count * 4).cast('I')
+        self._name_asns = take(name_count * 4).cast('I')
+        self._name_offsets = take((name_count + 1) * 4).cast('I')
+        self._strings = take(string_size)
+
+    ############################################################################
+
+    def lookup(self, address):
+        """
+        Method to get the ASN and its name of an address.
+
+        @param address: the IPv4 address as integer
+
+        @return: (asn, name) or None if the address is not announced
+        """
+
+        index = bisect.bisect_right(self._starts, address) - 1
+
+        if index < 0 or self._ends[index] < address:
+            return None
+
+        asn = self._asns[index]
+
+        return asn, self._get_name(asn)
+
+    ############################################################################
+
+    def _get_name(self, asn):
+        """
+        Method to get the name of an ASN.
+
+        @param asn: the ASN
+
+        @return: the name or None if the ASN is unknown
+        """
+
+        index = bisect.bisect_left(self._name_asns, asn)
+
+        if index == len(self._name_asns) or self._name_asns[index] != asn:
+            return None
+
+        return bytes(self._strings[
+            self._name_offsets[index]:self._name_offsets[index + 1]]) \
+            .decode('utf-8')
+
+    ############################################################################
+
+    def __len__(self):
+
+        return len(self._starts)
+
+################################################################################
+
+def build_index(data_raw_table_path, data_used_autnums_path, index_path):
+    """
+    Method to compile the APNIC files into an index file. The file is replaced
+    atomically, so scanners never map a partially written index.
+
+    @param data_raw_table_path:    path to the prefixes and their ASN
+    @param data_used_autnums_path: path to the ASNs and their names
+    @param index_path:             path to the compiled index
+    """
+
+    starts, ends, asns = _compile_prefixes(data_raw_table_path)
+    names = _read_names(data_used_autnums_path)
+
+    name_asns = array.array('I', sorted(names))
+    name_offsets = array.array('I', [0])
+    strings = bytearray()
+
+    for asn in name_asns:
+
+        strings += names[asn].encode('utf-8')
+        name_offsets.append(len(strings))
+
+    ############################################################################
+
+    # every process writes its own file, the last replacement wins
+    temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+
+    try:
+
+        with open(temp_path, 'wb') as file:
+
+            file.write(HEADER.pack(MAGIC, BYTE_ORDER, len(starts),
+                len(name_asns), len(strings)))
+
+            for part in (starts, ends, asns, name_asns, name_offsets):
+                file.write(part.tobytes())
+
+            file.write(strings)
+
+        os.replace(temp_path, index_path)
+
+    finally:
+
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+################################################################################
+
+def _to_int(ip):
+    """
+    Method to convert an IPv4 address to an integer.
+
+    @param ip: the IPv4 address
+
+    @return: the address as integer
+    """
+
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+################################################################################
+
+def _compile_prefixes(path):
+    """
+    Method to compile the prefixes of the data-raw-table into disjoint
+    intervals. Nested prefixes split the intervals of the enclosing prefixes.
+
+    @param path: the path of the data-raw-table
+
+    @return: (starts, ends, asns)
+    """
+
+    prefixes = []
+
+    with open(path, 'r', encoding='utf-8') as file:
+
+        for line in file:
+
+            try:
+
+                prefix, asn = line.strip().split('\t')[:2]
+                network, length = prefix.split('/')
+
+                length = int(length)
+                start = _to_int(network) & (0xffffffff << (32 - length))
+
+                prefixes.append(
+                    (start, start + (1 << (32 - length)) - 1, int(asn)))
+
+            except (ValueError, OSError):
+                continue
+
+    # enclosing prefixes first, equal prefixes in the order of the file
+    prefixes.sort(key=lambda prefix: (prefix[0], -prefix[1]))
+
+    ############################################################################
+
+    starts = array.array('I')
+    ends = array.array('I')
+    asns = array.array('I')
+
+    def add(start, end, asn):
+
+        if start <= end:
+
+            starts.append(start)
+            ends.append(end)
+            asns.append(asn)
+
+    # the enclosing prefixes of the current position
+    stack = []
+    position = 0
+
+    for start, end, asn in prefixes:
+
+        # closes the prefixes ending before this one
+        while stack and stack[-1][0] < start:
+
+            outer_end, outer_asn = stack.pop()
+
+            add(position, outer_end, outer_asn)
+            position = max(position, outer_end + 1)
+
+        # the enclosing prefix up to this one
+        if stack:
+            add(position, start - 1, stack[-1][1])
+
+        position = start
+
+        stack.append((end, asn))
+
+    while stack:
+
+        outer_end, outer_asn = stack.pop()
+
+        add(position, outer_end, outer_asn)
+        position = max(position, outer_end + 1)
+
+    return starts, ends, asns
+
+################################################################################
+
+def _read_names(path):
+    """
+    Method to read the names of the ASNs.
+
+    @param path: the path of the data-used-autnums
+
+    @return: dictionary of the names by ASN
+    """
+
+    names = {}
+
+    with open(path, 'r', encoding='utf-8') as file:
+
+        for line in file:
+
+            line = line.strip().split(' ', maxsplit=1)
+
+            if len(line) == 2 and line[0].isdigit() and \
+                int(line[0]) <= 0xffffffff:
+
+                names[int(line[0])] = line[1]
+
+    return names
@@ -18,6 +18,13 @@ database_connection = {
     'charset': 'utf8'
 }
 
+# parameter for the database connection pool
+database_pool = {
+    'min_size': 1,
+    'max_size': 10,
+    'health_check_interval': 30 # second(s)
+}
+
 # server to get domains to scan
 queued_domain_request_server = {
     'host': 'localhost',
@@ -33,9 +40,70 @@ task_notification_server = {
 # path to the running file
 running_path = 'resources/running'
 
-# path to the rerun-queue backup file
+# maximal number of domains scanned at once
+max_concurrent_scans = 4 # domain(s)
+
+# number of tasks held in advance besides the running scans
+task_prefetch = 4 # task(s)
+
+# number of worker threads running the modules of all scans
+max_module_workers = 32 # thread(s)
+
+# path to the rerun-queue journal
+rerun_queue_journal_path = 'resources/rerun_queue_journal'
+
+# path to the rerun-queue backup file of earlier versions
 rerun_queue_backup_path = 'resources/rerun_queue_backup'
 
+# number of backup entries validated with a single query
+backup_restore_chunk_size = 1000 # entries
+
+# number of journal records before outdated records are removed
+queue_journal_compaction_threshold = 100000 # record(s)
+
+# writes every journal record to disk before it is confirmed
+# True:  queued tasks survive a crash of the operating system
+# False: queued tasks survive a crash of the scanner, the records written
+#        during the last seconds before a crash of the operating system or a
+#        power failure may be lost, as they are still in the page cache
+queue_journal_sync = False
+
+# address and port of the stats server, serving the metrics over HTTP
+# the default host only accepts connections of the local machine
+stats_server = {
+    'host': 'localhost',
+    'port': 8060
+}
+
+# upper bounds of the buckets of the module run times
+metrics_latency_buckets = [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120] # second(s)
+
+# number of recent samples to calculate the latency percentiles
+metrics_latency_samples = 1000 # sample(s)
+
+# time between two samples of the queue depths
+metrics_gauge_interval = 5 # second(s)
+
+# number of samples of the queue depths kept as history
+metrics_gauge_history = 720 # sample(s)
+
+# path to the metrics written on shutdown
+metrics_dump_path = 'resources/metrics.json'
+
+# maximal number of DNS answers cached for all modules
+dns_cache_size = 10000 # answer(s)
+
+# maximal time to cache a DNS answer, regardless of its time to live
+dns_cache_max_ttl = 3600 # second(s)
+
+# time to cache a negative DNS answer (unknown domain or no record)
+dns_cache_negative_ttl = 300 # second(s)
+
+# time to cache the addresses of the system resolver, the fallback for names
+# without an address in DNS (e.g. in /etc/hosts), which does not return the
+# time to live of the records
+dns_cache_address_ttl = 300 # second(s)
+
 # set of modules that won't run
 norun = {
     'MXToolbox',
@@ -62,9 +130,17 @@ rerun_thresholds = [1, 5, 10, 30, 60] # minutes
 
 modules = {
 
+    'ASN': {
+        'data_raw_table_path': 'resources/data-raw-table',
+        'data_used_autnums_path': 'resources/data-used-autnums',
+        'index_path': 'resources/asn-index',
+        'reload_interval': 60 # seconds
+    },
+
     'DNSResolver': {
         'nameserver': '8.8.8.8',
         'max_recursions': 5,
+        'max_threads': 16
     },
 
     'GoogleSafeBrowsing': {
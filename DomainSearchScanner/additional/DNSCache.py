@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+The DNSCache holds the DNS answers resolved by the modules of the scanner.
+"""
+
+"""
+################################################################################
+
+Cache structur:
+
+    entry = (value, expires)
+
+        value = the answer or None for a negative answer
+        expires = float
+
+    flight = [done, value, error]
+
+        done = bool
+        value = the answer or None for a negative answer
+        error = the exception of the resolve function or None
+
+    Concurrent lookups of the same key wait for the flight of the first one
+    instead of resolving the key again.
+
+################################################################################
+"""
+
+import time
+import threading
+import collections
+
+from additional import Config
+
+################################################################################
+
+class DNSCache:
+    """
+    This class is a bounded cache of DNS answers shared by all modules. Every
+    answer expires after its time to live, negative answers after the time to
+    live of negative answers at most. Concurrent lookups of the same key are
+    coalesced, so a key is resolved only once.
+    """
+
+    def __init__(self, size=None, negative_ttl=None, max_ttl=None):
+        """
+        @param size:         the maximal number of cached answers
+        @param negative_ttl: the maximal time to live of negative answers
+        @param max_ttl:      the maximal time to live of all answers
+        """
+
+        self._size = size if size is not None else Config.dns_cache_size
+        self._negative_ttl = negative_ttl if negative_ttl is not None \
+            else Config.dns_cache_negative_ttl
+        self._max_ttl = max_ttl if max_ttl is not None \
+            else Config.dns_cache_max_ttl
+
+        self._condition = threading.Condition()
+        self._entries = collections.OrderedDict()
+
+        # flights of the keys being resolved right now
+        self._flights = {}
+
+    ############################################################################
+
+    def lookup(self, key, resolve):
+        """
+        Method to get the cached answer of a key or to resolve it. Exceptions
+        of the resolve function are raised to the waiting callers as well, but
+        are not cached.
+
+        @param key:     the key of the answer, e.g. (name, record type)
+        @param resolve: function returning (value, ttl), value is None for a
+                        negative answer
+
+        @return: the answer or None for a negative answer
+        """
+
+        with self._condition:
+
+            entry = self._entries.get(key)
+
+            if entry is not None:
+
+                if time.monotonic() < entry[1]:
+
+                    self._entries.move_to_end(key)
+
+                    return entry[0]
+
+                del self._entries[key]
+
+            flight = self._flights.get(key)
+
+            # waits for the lookup of another thread
+            if flight is not None:
+
+                self._condition.wait_for(lambda: flight[0])
+
+                if flight[2] is not None:
+                    raise flight[2]
+
+                return flight[1]
+
+            flight = [False, None, None]
+            self._flights[key] = flight
+
+        ########################################################################
+
+        try:
+            value, ttl = resolve()
+
+        except Exception as e:
+
+            with self._condition:
+
+                flight[0] = True
+                flight[2] = e
+
+                del self._flights[key]
+                self._condition.notify_all()
+
+            raise
+
+        ########################################################################
+
+        with self._condition:
+
+            flight[0] = True
+            flight[1] = value
+
+            del self._flights[key]
+
+            self._insert(key, value, ttl)
+
+            self._condition.notify_all()
+
+        return value
+
+    ############################################################################
+
+    def store(self, key, value, ttl):
+        """
+        Method to add an answer which has been resolved as part of another
+        answer, e.g. the addresses of a domain found by a module.
+
+        @param key:   the key of the answer
+        @param value: the answer or None for a negative answer
+        @param ttl:   the time to live of the answer
+        """
+
+        with self._condition:
+            self._insert(key, value, ttl)
+
+    ############################################################################
+
+    def _insert(self, key, value, ttl):
+        """
+        Method to cache an answer. The lock has to be held.
+
+        @param key:   the key of the answer
+        @param value: the answer or None for a negative answer
+        @param ttl:   the time to live of the answer
+        """
+
+        ttl = min(ttl, self._max_ttl)
+
+        if value is None:
+            ttl = min(ttl, self._negative_ttl)
+
+        if ttl <= 0 or self._size <= 0:
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+
+        # evicts the least recently used answers
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    ############################################################################
+
+    def clear(self):
+        """
+        Method to remove all answers from the cache.
+        """
+
+        with self._condition:
+            self._entries.clear()
+
+    ############################################################################
+
+    def __len__(self):
+
+        with self._condition:
+            return len(self._entries)
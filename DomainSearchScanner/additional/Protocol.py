@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+The Protocol frames the messages exchanged between the components.
+"""
+
+"""
+################################################################################
+
+Framing:
+
+    Every message is a JSON object terminated by a newline. Several messages
+    may be sent at once and a message may be spread over several packets.
+
+        {"request": "task", "count": 4}\n
+
+    Messages without a terminating newline are accepted as well, as long as
+    they form a complete JSON object.
+
+################################################################################
+"""
+
+import json
+
+################################################################################
+
+# maximal size of a single message
+MAX_MESSAGE_SIZE = 1048576 # bytes
+
+# number of bytes to receive at once
+RECEIVE_SIZE = 4096 # bytes
+
+################################################################################
+
+def send_message(sock, message):
+    """
+    Method to send a framed message.
+
+    @param sock:    the socket to send the message
+    @param message: the message to send
+    """
+
+    sock.sendall(encode_message(message))
+
+################################################################################
+
+def encode_message(message):
+    """
+    Method to frame a message.
+
+    @param message: the message to frame
+
+    @return: the framed message as bytes
+    """
+
+    return bytes(json.dumps(message) + '\n', 'UTF-8')
+
+################################################################################
+
+class MessageReader:
+    """
+    This class reads framed messages from a socket.
+    """
+
+    def __init__(self, sock):
+
+        self._sock = sock
+        self._buffer = b''
+        self._decoder = json.JSONDecoder()
+
+    ############################################################################
+
+    def read_message(self):
+        """
+        Method to read the next message. Blocks until a complete message has
+        been received.
+
+        @return: the message or None if the connection has been closed
+        """
+
+        while 1:
+
+            message = self.parse_message()
+
+            if message is not None:
+                return message
+
+            if not self.receive():
+                return None
+
+    ############################################################################
+
+    def receive(self):
+        """
+        Method to receive available data from the socket. Blocks until data
+        has been received.
+
+        @return: False if the connection has been closed, True otherwise
+        """
+
+        data = self._sock.recv(RECEIVE_SIZE)
+
+        if not data:
+
+            # rejects a truncated message
+            if self._buffer.strip():
+                raise MessageError(self._buffer)
+
+            return False
+
+        self.feed(data)
+
+        return True
+
+    ############################################################################
+
+    def feed(self, data):
+        """
+        Method to append received data to the buffer.
+
+        @param data: the received bytes
+        """
+
+        self._buffer += data
+
+        if len(self._buffer) > MAX_MESSAGE_SIZE and b'\n' not in self._buffer:
+            raise MessageError(self._buffer[:1024])
+
+    ############################################################################
+
+    def parse_message(self):
+        """
+        Method to take the next complete message from the buffer.
+
+        @return: the message or None if no complete message is buffered
+        """
+
+        while 1:
+
+            index = self._buffer.find(b'\n')
+
+            if index < 0:
+                break
+
+            line = self._buffer[:index]
+            self._buffer = self._buffer[index + 1:]
+
+            if line.strip():
+                return self._decode(line)
+
+        ########################################################################
+
+        # accepts a complete message without a terminating newline
+
+        try:
+            data = self._buffer.decode('UTF-8').lstrip()
+
+        except UnicodeDecodeError:
+            return None
+
+        if not data:
+            return None
+
+        try:
+            message, end = self._decoder.raw_decode(data)
+
+        except ValueError:
+            return None
+
+        self._buffer = data[end:].encode('UTF-8')
+
+        return self._validate(message, data[:end])
+
+    ############################################################################
+
+    def _decode(self, line):
+        """
+        Method to decode a single line.
+
+        @param line: the line as bytes
+
+        @return: the message
+        """
+
+        try:
+            data = line.decode('UTF-8').strip()
+            message = json.loads(data)
+
+        except ValueError:
+            raise MessageError(line)
+
+        return self._validate(message, data)
+
+    ############################################################################
+
+    def _validate(self, message, data):
+        """
+        Method to make sure a message is a JSON object.
+
+        @param message: the decoded message
+        @param data:    the raw message
+
+        @return: the message
+        """
+
+        if not isinstance(message, dict):
+            raise MessageError(data)
+
+        return message
+
+################################################################################
+
+class MessageError(ValueError):
+    """
+    Exception for invalid messages. The attribute data holds the raw message.
+    """
+
+    def __init__(self, data):
+
+        ValueError.__init__(self, 'Invalid message')
+
+        if isinstance(data, bytes):
+            data = data.decode('UTF-8', 'replace')
+
+        self.data = data
@@ -37,15 +37,17 @@ Queue structur:
 """
 
 import time
-import json
 import socket
 import threading
+import concurrent.futures
 from datetime import datetime
 from importlib import import_module
 
 import modules
 from additional import Config
 from additional.Logging import Logging
+from additional.DNSCache import DNSCache
+from additional.Protocol import send_message
 
 ################################################################################
 
@@ -55,14 +57,17 @@ class Scheduler():
     takes care of the module's dependencies and versions and runs the modules.
     """
 
-    # dictonary of instantiated modules
-    _instantiated_modules = {}
-
-    def __init__(self, db, rerun_queue):
+    def __init__(self, db, rerun_queue, metrics=None):
 
         self._db = db
+        self._metrics = metrics
+
+        # dictonary of instantiated modules
+        self._instantiated_modules = {}
+
+        # DNS answers shared by the modules of all scans
+        self._dns_cache = DNSCache()
 
-        self._lock = threading.Lock()
         self._rerun_queue = rerun_queue
         self._log = Logging(self.__class__.__name__).get_logger()
 
@@ -71,8 +76,24 @@ class Scheduler():
         self._instantiate_modules()
         self._create_module_tables()
         self._check_module_dependencies()
+        self._sort_modules()
         self._check_module_versions()
 
+        ########################################################################
+
+        # long-living worker threads running the modules of all scans
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=Config.max_module_workers)
+
+    ############################################################################
+
+    def shutdown(self):
+        """
+        Method to stop the worker threads after all started modules finished.
+        """
+
+        self._executor.shutdown(wait=True)
+
     ############################################################################
 
     def _instantiate_modules(self):
@@ -104,6 +125,11 @@ class Scheduler():
                     'Modul is not an instance of DatasourceBase: {}'
                     .format(module.__class__.__name__))
 
+            if self._metrics:
+                module.set_metrics(self._metrics)
+
+            module.set_dns_cache(self._dns_cache)
+
             # adds the module to the list of instantieated modules
             self._instantiated_modules[module.__class__.__name__] = module
 
@@ -197,6 +223,46 @@ class Scheduler():
 
     ############################################################################
 
+    def _sort_modules(self):
+        """
+        Method to compute the order of execution of the modules once.
+        Modules appear after all modules they depend on.
+        """
+
+        # dictionary of modules depending on a module
+        self._dependents = {name: set() for name in self._instantiated_modules}
+
+        for name, module in self._instantiated_modules.items():
+
+            for dependency in module.get_dependencies():
+                self._dependents[dependency].add(name)
+
+        ########################################################################
+
+        counters = {name: len(module.get_dependencies())
+            for name, module in self._instantiated_modules.items()}
+
+        ready = sorted(name for name, count in counters.items() if not count)
+
+        self._module_order = []
+
+        while ready:
+
+            name = ready.pop(0)
+            self._module_order.append(name)
+
+            for dependent in sorted(self._dependents[name]):
+
+                counters[dependent] -= 1
+
+                if not counters[dependent]:
+                    ready.append(dependent)
+
+        if len(self._module_order) != len(self._instantiated_modules):
+            raise DependencyError('Circular modul dependency detected')
+
+    ############################################################################
+
     def _check_module_versions(self):
         """
         Method to check module's versions.
@@ -237,10 +303,11 @@ class Scheduler():
 
     def start_modules(self, request_id, domain, counter=0, rerun_modules=None):
         """
-        Method to start modules in separate threads.
+        Method to run the modules on the worker threads.
         If one module has a dependency to another module,
         the execution will be delayed until the needed module has finished.
         So the order of execution is given by the dependencies.
+        The method may be called for several domains at once.
 
         @param request_id:    the request id of the current request
         @param domain:        the domain to scan
@@ -248,8 +315,6 @@ class Scheduler():
         @param rerun_modules: a list of modules that should rerun
         """
 
-        self._lock.acquire()
-
         start = time.time()
 
         self._log.info(
@@ -258,147 +323,34 @@ class Scheduler():
 
         ########################################################################
 
-        condition_variable = threading.Condition()
-        threads = []
-
-        # a set of completed modules
-        modules_done = set()
-
-        # a set of failed modules that should rerun
-        modules_failed_rerun = set()
-
-        # a set of failed modules to notify dependent modules
-        modules_failed_notify = set()
-
-        # a set of ignored modules, as of dependencies failed
-        modules_dependency_failed = set()
-
-        ########################################################################
-
-        class Worker(threading.Thread):
-            """
-            Class for running modules in their own thread.
-            """
-
-            def __init__(self, module, counter):
-
-                threading.Thread.__init__(self)
-                self._module = module
-                self._module_name = module.__class__.__name__
-                self._counter = counter
-
-            ####################################################################
-
-            def run(self):
-                """
-                Method to do the search for the given module.
-                """
-
-                try:
-
-                    self._module.run(request_id, domain, counter)
-
-                    with condition_variable:
-
-                        modules_done.add(self._module_name)
-                        condition_variable.notify()
-
-                except modules.ModuleError as error:
-
-                    with condition_variable:
-
-                        if error.rerun_flag:
-                            modules_failed_rerun.add(self._module_name)
-
-                        else:
-                            modules_failed_notify.add(self._module_name)
-
-                        condition_variable.notify()
-
-                except Exception:
-
-                    with condition_variable:
-
-                        modules_failed_notify.add(self._module_name)
-                        condition_variable.notify()
-
-        ########################################################################
-
         # checks if the scheduler was invoked with a list of modules to rerun
 
         if rerun_modules:
 
-            instantiated_modules = \
-                [self._instantiated_modules[m] for m in rerun_modules]
+            module_names = \
+                [m for m in self._module_order if m in rerun_modules]
 
         else:
-            instantiated_modules = list(self._instantiated_modules.values())
-
-        ########################################################################
-
-        # as long as there are modules in instantiated_modules, start them if
-        # their dependencies match the list with already finished modules
-
-        with condition_variable:
-
-            while instantiated_modules:
-
-                for module in instantiated_modules:
-
-                    # checks if the module's dependencies have already been
-                    # executed
-                    if module.get_dependencies().issubset(modules_done):
-
-                        instantiated_modules.remove(module)
-                        thread = Worker(module, counter)
-                        thread.start()
-                        threads.append(thread)
-
-                    # checks if the module depends on failed modules;
-                    # modules will not rerun
-                    elif module.get_dependencies() & modules_failed_notify or \
-                        module.get_dependencies() & modules_dependency_failed:
-
-                        instantiated_modules.remove(module)
-                        modules_dependency_failed.add(module.__class__.__name__)
-
-                    # checks if the module depends on failed modules;
-                    # modules will rerun
-                    elif module.get_dependencies() & modules_failed_rerun:
-
-                        instantiated_modules.remove(module)
-                        modules_failed_rerun.add(module.__class__.__name__)
-
-                condition_variable.wait()
+            module_names = self._module_order
 
         ########################################################################
 
-        # waits until all started modules are finished
-
-        for thread in threads:
-            thread.join()
-
-        ########################################################################
+        # starts all modules without pending dependencies; all other modules
+        # will be started as soon as their last dependency has finished
 
-        # checks if modules in modules_failed_rerun are in the correct list
+        scan_state = ScanState(module_names, self._instantiated_modules,
+            self._dependents)
 
-        has_changed = True
+        for module_name in scan_state.get_ready_modules():
 
-        while has_changed:
+            self._start_module(scan_state, module_name, request_id, domain,
+                counter)
 
-            has_changed = False
+        # waits until all modules are finished
+        scan_state.wait()
 
-            for module in modules_failed_rerun:
-
-                deps = self._instantiated_modules[module].get_dependencies()
-
-                if deps & modules_failed_notify or \
-                    deps & modules_dependency_failed:
-
-                    modules_failed_rerun.remove(module)
-                    modules_dependency_failed.add(module)
-
-                    has_changed = True
+        modules_failed_rerun = scan_state.modules_failed_rerun
+        modules_dependency_failed = scan_state.modules_dependency_failed
 
         ########################################################################
 
@@ -432,8 +384,6 @@ class Scheduler():
             self._rerun_queue.put(
                 (request_id, domain, counter + 1, modules_failed_rerun, now))
 
-            self._lock.release()
-
             return
 
         # notifies the task-notification server about the finished task
@@ -444,14 +394,14 @@ class Scheduler():
 
         with socket.create_connection(task_notification_server) as sock:
 
-            sock.sendall(bytes(json.dumps({
+            send_message(sock, {
                 'notification': {
                     'scan': {
                         'domain': domain,
                         'request_id': request_id
                     }
                 }
-            }), 'UTF-8'))
+            })
 
         ####################################################################
 
@@ -462,7 +412,60 @@ class Scheduler():
             'Request ID: {} - Domain: {} - Counter: {} - Time: {:.2f}s'
             .format(request_id, domain, counter, end - start))
 
-        self._lock.release()
+    ############################################################################
+
+    def _start_module(self, scan_state, module_name, request_id, domain,
+        counter):
+        """
+        Method to hand a module over to the worker threads.
+
+        @param scan_state:  the state of the current scan
+        @param module_name: the name of the module to run
+        @param request_id:  the request id of the current request
+        @param domain:      the domain to scan
+        @param counter:     count the number of runs for this request
+        """
+
+        self._executor.submit(self._run_module, scan_state, module_name,
+            request_id, domain, counter)
+
+    ############################################################################
+
+    def _run_module(self, scan_state, module_name, request_id, domain,
+        counter):
+        """
+        Method to run a module on a worker thread and to start the modules
+        which have been waiting for it.
+
+        @param scan_state:  the state of the current scan
+        @param module_name: the name of the module to run
+        @param request_id:  the request id of the current request
+        @param domain:      the domain to scan
+        @param counter:     count the number of runs for this request
+        """
+
+        try:
+
+            self._instantiated_modules[module_name].run(
+                request_id, domain, counter)
+
+            outcome = ScanState.DONE
+
+        except modules.ModuleError as error:
+
+            if error.rerun_flag:
+                outcome = ScanState.FAILED_RERUN
+
+            else:
+                outcome = ScanState.FAILED_NOTIFY
+
+        except Exception:
+            outcome = ScanState.FAILED_NOTIFY
+
+        for ready_module_name in scan_state.resolve(module_name, outcome):
+
+            self._start_module(scan_state, ready_module_name, request_id,
+                domain, counter)
 
     ############################################################################
 
@@ -484,6 +487,149 @@ class Scheduler():
 
 ################################################################################
 
+class ScanState():
+    """
+    This class keeps track of the modules of a single scan. Every module counts
+    its unfinished dependencies and gets ready to run as soon as the counter
+    reaches zero. Modules depending on failed modules will not run.
+    """
+
+    # outcomes of a module
+    DONE = 'done'
+    FAILED_RERUN = 'failed_rerun'
+    FAILED_NOTIFY = 'failed_notify'
+
+    def __init__(self, module_names, instantiated_modules, dependents):
+
+        self._lock = threading.Lock()
+        self._finished_event = threading.Event()
+
+        self._module_names = set(module_names)
+        self._dependents = dependents
+
+        # a set of completed modules
+        self.modules_done = set()
+
+        # a set of failed modules that should rerun
+        self.modules_failed_rerun = set()
+
+        # a set of failed modules to notify dependent modules
+        self.modules_failed_notify = set()
+
+        # a set of ignored modules, as of dependencies failed
+        self.modules_dependency_failed = set()
+
+        ########################################################################
+
+        # dependencies of modules which are not part of the scan count as done
+
+        self._dependencies = {}
+        self._counters = {}
+
+        for name in module_names:
+
+            dependencies = \
+                instantiated_modules[name].get_dependencies() & \
+                self._module_names
+
+            self._dependencies[name] = dependencies
+            self._counters[name] = len(dependencies)
+
+        self._unresolved = len(self._module_names)
+
+        if not self._unresolved:
+            self._finished_event.set()
+
+    ############################################################################
+
+    def get_ready_modules(self):
+        """
+        Method to return the modules without dependencies.
+
+        @return: list of modules ready to run
+        """
+
+        return [name for name, count in self._counters.items() if not count]
+
+    ############################################################################
+
+    def resolve(self, module_name, outcome):
+        """
+        Method to set the outcome of a module and to return the modules which
+        were waiting for it.
+
+        @param module_name: the name of the finished module
+        @param outcome:     DONE, FAILED_RERUN or FAILED_NOTIFY
+
+        @return: list of modules ready to run
+        """
+
+        ready = []
+
+        with self._lock:
+
+            finished = [(module_name, outcome)]
+
+            while finished:
+
+                name, outcome = finished.pop()
+
+                self._unresolved -= 1
+
+                if outcome == self.DONE:
+                    self.modules_done.add(name)
+
+                elif outcome == self.FAILED_RERUN:
+                    self.modules_failed_rerun.add(name)
+
+                elif outcome == self.FAILED_NOTIFY:
+                    self.modules_failed_notify.add(name)
+
+                else:
+                    self.modules_dependency_failed.add(name)
+
+                ################################################################
+
+                for dependent in self._dependents[name] & self._module_names:
+
+                    self._counters[dependent] -= 1
+
+                    if self._counters[dependent]:
+                        continue
+
+                    dependencies = self._dependencies[dependent]
+
+                    # checks if the module depends on failed modules;
+                    # modules will not rerun
+                    if dependencies & self.modules_failed_notify or \
+                        dependencies & self.modules_dependency_failed:
+
+                        finished.append((dependent, None))
+
+                    # checks if the module depends on failed modules;
+                    # modules will rerun
+                    elif dependencies & self.modules_failed_rerun:
+                        finished.append((dependent, self.FAILED_RERUN))
+
+                    else:
+                        ready.append(dependent)
+
+            if not self._unresolved:
+                self._finished_event.set()
+
+        return ready
+
+    ############################################################################
+
+    def wait(self):
+        """
+        Method to wait until the outcome of all modules is known.
+        """
+
+        self._finished_event.wait()
+
+################################################################################
+
 class DatabaseError(Exception):
     """
     Exception for database errors.
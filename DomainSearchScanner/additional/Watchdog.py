@@ -32,11 +32,45 @@ from datetime import datetime
 from additional import Config
 from additional.Logging import Logging
 
+################################################################################
+
+def encode_task(task):
+    """
+    Method to convert a task of the rerun queue into a JSON value.
+
+    @param task: (request_id, domain, counter, rerun_modules, date_time)
+
+    @return: the task as list
+    """
+
+    request_id, domain, counter, rerun_modules, date_time = task
+
+    return [request_id, domain, counter, sorted(rerun_modules),
+        date_time.strftime('%Y-%m-%d %H:%M:%S.%f')]
+
+################################################################################
+
+def decode_task(value):
+    """
+    Method to convert a JSON value back into a task of the rerun queue.
+
+    @param value: the task as list
+
+    @return: (request_id, domain, counter, rerun_modules, date_time)
+    """
+
+    request_id, domain, counter, rerun_modules, date_time = value
+
+    return (request_id, domain, counter, set(rerun_modules),
+        datetime.strptime(date_time, '%Y-%m-%d %H:%M:%S.%f'))
+
+################################################################################
+
 class Watchdog(threading.Thread):
     """
-    This class restores a backup of the rerun queue if one found, checks the
-    rerun queue continuously for new tasks, starts the scheduler if a new task
-    is available and backups the rerun queue in case of a shutdown.
+    This class imports a backup of the rerun queue of earlier versions if one
+    found, checks the rerun queue continuously for new tasks and starts the
+    scheduler if a new task is available.
     """
 
     def __init__(self, scheduler, db, running_event, rerun_queue):
@@ -51,7 +85,7 @@ class Watchdog(threading.Thread):
 
         ########################################################################
 
-        # restores a possibly created backup
+        # imports a possibly created backup of earlier versions
 
         if os.path.isfile(Config.rerun_queue_backup_path):
             self._restore_backup(rerun_queue, Config.rerun_queue_backup_path)
@@ -110,25 +144,20 @@ class Watchdog(threading.Thread):
                 self._scheduler.start_modules(request_id, domain, counter,
                     rerun_modules)
 
-        ########################################################################
-
-        # creates a backup from the rerun queue
-
-        if not self._rerun_queue.empty():
-
-            self._create_backup(self._rerun_queue,
-                Config.rerun_queue_backup_path)
-
     ###########################################################################
 
     def _restore_backup(self, backup_queue, backup_path):
         """
-        Method to restore a backup and add the tasks to the given queue.
+        Method to restore a backup of earlier versions and add the tasks to
+        the given queue. The backup is read in chunks and every chunk is
+        validated with a single query.
 
         @param backup_queue: the queue to backup
         @param backup_path:  the location of the backup
         """
 
+        chunk = []
+
         with open(backup_path, 'r', encoding='utf-8') as backup_file:
 
             for line in backup_file:
@@ -137,33 +166,66 @@ class Watchdog(threading.Thread):
 
                     entry = ast.literal_eval(line)
 
-                    if self._is_backup_entry_valid:
-
-                        backup_queue.put(entry)
-
-                        self._log.debug('Task recovered: {}'.format(line))
-
-                    else:
+                    if not self._is_backup_entry_valid(entry):
                         raise SyntaxError
 
-                except SyntaxError:
+                except (SyntaxError, ValueError):
 
                     if Config.debug_mode:
                         raise
 
                     self._log.error('Not a valid entry: {}'.format(line))
 
+                    continue
+
+                chunk.append(entry)
+
+                if len(chunk) >= Config.backup_restore_chunk_size:
+
+                    self._restore_backup_entries(backup_queue, chunk)
+
+                    chunk = []
+
+        self._restore_backup_entries(backup_queue, chunk)
+
         os.remove(backup_path)
 
         self._log.info('Backup recovery finished: {}'.format(backup_path))
 
     ###########################################################################
 
+    def _restore_backup_entries(self, backup_queue, entries):
+        """
+        Method to add the backup entries with a valid request to the given
+        queue.
+
+        @param backup_queue: the queue to backup
+        @param entries:      list of backup entries
+        """
+
+        # validates requests in database
+        valid_requests = self._db.get_valid_requests(
+            (entry[0], entry[1]) for entry in entries)
+
+        for entry in entries:
+
+            if (entry[0], entry[1]) in valid_requests:
+
+                backup_queue.put(entry)
+
+                self._log.debug('Task recovered: {}'.format(entry))
+
+            else:
+                self._log.error('Not a valid entry: {}'.format(entry))
+
+    ###########################################################################
+
     def _is_backup_entry_valid(self, entry):
         """
-        Method to check if a backup entry is valid.
+        Method to check if a backup entry is valid. The request itself is
+        validated in the database afterwards.
 
-        @param entry: (request_id, domain, counter, rerun_modules)
+        @param entry: (request_id, domain, counter, rerun_modules, date_time)
 
         @return: True if valid, False otherwise
         """
@@ -171,7 +233,8 @@ class Watchdog(threading.Thread):
         # validates entry structure
 
         if not(
-            isinstance(entry, tuple) and isinstance(entry[0], int) and \
+            isinstance(entry, tuple) and len(entry) == 5 and \
+            isinstance(entry[0], int) and \
             isinstance(entry[1], str) and isinstance(entry[2], int) and \
             isinstance(entry[3], set) and isinstance(entry[4], datetime)):
 
@@ -189,32 +252,8 @@ class Watchdog(threading.Thread):
             if not self._scheduler.is_module_instantiated(module):
                 return False
 
-        # validates request in database
-        if not self._db.is_request_valid(entry[0], entry[1]):
-            return False
-
         # validates temporal relevance of the request
 
         timedelta = datetime.now() - entry[4]
 
         return timedelta.days < Config.request_expiration_time
-
-    ############################################################################
-
-    def _create_backup(self, backup_queue, backup_path):
-        """
-        Method to create a backup from the given queue.
-
-        @param backup_queue: the queue to backup
-        @param backup_path:  the location of the backup
-        """
-
-        with open(backup_path, 'w', encoding='utf-8') as backup_file:
-
-            while not backup_queue.empty():
-
-                entry = backup_queue.get()
-                backup_file.write(str(entry) + '\n')
-                backup_queue.task_done()
-
-        self._log.info('Generation of backup succeeded: {}'.format(backup_path))
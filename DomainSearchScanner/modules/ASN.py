@@ -13,11 +13,11 @@ data-raw-table: http://thyme.apnic.net/current/data-raw-table
 data-used-autnums: http://thyme.apnic.net/current/data-used-autnums
 """
 
-import ipaddress
-
 from modules import DatasourceBase
 from modules import ModuleError
 
+from additional.ASNIndex import ASNIndex
+
 ################################################################################
 
 class ASN(DatasourceBase):
@@ -58,34 +58,27 @@ class ASN(DatasourceBase):
     def __init__(self):
 
         super(ASN, self).__init__()
-        self._data_raw_table = []
-        self._data_used_autnums = []
+        self._index = None
 
         try:
             self._init_database()
 
-        except:
-            pass
+        except (OSError, ValueError) as e:
+            self._log.error('ASN Database not loaded: {}'.format(e))
 
     ############################################################################
 
     def _init_database(self):
+        """
+        Method to map the compiled index of both ASN databases. The index is
+        reloaded while the scanner is running if the databases change.
+        """
 
-        with open('resources/data-raw-table', 'r', encoding='utf-8') as file:
-
-            for line in file:
-
-                line = line.strip().split('\t')
-                self._data_raw_table.append(line)
-
-            self._data_raw_table.reverse()
-
-        with open('resources/data-used-autnums', 'r', encoding='utf-8') as file:
-
-            for line in file:
-
-                line = line.strip().split(' ', maxsplit=1)
-                self._data_used_autnums.append(line)
+        self._index = ASNIndex(
+            self._get_module_config('data_raw_table_path'),
+            self._get_module_config('data_used_autnums_path'),
+            self._get_module_config('index_path'),
+            self._get_module_config('reload_interval'))
 
     ############################################################################
 
@@ -95,7 +88,7 @@ class ASN(DatasourceBase):
         database.
         """
 
-        if not(self._data_raw_table and self._data_used_autnums):
+        if not self._index:
 
             self._report_module_error(request_id, 'ASN Database not found')
 
@@ -105,29 +98,12 @@ class ASN(DatasourceBase):
 
         for ip in self._get_ip_addresses(domain):
 
-            asn = None
-            name = None
-
-            for entry in self._data_raw_table:
-
-                # Description: _data_raw_table: [[subnet, asn], ...]
+            entry = self._index.lookup(ip)
 
-                # checks if ip address is part of the subnet
-                if ip.split('.')[0] == entry[0].split('.')[0] and \
-                    ipaddress.ip_address(ip) in ipaddress.ip_network(entry[0]):
-
-                    asn = entry[1]
-                    break
-
-            if not asn:
+            if not entry:
                 continue
 
-            for line in self._data_used_autnums:
-
-                if line[0] == asn:
-
-                    name = line[1]
-                    break
+            asn, name = entry
 
             if not name:
                 continue
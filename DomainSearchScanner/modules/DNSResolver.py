@@ -4,9 +4,12 @@
 Module for resolving DNS records.
 """
 
+import concurrent.futures
+
 import dns.name
 import dns.message
 import dns.query
+import dns.rcode
 import dns.reversename
 import dns.rdtypes.ANY.SOA
 import dns.rdtypes.IN.A
@@ -19,6 +22,8 @@ class DNSResolver(DatasourceBase):
     """
     This module uses dnsPython to resolve the DNS records of the given domain.
     it also does a reverse lookup and writes the results into the database.
+    Independent queries are sent at once by a bounded number of threads. The
+    found addresses are shared with the other modules.
     """
 
     # version of the module
@@ -27,12 +32,6 @@ class DNSResolver(DatasourceBase):
     # dependencies of the module
     _dependencies = set()
 
-    # counter for lookup recursions
-    _recursion = 0
-
-    # set of found data by the lookups
-    _complete_set = set()
-
     # database query strings of the module
     _queries = {
         'create' : '''
@@ -64,6 +63,10 @@ class DNSResolver(DatasourceBase):
     def __init__(self):
         super(DNSResolver, self).__init__()
 
+        # threads sending the queries of all scans
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._get_module_config('max_threads'))
+
     ############################################################################
 
     def _search(self, request_id, domain, counter):
@@ -72,28 +75,25 @@ class DNSResolver(DatasourceBase):
         database.
         """
 
-        # clear set and recursion
-        self._complete_set = set()
-        self._recursion = 0
+        # the state of this search, so several domains can be searched at once
+        lookup = Lookup(request_id)
 
         # search for SOA record with nameserver from configuration file
         soa_nameserver = self._find_nameserver(domain,
             self._get_module_config('nameserver'))
 
         # lookup for ANY on SOA Nameserver
-        self._lookup(request_id, domain, soa_nameserver)
+        self._lookup(lookup, domain, soa_nameserver)
 
         # reverse lookup for all IPs on default nameserver
-        self._reverse_lookup(request_id,
-            self._get_module_config('nameserver'))
+        self._reverse_lookup(lookup, self._get_module_config('nameserver'))
 
-        sorted_set = list(self._complete_set)
+        sorted_set = list(lookup.records)
 
         # sort a list of tuples by the second key
         sorted_set.sort(key = lambda item: item[1])
 
-        for line in sorted_set:
-            self._db.insert_data(self._queries['insert'], line)
+        self._db.insert_many_data(self._queries['insert'], sorted_set)
 
     ############################################################################
 
@@ -125,38 +125,36 @@ class DNSResolver(DatasourceBase):
 
     ############################################################################
 
-    def _lookup(self, request_id, domain, nameserver):
+    def _lookup(self, lookup, domain, nameserver):
         """
         Does a lookup for the given domain and writes the answer to the db.
-        Does a DNS Lookup for recordtype ANY. If the answer contains no A or
-        AAAA record, those recordtypes are requested separately.
+        Does a DNS Lookup for recordtype ANY, A and AAAA at once, since many
+        nameservers answer ANY without the addresses. The targets of found
+        CNAME records are looked up the same way, one CNAME hop at a time.
         """
 
-        self._recursion += 1
-        ans = self._resolve(domain, nameserver, recordtype='ANY')
-
-        result = self._insert_into_set(request_id, ans)
+        names = [domain]
+        visited = set()
 
-        if not result[0]:  # type A
+        while names and lookup.recursion < \
+            self._get_module_config('max_recursions'):
 
-            ans = self._resolve(domain, nameserver, recordtype='A')
-            self._insert_into_set(request_id, ans)
+            lookup.recursion += 1
+            visited.update(str(name) for name in names)
 
-        if not result[1]:  # type AAAA
+            queries = [(name, recordtype) \
+                for name in names for recordtype in ('ANY', 'A', 'AAAA')]
 
-            ans = self._resolve(domain, nameserver, recordtype='AAAA')
-            self._insert_into_set(request_id, ans)
+            cnames = set()
 
-        if self._recursion < self._get_module_config('max_recursions'):
+            for ans in self._resolve_many(queries, nameserver):
+                cnames |= self._insert_into_set(lookup, ans)[2]
 
-            for cname in result[2]:  # type CNAME
-
-                ans = self._lookup(request_id, cname, nameserver)
-                self._insert_into_set(request_id, ans)
+            names = [cname for cname in cnames if str(cname) not in visited]
 
     ############################################################################
 
-    def _reverse_lookup(self, request_id, nameserver):
+    def _reverse_lookup(self, lookup, nameserver):
         """
         Does a reverse lookup for every IPv4 and IPv6 Adress.
         Queries the database for prviously resolved IP adresses and does a
@@ -165,21 +163,20 @@ class DNSResolver(DatasourceBase):
 
         ip_list = []
 
-        for line in self._complete_set:
+        for line in lookup.records:
 
             if line[4] == 'A' or line[4] == 'AAAA':
                 ip_list.append(line[5])
 
-        for rdata in ip_list:
-
-            reverse_ans = self._resolve(
-                dns.reversename.from_address(str(rdata)), nameserver)
+        queries = [(dns.reversename.from_address(str(rdata)), 'ANY') \
+            for rdata in ip_list]
 
-            self._insert_into_set(request_id, reverse_ans)
+        for reverse_ans in self._resolve_many(queries, nameserver):
+            self._insert_into_set(lookup, reverse_ans)
 
     ############################################################################
 
-    def _insert_into_set(self, request_id, answer):
+    def _insert_into_set(self, lookup, answer):
         """
         Inserts the given answer into the set of found data
         the answer should be the answer section of the lookup result.
@@ -203,28 +200,62 @@ class DNSResolver(DatasourceBase):
 
                     for entry in block:
 
-                        data = (request_id, name, ttl, rdclass, rdtype,
+                        data = (lookup.request_id, name, ttl, rdclass, rdtype,
                             str(entry))
 
-                        self._complete_set.add(data)
+                        lookup.records.add(data)
 
-                        if rdtype is 'CNAME':
+                        if rdtype == 'CNAME':
                             cnames.add(entry.target)
 
-                    if rdtype is 'A':
+                    if rdtype == 'A':
                         has_a = True
 
-                    if rdtype is 'AAAA' :
+                    if rdtype == 'AAAA':
                         has_aaaa = True
 
         return (has_a, has_aaaa, cnames)
 
     ############################################################################
 
+    def _resolve_many(self, queries, nameserver):
+        """
+        Resolves several domain names at once.
+        Returns the answers in the order of the queries.
+        """
+
+        futures = [self._executor.submit(self._resolve, domain, nameserver,
+            recordtype) for domain, recordtype in queries]
+
+        return [future.result() for future in futures]
+
+    ############################################################################
+
     def _resolve(self, domain, nameserver, recordtype='ANY'):
         """
         Resolves a given domain name.
         Returns the answer section of the DNS Response.
+        Responses are shared with the other modules as long as their records
+        are valid.
+        """
+
+        key = ('query', str(domain).lower(), nameserver, recordtype)
+
+        try:
+
+            return self._dns_lookup(key,
+                lambda: self._query(domain, nameserver, recordtype))
+
+        except Exception:
+            self._log.debug('Response: No response')
+
+    ############################################################################
+
+    def _query(self, domain, nameserver, recordtype):
+        """
+        Sends a query for a given domain name to the nameserver.
+        Returns the sections of the DNS Response and the smallest time to live
+        of its records.
         """
 
         additional_rdclass = 65535
@@ -245,13 +276,49 @@ class DNSResolver(DatasourceBase):
         self._log.debug('Request: \r\n\r\n{}\r\n\r\nNameserver: {}\r\n'
             .format(request, nameserver))
 
-        try:
+        response = dns.query.udp(request, nameserver, timeout=3)
 
-            response = dns.query.udp(request, nameserver, timeout=3)
+        self._log.debug('Response: \r\n\r\n{}\r\n'.format(response))
 
-            self._log.debug('Response: \r\n\r\n{}\r\n'.format(response))
+        sections = (response.answer, response.authority, response.additional)
 
-            return response.answer, response.authority, response.additional
+        ttls = [block.ttl for section in sections for block in section \
+            if block.rdtype != dns.rdatatype.OPT]
 
-        except:
-            self._log.debug('Response: No response')
+        ttl = min(ttls) if ttls else self.Config.dns_cache_negative_ttl
+
+        # negative answers (unknown domain or no record) expire after the time
+        # to live of negative answers at most
+        if response.rcode() == dns.rcode.NXDOMAIN or (not response.answer and \
+            any(block.rdtype == dns.rdatatype.SOA \
+            for block in response.authority)):
+
+            ttl = min(ttl, self.Config.dns_cache_negative_ttl)
+
+        # shares the addresses with the other modules, so they do not
+        # resolve the domain again
+        if recordtype == 'A' and response.answer:
+
+            self._share_ip_addresses(domain, [entry.address \
+                for block in response.answer \
+                if block.rdtype == dns.rdatatype.A for entry in block],
+                min(block.ttl for block in response.answer))
+
+        return sections, ttl
+
+################################################################################
+
+class Lookup():
+    """
+    This class holds the state of a single search of the DNSResolver.
+    """
+
+    def __init__(self, request_id):
+
+        self.request_id = request_id
+
+        # set of found data by the lookups
+        self.records = set()
+
+        # counter for lookup recursions
+        self.recursion = 0
@@ -61,6 +61,8 @@ class GoogleSearch(DatasourceBase):
 
         search_types = {'link:', 'site:', ''}
 
+        insert_values = []
+
         for addition in search_types:
 
             url = 'https://www.google.de/search'
@@ -88,6 +90,6 @@ class GoogleSearch(DatasourceBase):
 
             addition = addition[:-1]
 
-            self._db.insert_data(
-                self._queries['insert'], (request_id, addition, count)
-            )
+            insert_values.append((request_id, addition, count))
+
+        self._db.insert_many_data(self._queries['insert'], insert_values)
@@ -63,15 +63,19 @@ class IPVoid(DatasourceBase):
         database.
         """
 
+        insert_values = []
+
         for ip_address in self._get_ip_addresses(domain):
 
             blacklists = self._get_blacklists(ip_address)
 
             for blacklist in blacklists:
 
-                self._db.insert_data(self._queries['insert'],
+                insert_values.append(
                     (request_id, ip_address, blacklist[0], blacklist[1]))
 
+        self._db.insert_many_data(self._queries['insert'], insert_values)
+
     ############################################################################
 
     def _get_blacklists(self, ip_address):
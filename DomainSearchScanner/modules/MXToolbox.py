@@ -65,12 +65,11 @@ class MXToolbox(DatasourceBase):
 
         blacklists = self._get_blacklists(domain)
 
-        for blacklist in blacklists.keys():
-
-            self._db.insert_data(
-                self._queries['insert'],
-                (request_id, blacklist, blacklists.get(blacklist))
-            )
+        self._db.insert_many_data(
+            self._queries['insert'],
+            [(request_id, blacklist, state)
+                for blacklist, state in blacklists.items()]
+        )
 
     ############################################################################
 
@@ -71,6 +71,8 @@ class Nmap(DatasourceBase):
         nm = nmap.PortScanner()
         nm.scan(domain, self._get_module_config('port_range'))
 
+        insert_values = []
+
         for host in nm.all_hosts():
 
             for protocol in nm[host].all_protocols():
@@ -80,16 +82,16 @@ class Nmap(DatasourceBase):
 
                 for port in nm[host][protocol].keys():
 
-                    self._db.insert_data(
-                        self._queries['insert'], (
-                            request_id, host, port, protocol,
-                            nm[host][protocol][port]['name'],
-                            nm[host][protocol][port]['state'],
-                            nm[host][protocol][port]['reason'],
-                            nm[host][protocol][port]['product'],
-                            nm[host][protocol][port]['version'],
-                            int(nm[host][protocol][port]['conf']),
-                            nm[host][protocol][port]['cpe'],
-                            nm[host][protocol][port]['extrainfo']
-                        )
-                    )
+                    insert_values.append((
+                        request_id, host, port, protocol,
+                        nm[host][protocol][port]['name'],
+                        nm[host][protocol][port]['state'],
+                        nm[host][protocol][port]['reason'],
+                        nm[host][protocol][port]['product'],
+                        nm[host][protocol][port]['version'],
+                        int(nm[host][protocol][port]['conf']),
+                        nm[host][protocol][port]['cpe'],
+                        nm[host][protocol][port]['extrainfo']
+                    ))
+
+        self._db.insert_many_data(self._queries['insert'], insert_values)
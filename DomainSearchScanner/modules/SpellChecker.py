@@ -97,12 +97,10 @@ class SpellChecker(DatasourceBase):
             (request_id, numbers[0], numbers[1])
         )
 
-        for line in words:
-
-            self._db.insert_data(
-                self._queries['insert'][1],
-                (last_row_id, line[0], line[1])
-            )
+        self._db.insert_many_data(
+            self._queries['insert'][1],
+            [(last_row_id, line[0], line[1]) for line in words]
+        )
 
     ############################################################################
 
@@ -59,12 +59,10 @@ class Typo(DatasourceBase):
 
         answer = self._query(domain)
 
-        for line in answer:
-
-            self._db.insert_data(
-                self._queries['insert'],
-                (request_id, line)
-            )
+        self._db.insert_many_data(
+            self._queries['insert'],
+            [(request_id, line) for line in answer]
+        )
 
     ############################################################################
 
@@ -99,11 +99,10 @@ class VirusTotal(DatasourceBase):
 
         if 'positives' in response:
 
-            for key, value in response['scans'].items():
-
-                self._db.insert_data(
-                    self._queries['insert'],
-                    (request_id, key, 1 if value['detected'] else 0))
+            self._db.insert_many_data(
+                self._queries['insert'],
+                [(request_id, key, 1 if value['detected'] else 0)
+                    for key, value in response['scans'].items()])
 
         else: # requested item is still queued for analysis
             raise ModuleError(True)
@@ -145,23 +145,26 @@ class Whois(DatasourceBase):
 
         if 'contacts' in whois:
 
+            insert_values = []
+
             for key, value in whois['contacts'].items():
 
                 if not value:
                     continue
 
-                self._db.insert_data(
-                    self._queries['insert'][1], (
-                        whois_id,
-                        key,
-                        value['handle'] if 'handle' in value else '',
-                        value['name'] if 'name' in value else '',
-                        value['organisation'] if 'organisation' in value else '',
-                        value['street'] if 'street' in value else '',
-                        value['postalcode'] if 'postalcode' in value else '',
-                        value['city'] if 'city' in value else '',
-                        value['state'] if 'state' in value else '',
-                        value['country'] if 'country' in value else '',
-                        value['email'] if 'email' in value else '',
-                        value['phone'] if 'phone' in value else '',
-                        value['fax'] if 'fax' in value else ''))
+                insert_values.append((
+                    whois_id,
+                    key,
+                    value['handle'] if 'handle' in value else '',
+                    value['name'] if 'name' in value else '',
+                    value['organisation'] if 'organisation' in value else '',
+                    value['street'] if 'street' in value else '',
+                    value['postalcode'] if 'postalcode' in value else '',
+                    value['city'] if 'city' in value else '',
+                    value['state'] if 'state' in value else '',
+                    value['country'] if 'country' in value else '',
+                    value['email'] if 'email' in value else '',
+                    value['phone'] if 'phone' in value else '',
+                    value['fax'] if 'fax' in value else ''))
+
+            self._db.insert_many_data(self._queries['insert'][1], insert_values)
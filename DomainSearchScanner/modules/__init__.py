@@ -10,6 +10,9 @@ import glob
 import time
 import socket
 
+import dns.resolver
+import dns.exception
+
 ################################################################################
 
 # list of strings defining what symbols will be exported
@@ -33,6 +36,12 @@ class DatasourceBase(metaclass=abc.ABCMeta):
     _dependencies = set()
     _queries = dict()
 
+    # registry of the run times and outcomes, set by the scheduler
+    _metrics = None
+
+    # cache of the DNS answers of all modules, set by the scheduler
+    _dns_cache = None
+
     ############################################################################
 
     @abc.abstractmethod
@@ -57,6 +66,31 @@ class DatasourceBase(metaclass=abc.ABCMeta):
 
     ############################################################################
 
+    def set_metrics(self, metrics):
+        """
+        Method to record the run times, outcomes and inserted rows of the
+        module in a metrics registry.
+
+        @param metrics: the metrics registry
+        """
+
+        self._metrics = metrics
+
+        self._db.set_metrics(metrics, module=self.__class__.__name__)
+
+    ############################################################################
+
+    def set_dns_cache(self, dns_cache):
+        """
+        Method to share the DNS answers with the other modules.
+
+        @param dns_cache: the DNS cache
+        """
+
+        self._dns_cache = dns_cache
+
+    ############################################################################
+
     def run(self, request_id, domain, counter):
         """
         Method called from the scheduler to run the actual module.
@@ -66,7 +100,22 @@ class DatasourceBase(metaclass=abc.ABCMeta):
         @param counter:    count the number of runs for this request
         """
 
-        # validates parameter structure
+        self._validate_parameters(request_id, domain, counter)
+
+        ########################################################################
+
+        self._run_search(request_id, domain, counter)
+
+    ############################################################################
+
+    def _validate_parameters(self, request_id, domain, counter):
+        """
+        Method to validate the parameters of a run.
+
+        @param request_id: the request id of the current request
+        @param domain:     the domain to scan
+        @param counter:    count the number of runs for this request
+        """
 
         if not(
             isinstance(request_id, int) and \
@@ -79,73 +128,137 @@ class DatasourceBase(metaclass=abc.ABCMeta):
 
             raise ModuleError
 
-        ########################################################################
+    ############################################################################
 
-        start = time.time()
+    def _run_search(self, request_id, domain, counter):
+        """
+        Method to run the search of the module and to log its result.
 
-        self._log.info(
-            'Module started    - Request ID: {} - Domain: {}'
-            .format(request_id, domain))
+        @param request_id: the request id of the current request
+        @param domain:     the domain to scan
+        @param counter:    count the number of runs for this request
+        """
 
-        ########################################################################
+        start = self._search_started(request_id, domain)
 
         try :
 
             # Collects modules information and inserts the result into database.
             self._search(request_id, domain, counter)
 
-        except ModuleError as err:
+        except Exception as err:
 
-            end = time.time()
+            self._search_failed(err, request_id, domain, counter, start)
 
-            if err.rerun_flag:
+            raise
 
-                if counter > self.Config.rerun_counter_max:
+        self._search_finished(request_id, domain, start)
 
-                    # finally terminates the module despite the desire of rerun
+    ############################################################################
 
-                    self._log.error(
-                        'Module expired    - Request ID: {} - Domain: {}'
-                        .format(request_id, domain))
+    def _search_started(self, request_id, domain):
+        """
+        Method to log the start of a search.
 
-                    self._report_module_error(request_id, 'Module expired')
+        @param request_id: the request id of the current request
+        @param domain:     the domain to scan
 
-                    raise ModuleError
+        @return: the start time
+        """
 
-                self._log.info(
-                    'Module unfinished - ' + \
-                    'Request ID: {} - Domain: {} - Time: {:.2f}s'
-                    .format(request_id, domain, end - start))
+        self._log.info(
+            'Module started    - Request ID: {} - Domain: {}'
+            .format(request_id, domain))
 
-                raise
+        return time.time()
 
-            self._log.error(
-                'Module failed     - ' + \
-                'Request ID: {} - Domain: {} - Time: {:.2f}s'
-                .format(request_id, domain, end - start))
+    ############################################################################
 
-            raise
+    def _search_finished(self, request_id, domain, start):
+        """
+        Method to log the end of a successful search.
 
-        except Exception as err:
+        @param request_id: the request id of the current request
+        @param domain:     the domain to scan
+        @param start:      the start time of the search
+        """
 
-            end = time.time()
+        end = time.time()
 
-            self._log.error(
-                'Module failed     - ' + \
+        self._record_run(end - start, 'success')
+
+        self._log.info(
+            'Module finished   - Request ID: {} - Domain: {} - Time: {:.2f}s'
+            .format(request_id, domain, end - start))
+
+    ############################################################################
+
+    def _search_failed(self, err, request_id, domain, counter, start):
+        """
+        Method to log a failed search. Raises a final ModuleError if a module
+        which wants to rerun exceeded the maximal number of reruns.
+
+        @param err:        the raised exception
+        @param request_id: the request id of the current request
+        @param domain:     the domain to scan
+        @param counter:    count the number of runs for this request
+        @param start:      the start time of the search
+        """
+
+        end = time.time()
+
+        if isinstance(err, ModuleError) and err.rerun_flag:
+
+            if counter > self.Config.rerun_counter_max:
+
+                # finally terminates the module despite the desire of rerun
+
+                self._record_run(end - start, 'expired')
+
+                self._log.error(
+                    'Module expired    - Request ID: {} - Domain: {}'
+                    .format(request_id, domain))
+
+                self._report_module_error(request_id, 'Module expired')
+
+                raise ModuleError
+
+            self._record_run(end - start, 'rerun')
+
+            self._log.info(
+                'Module unfinished - ' + \
                 'Request ID: {} - Domain: {} - Time: {:.2f}s'
                 .format(request_id, domain, end - start))
 
+            return
+
+        self._record_run(end - start, 'failure')
+
+        self._log.error(
+            'Module failed     - ' + \
+            'Request ID: {} - Domain: {} - Time: {:.2f}s'
+            .format(request_id, domain, end - start))
+
+        if not isinstance(err, ModuleError):
             self._log.debug(err)
 
-            raise
+    ############################################################################
 
-        ########################################################################
+    def _record_run(self, duration, outcome):
+        """
+        Method to record the run time and the outcome of a search.
 
-        end = time.time()
+        @param duration: the run time in seconds
+        @param outcome:  success, rerun, expired or failure
+        """
 
-        self._log.info(
-            'Module finished   - Request ID: {} - Domain: {} - Time: {:.2f}s'
-            .format(request_id, domain, end - start))
+        if self._metrics is None:
+            return
+
+        module = self.__class__.__name__
+
+        self._metrics.observe('module', duration, module=module)
+        self._metrics.increment('module_runs', module=module, outcome=outcome)
 
     ############################################################################
 
@@ -218,22 +331,123 @@ class DatasourceBase(metaclass=abc.ABCMeta):
 
     def _get_ip_addresses(self, domain):
         """
-        Method to get ip adresses to a given domain.
+        Method to get ip adresses to a given domain. The addresses are shared
+        with the other modules as long as the A records are valid, including
+        the addresses found by the DNSResolver.
 
         @param domain: the domain to get the ips
 
         @return: the ips of the domain
+
+        @raise socket.gaierror: if the domain can not be resolved
+        """
+
+        ip_addresses = self._dns_lookup(self._get_address_key(domain),
+            lambda: self._resolve_ip_addresses(domain))
+
+        if ip_addresses is None:
+
+            raise socket.gaierror(socket.EAI_NONAME,
+                'Name or service not known: {}'.format(domain))
+
+        return set(ip_addresses)
+
+    ############################################################################
+
+    def _share_ip_addresses(self, domain, ip_addresses, ttl):
+        """
+        Method to share the addresses of a domain found by a module with the
+        other modules.
+
+        @param domain:       the domain
+        @param ip_addresses: the ips of the domain
+        @param ttl:          the time to live of the A records
         """
 
-        ip_addresses = set()
+        if self._dns_cache is not None and ip_addresses:
 
-        address_info = socket.getaddrinfo(domain, None, family=socket.AF_INET,
-            proto=socket.IPPROTO_TCP)
+            self._dns_cache.store(self._get_address_key(domain),
+                frozenset(ip_addresses), ttl)
+
+    ############################################################################
+
+    def _get_address_key(self, domain):
+        """
+        Method to get the key of the addresses of a domain in the DNS cache.
+
+        @param domain: the domain, a trailing dot is ignored
+
+        @return: the key
+        """
+
+        return ('A', str(domain).lower().rstrip('.'))
+
+    ############################################################################
+
+    def _resolve_ip_addresses(self, domain):
+        """
+        Method to resolve the A records of a domain, so the addresses are
+        cached as long as the records are valid.
+
+        The resolver of the system is only used as fallback if DNS has no
+        address of the domain or fails, so /etc/hosts is honoured for names
+        unknown to DNS, but does not override the addresses found in DNS. Its
+        addresses are cached for dns_cache_address_ttl, since it does not
+        return the time to live of the records.
+
+        @param domain: the domain to resolve
+
+        @return: (ips, ttl), ips is None if the domain is unknown
+        """
+
+        try:
+
+            answer = dns.resolver.query(domain, 'A')
+
+            return frozenset(entry.address for entry in answer), \
+                answer.rrset.ttl
+
+        except dns.exception.DNSException:
+            pass
+
+        ########################################################################
+
+        try:
+
+            address_info = socket.getaddrinfo(domain, None,
+                family=socket.AF_INET, proto=socket.IPPROTO_TCP)
+
+        except socket.gaierror as e:
+
+            # caches unknown domains, but not temporary failures
+            if e.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA',
+                socket.EAI_NONAME)):
+
+                return None, self.Config.dns_cache_negative_ttl
+
+            raise
+
+        return frozenset(entry[4][0] for entry in address_info), \
+            self.Config.dns_cache_address_ttl
+
+    ############################################################################
+
+    def _dns_lookup(self, key, resolve):
+        """
+        Method to get a DNS answer from the shared cache. Concurrent lookups
+        of the same key by several modules resolve it only once.
+
+        @param key:     the key of the answer
+        @param resolve: function returning (value, ttl), value is None for a
+                        negative answer
+
+        @return: the answer or None for a negative answer
+        """
 
-        for entry in address_info:
-            ip_addresses.add(entry[4][0])
+        if self._dns_cache is None:
+            return resolve()[0]
 
-        return ip_addresses
+        return self._dns_cache.lookup(key, resolve)
 
 ################################################################################
 
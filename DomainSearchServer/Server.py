@@ -5,7 +5,7 @@
 The Server component of the DomainSearch application.
 
 Running Console, RatingRequestServer, QueuedDomainRequestServer,
-        TaskNotofocationServer, ScannedDomainRequestServer.
+        TaskNotofocationServer, ScannedDomainRequestServer, StatsServer.
 """
 
 """
@@ -13,10 +13,11 @@ Running Console, RatingRequestServer, QueuedDomainRequestServer,
 
 Queue structur:
 
-    queued_domain_request_queue = (request_id, domain)
+    queued_domain_request_queue = (request_id, domain, priority)
 
         request_id = int
         domain = str
+        priority = int (see additional.Priority)
 
     scanned_domain_request_queue = (request_id, domain)
 
@@ -29,25 +30,37 @@ Queue structur:
 import os
 import ast
 import sys
-import queue
+import argparse
 import signal
 import threading
 
 from pymysql import DatabaseError
 
 from additional import Config
+from additional import Priority
 from additional.Database import Database
 from additional.Logging import Logging
+from additional.Metrics import Metrics
+from additional.VerdictCache import VerdictCache
+from additional.InFlightIndex import InFlightIndex
+from additional.ConnectionRegistry import ConnectionRegistry
+from additional.ShardRouter import ShardRouter
+from additional.DomainImporter import DomainImporter
+from additional.PersistentQueue import PersistentQueue
 
 from additional.Console import Console
+from additional.Rating import Rating
 from additional.RatingRequestServer import RatingRequestServer
 from additional.RatingRequestServer import RatingRequestHandler
+from additional.AsyncRatingRequestServer import AsyncRatingRequestServer
 from additional.QueuedDomainRequestServer import QueuedDomainRequestServer
 from additional.QueuedDomainRequestServer import QueuedDomainRequestHandler
 from additional.TaskNotificationServer import TaskNotificationServer
 from additional.TaskNotificationServer import TaskNotificationHandler
 from additional.ScannedDomainRequestServer import ScannedDomainRequestServer
 from additional.ScannedDomainRequestServer import ScannedDomainRequestHandler
+from additional.StatsServer import StatsServer
+from additional.StatsServer import StatsHandler
 
 ################################################################################
 
@@ -105,12 +118,16 @@ def create_database_tables():
 
 def restore_backup(backup_queue, backup_path):
     """
-    Method to restore a backup and add the tasks to the given queue.
+    Method to restore a backup of earlier versions and add the tasks to the
+    given queue. The backup is read in chunks and every chunk is validated
+    with a single query.
 
     @param backup_queue: the queue to backup
     @param backup_path:  the location of the backup
     """
 
+    chunk = []
+
     with open(backup_path, 'r', encoding='utf-8') as backup_file:
 
         for line in backup_file:
@@ -119,67 +136,70 @@ def restore_backup(backup_queue, backup_path):
 
                 entry = ast.literal_eval(line)
 
-                if is_backup_entry_valid(entry):
-
-                    backup_queue.put(entry)
-
-                    log.debug('Task recovered: {}'.format(line))
-
-                else:
+                if not is_backup_entry_valid(entry):
                     raise SyntaxError
 
-            except SyntaxError:
+            except (SyntaxError, ValueError):
 
                 if Config.debug_mode:
                     raise
 
                 log.error('Not a valid entry: {}'.format(line))
 
+                continue
+
+            chunk.append(entry)
+
+            if len(chunk) >= Config.backup_restore_chunk_size:
+
+                restore_backup_entries(backup_queue, chunk)
+
+                chunk = []
+
+    restore_backup_entries(backup_queue, chunk)
+
     os.remove(backup_path)
 
     log.info('Backup recovery finished: {}'.format(backup_path))
 
 ################################################################################
 
-def is_backup_entry_valid(entry):
+def restore_backup_entries(backup_queue, entries):
     """
-    Method to check if a backup entry is valid.
+    Method to add the backup entries with a valid request to the given queue.
 
-    @param entry: (request_id, domain)
-
-    @return: True if valid, False otherwise
+    @param backup_queue: the queue to backup
+    @param entries:      list of (request_id, domain)
     """
 
-    # validates entry structure
+    # validates requests in database
+    valid_requests = db.get_valid_requests(entries)
 
-    if not(
-        isinstance(entry, tuple) and isinstance(entry[0], int) and \
-        isinstance(entry[1], str)):
+    for entry in entries:
 
-        return False
+        if entry in valid_requests:
 
-    # validates request in database
-    return db.is_request_valid(entry[0], entry[1])
+            backup_queue.put(entry)
 
-################################################################################
+            log.debug('Task recovered: {}'.format(entry))
 
-def create_backup(backup_queue, backup_path):
-    """
-    Method to create a backup from the given queue.
+        else:
+            log.error('Not a valid entry: {}'.format(entry))
 
-    @param backup_queue: the queue to backup
-    @param backup_path:  the location of the backup
-    """
+################################################################################
 
-    with open(backup_path, 'w', encoding='utf-8') as backup_file:
+def is_backup_entry_valid(entry):
+    """
+    Method to check if the structure of a backup entry is valid.
 
-        while not backup_queue.empty():
+    @param entry: (request_id, domain)
 
-            entry = backup_queue.get()
-            backup_file.write(str(entry) + '\n')
-            backup_queue.task_done()
+    @return: True if valid, False otherwise
+    """
 
-    log.info('Generation of backup succeeded: {}'.format(backup_path))
+    return \
+        isinstance(entry, tuple) and len(entry) == 2 and \
+        isinstance(entry[0], int) and isinstance(entry[1], str)
 
 ################################################################################
 
@@ -198,30 +218,52 @@ def clean_shutdown(exit_code):
     # shuts down the server components cleanly and waits until all open requests
     # are processed
 
+    if 'stats_server' in globals():
+
+        stats_server.shutdown()
+        stats_server.server_close()
+
+    if 'metrics' in globals():
+        metrics.stop()
+
     if 'rating_request_server' in globals():
+
         rating_request_server.shutdown()
+        rating_request_server.server_close()
+
+    if 'rating' in globals():
+        rating.stop()
+
+    # stops a running import before the queue is closed
+    if 'domain_importer' in globals():
+        domain_importer.stop()
 
     if 'queued_domain_request_server' in globals():
+
         queued_domain_request_server.shutdown()
+        queued_domain_request_server.server_close()
 
     if 'scanned_domain_request_server' in globals():
+
         scanned_domain_request_server.shutdown()
+        scanned_domain_request_server.server_close()
 
-    ############################################################################
+    # stops accepting notifications before the scanned-domain-request queue
+    # is closed
+    if 'tast_notification_server' in globals():
 
-    # creates a backup from queued-domain-request queue
-    if 'queued_domain_request_queue' in globals() and \
-        not queued_domain_request_queue.empty():
+        tast_notification_server.shutdown()
+        tast_notification_server.server_close()
 
-        create_backup(queued_domain_request_queue,
-            Config.queued_domain_requests_backup_path)
+    ############################################################################
 
-    # creates a backup from scanned-domain-request queue
-    if 'scanned_domain_request_queue' in globals() and \
-        not scanned_domain_request_queue.empty():
+    # closes the journal of the queued-domain-request queue
+    if 'queued_domain_request_queue' in globals():
+        queued_domain_request_queue.close()
 
-        create_backup(scanned_domain_request_queue,
-            Config.scanned_domain_requests_backup_path)
+    # closes the journal of the scanned-domain-request queue
+    if 'scanned_domain_request_queue' in globals():
+        scanned_domain_request_queue.close()
 
     ############################################################################
 
@@ -258,6 +300,24 @@ def validate_configuration():
 
 ################################################################################
 
+def configure_shard(shard_name):
+    """
+    Method to apply the configuration values of a shard.
+
+    @param shard_name: the name of the shard
+    """
+
+    if shard_name not in Config.shards:
+
+        log.error('Shard not configured: {}'.format(shard_name))
+
+        sys.exit(1)
+
+    for key, value in Config.shards[shard_name].items():
+        setattr(Config, key, value)
+
+################################################################################
+
 def signal_handler(signal, frame):
     """
     Method to handle signals.
@@ -297,6 +357,17 @@ if __name__ == "__main__":
 
     ############################################################################
 
+    # parses the commandline arguments
+
+    parser = argparse.ArgumentParser(description='DomainSearch Server')
+
+    parser.add_argument('--shard', help='the name of the shard to run as, ' +
+        'see the shards in the configuration file')
+
+    args = parser.parse_args()
+
+    ############################################################################
+
     # initialises the logger
     log = Logging('DomainSearchServer').get_logger()
 
@@ -304,6 +375,16 @@ if __name__ == "__main__":
 
     ############################################################################
 
+    # applies the configuration of the shard, before it is used anywhere
+
+    if args.shard:
+
+        configure_shard(args.shard)
+
+        log.info('Server is running as shard: {}'.format(args.shard))
+
+    ############################################################################
+
     # checks if another instance of this application is already running
 
     if os.path.isfile(Config.running_path):
@@ -328,10 +409,15 @@ if __name__ == "__main__":
 
     ############################################################################
 
+    # collects the counters and latencies of the server components
+    metrics = Metrics()
+
+    ############################################################################
+
     # initialises the database
 
     try:
-        db = Database()
+        db = Database(metrics)
 
     except DatabaseError:
 
@@ -360,15 +446,24 @@ if __name__ == "__main__":
 
     ############################################################################
 
-    # queue of queued-domain requests
-    queued_domain_request_queue = queue.Queue()
-
-    # queue of scanned-domain requests
-    scanned_domain_request_queue = queue.Queue()
+    # priority queue of queued-domain requests, restored from its journal,
+    # the dispatched requests stay in the journal until the scanners
+    # acknowledge them
+    queued_domain_request_queue = PersistentQueue(
+        Config.queued_domain_requests_journal_path,
+        priority=Priority.get_priority,
+        aging_interval=Config.queued_domain_request_aging_interval,
+        acknowledge=True)
+
+    # queue of scanned-domain requests, restored from its journal, the
+    # dispatched requests stay in the journal until the reviewers acknowledge
+    # them
+    scanned_domain_request_queue = PersistentQueue(
+        Config.scanned_domain_requests_journal_path, acknowledge=True)
 
     ############################################################################
 
-    # restores a possibly created backup
+    # imports a possibly created backup of earlier versions
 
     if os.path.isfile(Config.queued_domain_requests_backup_path):
 
@@ -382,25 +477,59 @@ if __name__ == "__main__":
 
     ############################################################################
 
-    # dictionary of connected scanners
+    # cache of recently requested domain verdicts
+    verdict_cache = VerdictCache()
+
+    # domains which are queued or being scanned, to queue them only once
+
+    in_flight_index = InFlightIndex()
+
+    in_flight_index.add_many([request[1] \
+        for request in queued_domain_request_queue.snapshot()])
+
+    ############################################################################
+
+    # connected scanners
+    scanners = ConnectionRegistry()
+
+    # connected reviewers
+    reviewers = ConnectionRegistry()
+
+    ############################################################################
+
+    # forwards the rating requests for domains of other shards
 
-    scanners = {}
-    scanners_lock = threading.Lock()
+    shard_router = None
 
-    # dictionary of connected reviewers
+    if args.shard:
+        shard_router = ShardRouter(args.shard, Config.shards)
 
-    reviewers = {}
-    reviewers_lock = threading.Lock()
+    ############################################################################
+
+    # determines the verdicts and resolves unknown domains in the background
+
+    rating = Rating(db, queued_domain_request_queue, verdict_cache,
+        in_flight_index, shard_router)
+    rating.start()
 
     ############################################################################
 
     # starts request handler for incomming rating requests
 
-    rating_request_server = RatingRequestServer((
-        Config.rating_request_server['host'],
-        Config.rating_request_server['port']),
-        RatingRequestHandler,
-        (db, queued_domain_request_queue))
+    if Config.rating_request_server_mode == 'asyncio':
+
+        rating_request_server = AsyncRatingRequestServer((
+            Config.rating_request_server['host'],
+            Config.rating_request_server['port']),
+            rating, metrics)
+
+    else:
+
+        rating_request_server = RatingRequestServer((
+            Config.rating_request_server['host'],
+            Config.rating_request_server['port']),
+            RatingRequestHandler,
+            (rating, metrics))
 
     rating_request_server_thread = \
         threading.Thread(target=rating_request_server.serve_forever)
@@ -415,7 +544,8 @@ if __name__ == "__main__":
         Config.queued_domain_request_server['host'],
         Config.queued_domain_request_server['port']),
         QueuedDomainRequestHandler,
-        (scanners, scanners_lock, running_event, queued_domain_request_queue))
+        (scanners, running_event, queued_domain_request_queue,
+        in_flight_index, metrics))
 
     queued_domain_request_server_thread = \
         threading.Thread(target=queued_domain_request_server.serve_forever)
@@ -430,7 +560,8 @@ if __name__ == "__main__":
         Config.task_notification_server['host'],
         Config.task_notification_server['port']),
         TaskNotificationHandler,
-        (db, scanned_domain_request_queue))
+        (db, scanned_domain_request_queue, verdict_cache, in_flight_index,
+        metrics))
 
     tast_notification_server_thread = \
         threading.Thread(target=tast_notification_server.serve_forever)
@@ -445,7 +576,7 @@ if __name__ == "__main__":
         Config.scanned_domain_request_server['host'],
         Config.scanned_domain_request_server['port']),
         ScannedDomainRequestHandler,
-        (reviewers, reviewers_lock, running_event, scanned_domain_request_queue))
+        (reviewers, running_event, scanned_domain_request_queue, metrics))
 
     scanned_domain_request_server_thread = \
         threading.Thread(target=scanned_domain_request_server.serve_forever)
@@ -454,11 +585,42 @@ if __name__ == "__main__":
 
     ############################################################################
 
+    # samples the queue depths and connections and serves the metrics
+
+    metrics.add_gauge('queued_domains', queued_domain_request_queue.qsize)
+    metrics.add_gauge('scanned_domains', scanned_domain_request_queue.qsize)
+    metrics.add_gauge('in_flight_domains', lambda: len(in_flight_index))
+    metrics.add_gauge('cached_verdicts', lambda: len(verdict_cache))
+    metrics.add_gauge('scanners', lambda: len(scanners))
+    metrics.add_gauge('reviewers', lambda: len(reviewers))
+
+    metrics.start()
+
+    stats_server = StatsServer((
+        Config.stats_server['host'],
+        Config.stats_server['port']),
+        StatsHandler,
+        (metrics,))
+
+    stats_server_thread = threading.Thread(target=stats_server.serve_forever)
+    stats_server_thread.daemon = True
+    stats_server_thread.start()
+
+    ############################################################################
+
+    # imports the domains of files in the background
+
+    domain_importer = DomainImporter(db, queued_domain_request_queue,
+        in_flight_index, shard_router)
+
+    ############################################################################
+
     # starts the console communiation
 
     console = Console((
-        db, scanners, scanners_lock, reviewers, reviewers_lock, running_event,
-        queued_domain_request_queue, scanned_domain_request_queue))
+        db, scanners, reviewers, running_event, queued_domain_request_queue,
+        scanned_domain_request_queue, in_flight_index, domain_importer,
+        shard_router))
     console.handle()
 
     ############################################################################
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Checks the routing of rating requests between shards running as separate
+processes on the local machine.
+
+Every shard runs the RatingRequestServer with a ShardRouter in its own
+process. The rating of a shard is replaced by one naming the shard, so no
+database is needed. The check passes if every domain is rated by the owner
+the HashRing assigns it to, whichever shard has received the request, and if
+the domains of a stopped shard are answered with "shard unavailable".
+"""
+
+"""
+################################################################################
+
+Usage:
+
+    cd DomainSearchServer
+    python3 ShardCheck.py [--shards 3] [--port 18010] [--domains 500]
+
+################################################################################
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import multiprocessing
+
+# the logger of the server writes to this directory
+os.makedirs('logs', exist_ok=True)
+
+from additional import Config
+from additional.Metrics import Metrics
+from additional.Rating import Rating
+from additional.HashRing import HashRing
+from additional.ShardRouter import ShardRouter
+from additional.Protocol import MessageReader
+from additional.Protocol import send_message
+from additional.RatingRequestServer import RatingRequestServer
+from additional.RatingRequestServer import RatingRequestHandler
+
+################################################################################
+
+class ShardCheckRating(Rating):
+    """
+    This class forwards the domains of other shards like the Rating of a
+    shard, but rates its own domains by naming the shard.
+    """
+
+    def __init__(self, shard_name, shard_router):
+
+        Rating.__init__(self, None, None, None, None, shard_router)
+
+        self._shard_name = shard_name
+
+    ############################################################################
+
+    def _rate_local(self, domains):
+        """
+        Method to rate the domains of this shard.
+
+        @param domains: the requested domains
+
+        @return: list of ratings in the order of the domains
+        """
+
+        return [{
+            'domain': domain,
+            'access': 'permitted',
+            'shard': self._shard_name
+        } for domain in domains]
+
+################################################################################
+
+def run_shard(shard_name, shards):
+    """
+    Method to serve the rating requests of a shard until the process is
+    terminated.
+
+    @param shard_name: the name of the shard
+    @param shards:     the configuration of every shard by its name
+    """
+
+    address = shards[shard_name]['rating_request_server']
+
+    rating = ShardCheckRating(shard_name, ShardRouter(shard_name, shards))
+
+    server = RatingRequestServer((address['host'], address['port']),
+        RatingRequestHandler, (rating, Metrics()))
+
+    server.serve_forever()
+
+################################################################################
+
+def request_ratings(address, domains):
+    """
+    Method to send a rating request for several domains to a shard.
+
+    @param address: (host, port) of the rating-request server
+    @param domains: the domains to rate
+
+    @return: list of ratings in the order of the domains
+    """
+
+    with socket.create_connection(address, Config.shard_forward_timeout) \
+        as sock:
+
+        send_message(sock, {
+            'request': {
+                'ratings': {
+                    'domains': domains
+                }
+            }
+        })
+
+        return MessageReader(sock).read_message()['response']['ratings']
+
+################################################################################
+
+def wait_listening(address, timeout):
+    """
+    Method to wait until a server accepts connections.
+
+    @param address: (host, port) of the server
+    @param timeout: the maximal time to wait in seconds
+
+    @return: True if the server accepts connections, False otherwise
+    """
+
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+
+        try:
+
+            with socket.create_connection(address, 1):
+                return True
+
+        except OSError:
+            time.sleep(0.1)
+
+    return False
+
+################################################################################
+
+def check_ratings(shard_name, address, domains, hash_ring, stopped):
+    """
+    Method to check the ratings a shard responds.
+
+    @param shard_name: the name of the shard receiving the request
+    @param address:    (host, port) of its rating-request server
+    @param domains:    the domains to rate
+    @param hash_ring:  the hash ring assigning the domains to the shards
+    @param stopped:    the names of the stopped shards
+
+    @return: the number of wrong ratings
+    """
+
+    errors = 0
+
+    ratings = request_ratings(address, domains)
+
+    for domain, rating in zip(domains, ratings):
+
+        owner = hash_ring.get_node(domain)
+
+        if owner in stopped:
+            expected = {'domain': domain, 'msg': 'shard unavailable'}
+
+        else:
+            expected = {'domain': domain, 'access': 'permitted',
+                'shard': owner}
+
+        if rating != expected:
+
+            print(' Error: shard {} rated {} as {}, expected {}'.format(
+                shard_name, domain, rating, expected))
+
+            errors += 1
+
+    return errors
+
+################################################################################
+################################################################################
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description='DomainSearch Server shard check')
+
+    parser.add_argument('--shards', type=int, default=3,
+        help='the number of shards to start')
+    parser.add_argument('--port', type=int, default=18010,
+        help='the port of the first shard, the next shards use the ' +
+        'following hundreds')
+    parser.add_argument('--domains', type=int, default=500,
+        help='the number of domains to rate')
+
+    args = parser.parse_args()
+
+    ############################################################################
+
+    # shards on the local machine, named a, b, c, ...
+
+    shards = {chr(ord('a') + index): {
+        'rating_request_server': {
+            'host': 'localhost',
+            'port': args.port + 100 * index
+        }
+    } for index in range(args.shards)}
+
+    addresses = {name: ('localhost', shard['rating_request_server']['port']) \
+        for name, shard in shards.items()}
+
+    hash_ring = HashRing(shards, Config.hash_ring_replicas)
+
+    domains = ['domain{}.example'.format(index) \
+        for index in range(args.domains)]
+
+    ############################################################################
+
+    processes = {}
+
+    for name in sorted(shards):
+
+        processes[name] = multiprocessing.Process(target=run_shard,
+            args=(name, shards))
+        processes[name].daemon = True
+        processes[name].start()
+
+    errors = 0
+
+    try:
+
+        for name, address in sorted(addresses.items()):
+
+            if not wait_listening(address, 10):
+
+                print(' Error: shard {} does not listen on {}'.format(
+                    name, address))
+
+                sys.exit(1)
+
+        ########################################################################
+
+        # every shard routes every domain to its owner
+
+        for name, address in sorted(addresses.items()):
+            errors += check_ratings(name, address, domains, hash_ring, set())
+
+        owners = [hash_ring.get_node(domain) for domain in domains]
+
+        print(' Info: {} domain(s) rated by {} shard(s): {}'.format(
+            len(domains), len(shards), ', '.join('{} {}'.format(name,
+            owners.count(name)) for name in sorted(shards))))
+
+        ########################################################################
+
+        # the domains of a stopped shard are not rated by another shard
+
+        stopped = max(shards)
+
+        processes[stopped].terminate()
+        processes[stopped].join()
+
+        for name, address in sorted(addresses.items()):
+
+            if name != stopped:
+
+                errors += check_ratings(name, address, domains, hash_ring,
+                    {stopped})
+
+        print(' Info: shard {} stopped, its domains are unavailable'
+            .format(stopped))
+
+    finally:
+
+        for process in processes.values():
+            process.terminate()
+
+    ############################################################################
+
+    if errors:
+
+        print(' Error: {} wrong rating(s)'.format(errors))
+
+        sys.exit(1)
+
+    print(' Info: shard routing passed')
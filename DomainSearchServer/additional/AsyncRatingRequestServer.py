@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+"""
+The AsyncRatingRequestServer handles incoming rating requests on an event loop.
+"""
+
+"""
+################################################################################
+
+Messages:
+
+    The messages are the same as the ones of the RatingRequestServer.
+
+    A client keeps the connection open and may send further requests before
+    the responses to earlier ones have arrived. The responses are sent in the
+    order of the requests.
+
+################################################################################
+"""
+
+import time
+import asyncio
+import threading
+import concurrent.futures
+
+from additional import Config
+from additional.Logging import Logging
+from additional.Protocol import RECEIVE_SIZE
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
+from additional.Protocol import encode_message
+
+################################################################################
+
+class AsyncRatingRequestServer:
+    """
+    This class serves all rating connections on one event loop. Verdicts of
+    cached domains are responded on the event loop directly, all other
+    requests are rated by a bounded number of worker threads. The requests of
+    a connection are rated at once up to a bounded number, so the memory of a
+    connection stays bounded.
+    """
+
+    def __init__(self, addr, rating, metrics):
+        """
+        Binds the server to the given address.
+
+        @param addr:    (host, port) to listen on
+        @param rating:  the rating used to determine the verdicts
+        @param metrics: the metrics registry of the server
+        """
+
+        self._rating = rating
+        self._metrics = metrics
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            Config.rating_request_server_workers)
+
+        # writers of the open connections, to close them on shutdown
+        self._writers = set()
+
+        self._stopped_event = threading.Event()
+
+        ########################################################################
+
+        self._loop = asyncio.new_event_loop()
+
+        asyncio.set_event_loop(self._loop)
+
+        self._server = self._loop.run_until_complete(asyncio.start_server(
+            self._handle_connection, addr[0] or None, addr[1],
+            reuse_address=True))
+
+        asyncio.set_event_loop(None)
+
+    ############################################################################
+
+    def serve_forever(self):
+        """
+        Method to run the event loop until the server is shut down.
+        """
+
+        asyncio.set_event_loop(self._loop)
+
+        try:
+            self._loop.run_forever()
+
+        finally:
+            self._stopped_event.set()
+
+    ############################################################################
+
+    def shutdown(self):
+        """
+        Method to stop the event loop and to wait until it has stopped.
+        """
+
+        if self._loop.is_running():
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+            self._stopped_event.wait()
+
+    ############################################################################
+
+    def server_close(self):
+        """
+        Method to close the server and all open connections.
+        """
+
+        self._server.close()
+
+        for writer in list(self._writers):
+            writer.close()
+
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+        self._executor.shutdown()
+
+    ############################################################################
+
+    async def _handle_connection(self, stream_reader, writer):
+        """
+        Method to handle the requests of a client. Every request is rated by
+        its own task, so a slow request does not delay the rating of the
+        following ones. The tasks send their responses in request order.
+
+        @param stream_reader: the stream to read the requests from
+        @param writer:        the stream to write the responses to
+        """
+
+        self._writers.add(writer)
+
+        reader = MessageReader(None)
+
+        # limits the requests of the connection rated at once
+        semaphore = asyncio.Semaphore(
+            Config.rating_request_connection_requests)
+
+        # task sending the response to the most recent request
+        previous = None
+
+        try:
+
+            while 1:
+
+                try:
+
+                    message = reader.parse_message()
+
+                    if message is None:
+
+                        data = await stream_reader.read(RECEIVE_SIZE)
+
+                        # detects closed connection
+                        if not data:
+                            break
+
+                        reader.feed(data)
+
+                        continue
+
+                except MessageError as error:
+
+                    self._log.error('Invalid message: {}'.format(error.data))
+
+                    # answers after the responses to the earlier requests
+                    if previous is None or await previous:
+
+                        writer.write(encode_message({
+                            'response': {
+                                'msg': 'invalid request'
+                            }
+                        }))
+
+                        await writer.drain()
+
+                    previous = None
+
+                    break
+
+                ################################################################
+
+                await semaphore.acquire()
+
+                # a failed request closes the connection, so no further
+                # requests are read
+                if previous is not None and previous.done() and \
+                    not previous.result():
+
+                    semaphore.release()
+
+                    break
+
+                previous = asyncio.ensure_future(self._respond(message,
+                    previous, writer))
+
+                previous.add_done_callback(lambda task: semaphore.release())
+
+            # waits until the responses to all requests have been sent
+            if previous is not None:
+                await previous
+
+        except ConnectionError:
+
+            self._log.error('Connection aborted: {}'
+                .format(writer.get_extra_info('peername')))
+
+        finally:
+
+            self._writers.discard(writer)
+
+            writer.close()
+
+    ############################################################################
+
+    async def _respond(self, message, previous, writer):
+        """
+        Method to rate a request and to send its response after the response
+        to the previous request of the connection.
+
+        @param message:  the received message
+        @param previous: the task responding the previous request or None
+        @param writer:   the stream to write the response to
+
+        @return: True if the response has been sent, False if the connection
+                 has been closed
+        """
+
+        try:
+            response = await self._rate(message)
+
+        except Exception as e:
+
+            # closes the connection like the threaded server, so the client
+            # does not wait for the response
+            self._log.error('Rating request failed: {}: {}'
+                .format(writer.get_extra_info('peername'), e))
+
+            response = None
+
+        ########################################################################
+
+        # keeps the order of the responses
+        if previous is not None and not await previous:
+            return False
+
+        if response is None:
+
+            writer.close()
+
+            return False
+
+        try:
+
+            # sends the verdict
+            writer.write(encode_message(response))
+
+            await writer.drain()
+
+        except ConnectionError:
+
+            self._log.error('Connection aborted: {}'
+                .format(writer.get_extra_info('peername')))
+
+            writer.close()
+
+            return False
+
+        return True
+
+    ############################################################################
+
+    async def _rate(self, message):
+        """
+        Method to determine the response to a rating request.
+
+        @param message: the received message
+
+        @return: the response
+        """
+
+        try:
+            domains, batch, forwarded = self._rating.parse_request(message)
+
+        except MessageError as error:
+
+            self._log.error('Invalid message: {}'.format(error.data))
+
+            return {
+                'response': {
+                    'msg': 'invalid request'
+                }
+            }
+
+        self._log.debug('Received rating request: {}'.format(domains))
+
+        ########################################################################
+
+        started = time.monotonic()
+
+        # responds cached verdicts without leaving the event loop
+        response = self._rating.respond_cached(domains, batch)
+
+        if response is None:
+
+            response = await self._loop.run_in_executor(self._executor,
+                self._rating.respond, domains, batch, forwarded)
+
+        self._metrics.increment('requests', role='rating')
+        self._metrics.increment('rated_domains', len(domains))
+        self._metrics.observe('rating', time.monotonic() - started)
+
+        return response
@@ -18,6 +18,13 @@ database_connection = {
     'charset': 'utf8'
 }
 
+# parameter for the database connection pool
+database_pool = {
+    'min_size': 1,
+    'max_size': 10,
+    'health_check_interval': 30 # second(s)
+}
+
 # address and port of the rating-request server
 # use empty string as host to listen on all interfaces
 rating_request_server = {
@@ -46,23 +53,177 @@ scanned_domain_request_server = {
     'port': 8040
 }
 
+# address and port of the stats server, serving the metrics over HTTP
+# the default host only accepts connections of the local machine
+stats_server = {
+    'host': 'localhost',
+    'port': 8050
+}
+
+# number of recent samples to calculate the latency percentiles
+metrics_latency_samples = 1000 # sample(s)
+
+# time between two samples of the queue depths and connections
+metrics_gauge_interval = 5 # second(s)
+
+# number of samples of the queue depths and connections kept as history
+metrics_gauge_history = 720 # sample(s)
+
+# shards splitting the domain space, empty for a single server
+# every shard has a name and the configuration values it overrides, the server
+# is started as a shard with the argument --shard name
+# a shard needs its own rating-request server, the other shards forward rating
+# requests to its host (empty string for the local machine)
+# a shard only queues and scans its own domains, a file is imported completely
+# by adding it on every shard
+# all shards share the database, scanners and reviewers connect to the servers
+# of a single shard
+# shards running on the same machine need their own ports and paths, e.g. two
+# local shards started with
+#     python3 Server.py --shard a
+#     python3 Server.py --shard b
+# shards = {
+#     'a': {
+#         'rating_request_server': {'host': '', 'port': 8010},
+#         'queued_domain_request_server': {'host': '', 'port': 8020},
+#         'task_notification_server': {'host': '', 'port': 8030},
+#         'scanned_domain_request_server': {'host': '', 'port': 8040},
+#         'stats_server': {'host': 'localhost', 'port': 8050},
+#         'queued_domain_requests_journal_path':
+#             'resources/queued_domain_requests_journal_a',
+#         'queued_domain_requests_backup_path':
+#             'resources/queued_domain_requests_backup_a',
+#         'scanned_domain_requests_journal_path':
+#             'resources/scanned_domain_requests_journal_a',
+#         'scanned_domain_requests_backup_path':
+#             'resources/scanned_domain_requests_backup_a',
+#         'running_path': 'resources/running_a'
+#     },
+#     'b': {
+#         'rating_request_server': {'host': '', 'port': 8110},
+#         'queued_domain_request_server': {'host': '', 'port': 8120},
+#         'task_notification_server': {'host': '', 'port': 8130},
+#         'scanned_domain_request_server': {'host': '', 'port': 8140},
+#         'stats_server': {'host': 'localhost', 'port': 8150},
+#         'queued_domain_requests_journal_path':
+#             'resources/queued_domain_requests_journal_b',
+#         'queued_domain_requests_backup_path':
+#             'resources/queued_domain_requests_backup_b',
+#         'scanned_domain_requests_journal_path':
+#             'resources/scanned_domain_requests_journal_b',
+#         'scanned_domain_requests_backup_path':
+#             'resources/scanned_domain_requests_backup_b',
+#         'running_path': 'resources/running_b'
+#     }
+# }
+shards = {}
+
+# number of points of every shard on the hash ring
+hash_ring_replicas = 100 # point(s)
+
+# timeout of a rating request forwarded to another shard
+shard_forward_timeout = 5 # second(s)
+
+# maximal time to wait for the scanners and reviewers on shutdown
+shutdown_timeout = 300 # second(s)
+
+# time between the reports of scanners and reviewers still connected on
+# shutdown
+shutdown_report_interval = 5 # second(s)
+
 # time until a domain entry expires in the database
 domain_expiration_time = 1 # day(s)
 
 # time until a request entry expires in the database
 request_expiration_time = 1 # day(s)
 
+# time until a queued domain may be queued again without a finished scan
+in_flight_expiration_time = 7 # day(s)
+
+# maximal number of domain verdicts held in the rating cache
+verdict_cache_size = 10000 # entries
+
+# time until a cached domain verdict expires
+verdict_cache_ttl = 300 # second(s)
+
+# execution mode of the rating-request server
+# threads: every connection is handled by its own thread
+# asyncio: all connections are handled on one event loop, domains which are not
+#          cached are rated by the rating-request server workers
+rating_request_server_mode = 'threads'
+
+# maximal number of domains in a single rating request
+rating_request_max_domains = 1000 # domain(s)
+
+# number of threads rating domains which are not cached in asyncio mode
+rating_request_server_workers = 16 # thread(s)
+
+# maximal number of requests of a connection rated at once in asyncio mode,
+# further requests are read after the oldest response has been sent
+rating_request_connection_requests = 8 # request(s)
+
+# number of threads resolving unknown domains in the background
+domain_resolver_workers = 8 # thread(s)
+
+# maximal number of domains waiting to be resolved
+domain_resolver_queue_size = 10000 # domain(s)
+
+# maximal number of resolvable domains added to the database at once
+domain_resolver_batch_size = 100 # domain(s)
+
+# maximal number of unresolvable domains held in the negative cache
+domain_resolver_negative_cache_size = 10000 # entries
+
+# time until an unresolvable domain is resolved again
+domain_resolver_negative_cache_ttl = 300 # second(s)
+
+# number of threads resolving the domains of an imported file
+domain_import_workers = 32 # thread(s)
+
+# number of domains of an imported file which are added to the queue at once
+domain_import_chunk_size = 1000 # domain(s)
+
 # timeout to get task from blocked queue
 queued_domain_request_server_timeout = 1 # second(s)
 
-# path to the queued-domain-requests backup
+# maximal number of tasks sent to a scanner at once
+queued_domain_request_server_max_tasks = 100 # task(s)
+
+# time until a waiting queued domain is handled like one of the next higher
+# priority class, so imports and rescans are not starved by rating requests
+queued_domain_request_aging_interval = 600 # second(s)
+
+# path to the queued-domain-requests journal
+queued_domain_requests_journal_path = 'resources/queued_domain_requests_journal'
+
+# path to the queued-domain-requests backup of earlier versions
 queued_domain_requests_backup_path = 'resources/queued_domain_requests_backup'
 
 # timeout to get task from blocked queue
 scanned_domain_request_server_timeout = 1 # second(s)
 
-# path to the scanned-domain-requests backup
+# maximal number of tasks sent to a reviewer at once
+scanned_domain_request_server_max_tasks = 100 # task(s)
+
+# path to the scanned-domain-requests journal
+scanned_domain_requests_journal_path = \
+    'resources/scanned_domain_requests_journal'
+
+# path to the scanned-domain-requests backup of earlier versions
 scanned_domain_requests_backup_path = 'resources/scanned_domain_requests_backup'
 
+# number of backup entries validated with a single query
+backup_restore_chunk_size = 1000 # entries
+
+# number of journal records before outdated records are removed
+queue_journal_compaction_threshold = 100000 # record(s)
+
+# writes every journal record to disk before it is confirmed
+# True:  queued tasks survive a crash of the operating system
+# False: queued tasks survive a crash of the server, the records written
+#        during the last seconds before a crash of the operating system or a
+#        power failure may be lost, as they are still in the page cache
+queue_journal_sync = False
+
 # path to the running file
 running_path = 'resources/running'
\ No newline at end of file
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+The ConnectionRegistry holds the connected scanners or reviewers.
+"""
+
+import time
+import threading
+
+################################################################################
+
+class ConnectionRegistry:
+    """
+    This class holds the established connections of a request server. Waiting
+    threads are notified as soon as the last connection has been removed, so
+    a shutdown can wait for the connected workers without polling.
+    """
+
+    def __init__(self):
+
+        # (address, connected) by port
+        self._connections = {}
+
+        self._condition = threading.Condition()
+
+    ############################################################################
+
+    def add(self, client_address):
+        """
+        Method to add a connection.
+
+        @param client_address: (address, port) of the client
+        """
+
+        with self._condition:
+
+            self._connections[client_address[1]] = (
+                client_address[0], time.strftime("%d.%m.%Y %H:%M:%S"))
+
+    ############################################################################
+
+    def remove(self, client_address):
+        """
+        Method to remove a connection and to notify the waiting threads if it
+        has been the last one.
+
+        @param client_address: (address, port) of the client
+        """
+
+        with self._condition:
+
+            self._connections.pop(client_address[1], None)
+
+            if not self._connections:
+                self._condition.notify_all()
+
+    ############################################################################
+
+    def get_connections(self):
+        """
+        Method to get the established connections.
+
+        @return: list of (port, address, connected)
+        """
+
+        with self._condition:
+
+            return [(port, address, connected) \
+                for port, (address, connected) in self._connections.items()]
+
+    ############################################################################
+
+    def wait_empty(self, timeout=None):
+        """
+        Method to wait until all connections have been removed.
+
+        @param timeout: the maximal time to wait in seconds, None for no limit
+
+        @return: True if no connection is left, False if the timeout expired
+        """
+
+        with self._condition:
+
+            return self._condition.wait_for(
+                lambda: not self._connections, timeout)
+
+    ############################################################################
+
+    def __len__(self):
+
+        with self._condition:
+            return len(self._connections)
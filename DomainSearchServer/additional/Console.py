@@ -9,10 +9,11 @@ The Console handles the commandline communication of the server.
 
 Queue structur:
 
-    queued_domain_request_queue = (request_id, domain)
+    queued_domain_request_queue = (request_id, domain, priority)
 
         request_id = int
         domain = str
+        priority = int (see additional.Priority)
 
     scanned_domain_request_queue = (request_id, domain)
 
@@ -22,10 +23,13 @@ Queue structur:
 ################################################################################
 """
 
+import os
+import time
 import socket
-from datetime import datetime
 
 from additional import Config
+from additional import Priority
+from additional import Expiration
 from additional.Logging import Logging
 
 ################################################################################
@@ -39,12 +43,13 @@ class Console():
 
         self._db = arguments[0]
         self._scanners = arguments[1]
-        self._scanners_lock = arguments[2]
-        self._reviewers = arguments[3]
-        self._reviewers_lock = arguments[4]
-        self._running_event = arguments[5]
-        self._queued_domain_request_queue = arguments[6]
-        self._scanned_domain_request_queue = arguments[7]
+        self._reviewers = arguments[2]
+        self._running_event = arguments[3]
+        self._queued_domain_request_queue = arguments[4]
+        self._scanned_domain_request_queue = arguments[5]
+        self._in_flight_index = arguments[6]
+        self._domain_importer = arguments[7]
+        self._shard_router = arguments[8]
 
         self._log = Logging(self.__class__.__name__).get_logger()
 
@@ -67,176 +72,177 @@ class Console():
                 break
 
             ####################################################################
+            if user_input.startswith('add file'):
 
-            if user_input.startswith('add domain') or \
-                user_input.startswith('add file'):
+                file_name = user_input.split(' ')[2]
+                file_path = 'resources/' + file_name
 
-                domains = set()
-                counter = 0
+                if not os.path.isfile(file_path):
 
-                ################################################################
-
-                # checks if user input is a domain or a file
-
-                is_file_import = user_input.startswith('add file')
-
-                ################################################################
-
-                if is_file_import:
-
-                    file_name = user_input.split(' ')[2]
-                    file_path = 'resources/' + file_name
-
-                    try:
+                    self._print('Error', 'File not found: {}'
+                        .format(file_path))
 
-                        with open(file_path, 'r', encoding='utf-8') as file:
+                    continue
 
-                            for entry in file:
+                # imports the domains in the background
 
-                                domain = entry.lower().strip()
+                if self._domain_importer.start(file_path):
 
-                                try:
+                    self._print('Info', 'Import started. ' +
+                        'Type "show import" to print its progress')
 
-                                    socket.getaddrinfo(domain, None,
-                                        family=socket.AF_INET,
-                                        proto=socket.IPPROTO_TCP)
+                else:
 
-                                    domains.add(domain)
+                    self._print('Error', 'Another import is running. ' +
+                        'Type "show import" to print its progress')
 
-                                except socket.gaierror:
-                                    pass
+            ####################################################################
 
-                    except IOError:
+            elif user_input.startswith('add domain'):
 
-                        self._print('Error', 'File not found: {}'
-                            .format(file_path))
+                domain = user_input.split(' ')[2]
+                domain = domain.lower().strip()
 
-                        continue
+                # a domain is only queued and scanned by its own shard
 
-                ################################################################
+                if self._shard_router and \
+                    not self._shard_router.is_local(domain):
 
-                else:
-
-                    domain = user_input.split(' ')[2]
-                    domain = domain.lower().strip()
+                    self._print('Error', ('Domain belongs to shard {}. ' +
+                        'Add it on that shard').format(
+                            self._shard_router.get_owner(domain)))
 
-                    try:
+                    continue
 
-                        socket.getaddrinfo(domain, None, family=socket.AF_INET,
-                            proto=socket.IPPROTO_TCP)
+                try:
 
-                        domains.add(domain)
+                    socket.getaddrinfo(domain, None, family=socket.AF_INET,
+                        proto=socket.IPPROTO_TCP)
 
-                    except socket.gaierror:
+                except socket.gaierror:
 
-                        self._print('Error', 'Invalid domain. ' +
-                            'Domain will not be added to the queue')
+                    self._print('Error', 'Invalid domain. ' +
+                        'Domain will not be added to the queue')
 
-                        continue
+                    continue
 
                 ################################################################
 
-                for domain in domains:
+                # checks if the domain already exists in the database and gets
+                # its most recently request
+                result = self._db.select_data('''
+                    SELECT domains.id, domains.updated, MAX(requests.created)
+                    FROM domains
+                    LEFT JOIN requests ON requests.domain_id = domains.id
+                    WHERE domains.name = %s
+                    GROUP BY domains.id''', (domain,))
 
-                    # checks if the domain already exists in the database
-                    result = self._db.select_data('''
-                        SELECT id, updated
-                        FROM domains
-                        WHERE name = %s''', (domain,))
+                ################################################################
 
-                    ############################################################
+                if result: # domain found
 
-                    if result: # domain found
+                    domain_id, domain_updated, request_created = result[0]
 
-                        domain_id = result[0][0]
-                        domain_updated = result[0][1]
+                    # an expired domain is handled like a rescan
+                    priority = Priority.RESCAN
 
-                        ########################################################
+                    ############################################################
 
-                        # checks if the domain entry is expired
+                    # checks if the domain entry and its request are expired
 
-                        timedelta = datetime.now() - domain_updated
+                    if not Expiration.is_expired(domain_updated,
+                        request_created):
 
-                        if timedelta.days < Config.domain_expiration_time:
+                        self._print('Info', 'Valid entry found. ' +
+                            'Task will not be added to the queue')
 
-                            if not is_file_import:
+                        continue
 
-                                self._print('Info',
-                                    'Valid domain entry found. ' +
-                                    'Task will not be added to the queue')
+                ################################################################
 
-                            continue
+                else: # domain not found
 
-                        ########################################################
+                    # creates a new domain entry or gets the one created
+                    # meanwhile by a rating request
+                    domain_id = self._db.insert_data('''
+                        INSERT INTO domains (name)
+                        VALUES(%s)
+                        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)''',
+                        (domain,))
 
-                        # gets the most recently request of the domain from the
-                        # database
-                        result = self._db.select_data('''
-                            SELECT created
-                            FROM requests
-                            WHERE domain_id = %s
-                            ORDER BY id DESC
-                            LIMIT 1''', (domain_id,))
+                    # a new domain is handled like a rating request
+                    priority = Priority.RATING
 
-                        ########################################################
+                ################################################################
 
-                        if result: # request found
+                # skips a domain which is already queued or being scanned
 
-                            request_created = result[0][0]
+                if not self._in_flight_index.add(domain):
 
-                            ####################################################
+                    self._print('Info', 'Domain is already queued. ' +
+                        'Task will not be added to the queue')
 
-                            # checks if the request entry is expired
+                    continue
 
-                            timedelta = datetime.now() - request_created
+                ################################################################
 
-                            if timedelta.days < Config.request_expiration_time:
+                try:
 
-                                if not is_file_import:
+                    request_id = self._db.insert_data('''
+                        INSERT INTO requests (domain_id)
+                        VALUES(%s)''', (domain_id,))
 
-                                    self._print('Info',
-                                        'Valid request entry found. ' +
-                                        'Task will not be added to the queue')
+                    self._queued_domain_request_queue.put(
+                        (request_id, domain, priority))
 
-                                continue
+                except Exception:
 
-                    ############################################################
+                    # allows the domain to be queued again
+                    self._in_flight_index.remove(domain)
 
-                    else: # domain not found
+                    raise
 
-                        domain_id = self._db.insert_data('''
-                            INSERT INTO domains (name)
-                            VALUES(%s)''', (domain,))
+                self._print('Info', 'Task successfully added to the queue')
 
-                    ############################################################
+            ####################################################################
 
-                    request_id = self._db.insert_data('''
-                        INSERT INTO requests (domain_id)
-                        VALUES(%s)''', (domain_id,))
+            elif user_input == 'show import':
 
-                    self._queued_domain_request_queue.put((request_id, domain))
+                progress = self._domain_importer.get_progress()
 
-                    counter += 1
+                if not progress:
 
-                    if not is_file_import:
+                    self._print('Info', 'No import started')
 
-                        self._print('Info',
-                            'Task successfully added to the queue')
+                    continue
 
-                if is_file_import:
+                # uses the current time for a running import
+                duration = (progress['finished'] or time.time()) - \
+                    progress['started']
 
-                    self._print('Info',
-                        '{} domain(s) successfully added to the queue'
-                        .format(counter))
+                self._print('Info', ('Import of {} {} after {:.0f} ' +
+                    'second(s): {} domain(s) read, {} of other shards, ' +
+                    '{} invalid, {} with valid entry, ' +
+                    '{} already queued, {} added to the queue').format(
+                        progress['file'], progress['state'], duration,
+                        progress['read'], progress['foreign'],
+                        progress['invalid'], progress['valid'],
+                        progress['in_flight'], progress['queued']))
 
             ####################################################################
 
             elif user_input == 'show queued domains':
 
                 queue_size = self._queued_domain_request_queue.qsize()
+                queue_sizes = self._queued_domain_request_queue.qsizes()
 
-                self._print('Info', '{} domain(s) in the queue'
-                    .format(queue_size))
+                # number of domains of every priority class
+                class_sizes = ', '.join(['{}: {}'.format(name,
+                    queue_sizes.get(priority, 0)) \
+                    for priority, name in sorted(Priority.names.items())])
+
+                self._print('Info', '{} domain(s) in the queue ({})'
+                    .format(queue_size, class_sizes))
 
             ####################################################################
 
@@ -256,12 +262,12 @@ class Console():
             ####################################################################
 
             elif user_input == 'show scanners':
-                self._print_connected(self._scanners, self._scanners_lock)
+                self._print_connected(self._scanners)
 
             ####################################################################
 
             elif user_input == 'show reviewers':
-                self._print_connected(self._reviewers, self._reviewers_lock)
+                self._print_connected(self._reviewers)
 
             ####################################################################
 
@@ -272,22 +278,10 @@ class Console():
                 self._print('Info', 'Server is shutting down')
 
                 # waits until all scanners have closed the connection
-
-                while 1:
-
-                    with self._scanners_lock:
-
-                        if not self._scanners:
-                            break
+                self._wait_disconnected('scanner', self._scanners)
 
                 # waits until all reviewers have closed the connection
-
-                while 1:
-
-                    with self._reviewers_lock:
-
-                        if not self._reviewers:
-                            break
+                self._wait_disconnected('reviewer', self._reviewers)
 
             ####################################################################
 
@@ -316,8 +310,11 @@ class Console():
  You can enter the following commands.
 
  add domain $domain   - adds a single domain to the queue
- add file $file       - adds all domains in the given file to the queue
+ add file $file       - adds all domains in the given file to the queue in
+                        the background, a shard only adds its own domains
+ show import          - prints the progress of the last import
  show queued domains  - prints the number of queued domains waiting to process
+                        per priority class
  show scanned domains - prints the number of scanned domains waiting to process
  show scanners        - prints all current connected scanners
  show reviewers       - prints all current connected reviewers
@@ -326,27 +323,66 @@ class Console():
 
     ############################################################################
 
-    def _print_connected(self, connections, connections_lock):
+    def _print_connected(self, connections):
         """
         Method to print established connections.
 
-        @param connections:      dict of held connections
-        @param connections_lock: lock object of the dict
+        @param connections: registry of held connections
 
         """
 
-        with connections_lock:
+        connections = connections.get_connections()
 
-            if not connections:
-                self._print('Info', 'No established connection')
+        if not connections:
+            self._print('Info', 'No established connection')
 
-            else:
+        else:
+
+            print('')
+
+            for port, address, connected in connections:
+
+                print(' - Port: {} - IP: {} - Connected: {}'
+                    .format(port, address, connected))
+
+            print('')
+
+    ############################################################################
+
+    def _wait_disconnected(self, name, connections):
+        """
+        Method to wait until all connections have been closed. The workers
+        still draining are printed regularly. Gives up after the shutdown
+        timeout.
+
+        @param name:        the name of the connected workers
+        @param connections: registry of held connections
+        """
+
+        deadline = time.monotonic() + Config.shutdown_timeout
+
+        while 1:
+
+            timeout = min(Config.shutdown_report_interval,
+                max(deadline - time.monotonic(), 0))
+
+            if connections.wait_empty(timeout):
+                return
+
+            if time.monotonic() >= deadline:
+
+                self._print('Error', ('{} {}(s) still connected. ' +
+                    'Shutdown continues without waiting')
+                    .format(len(connections), name))
+
+                self._log.error('{}(s) still connected on shutdown: {}'
+                    .format(name, connections.get_connections()))
 
-                print('')
+                self._print_connected(connections)
 
-                for key, value in connections.items():
+                return
 
-                    print(' - Port: {} - IP: {} - Connected: {}'
-                        .format(key, value[0], value[1]))
+            self._print('Info', 'Waiting for {} {}(s) to finish their tasks'
+                .format(len(connections), name))
 
-                print('')
+            self._print_connected(connections)
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+
+"""
+The DomainImporter adds the domains of a file to the queue in the background.
+"""
+
+"""
+################################################################################
+
+Queue structur:
+
+    queued_domain_request_queue = (request_id, domain, priority)
+
+        request_id = int
+        domain = str
+        priority = int (see additional.Priority)
+
+    Imported domains are queued with the lowest priority class.
+
+################################################################################
+"""
+
+import time
+import socket
+import threading
+import concurrent.futures
+
+from additional import Config
+from additional import Priority
+from additional import Expiration
+from additional.Logging import Logging
+
+################################################################################
+
+class DomainImporter:
+    """
+    This class imports the domains of a file without blocking the console.
+    The file is read in chunks. The domains of a chunk are resolved by a
+    bounded number of worker threads, while the domains of the previous chunk
+    are looked up, created and queued with a few queries. Domains with a valid
+    entry, domains which are already in flight and domains of other shards are
+    skipped.
+    """
+
+    def __init__(self, db, queued_domain_request_queue, in_flight_index,
+        shard_router):
+
+        self._db = db
+        self._queued_domain_request_queue = queued_domain_request_queue
+        self._in_flight_index = in_flight_index
+        self._shard_router = shard_router
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # progress of the current or last import
+        self._progress = {}
+        self._progress_lock = threading.Lock()
+
+    ############################################################################
+
+    def start(self, file_path):
+        """
+        Method to start the import of a file.
+
+        @param file_path: the location of the file
+
+        @return: True if the import has been started, False if an import is
+                 already running
+        """
+
+        if self.is_running():
+            return False
+
+        with self._progress_lock:
+
+            self._progress = {
+                'file': file_path,
+                'state': 'running',
+                'started': time.time(),
+                'finished': None,
+                'read': 0,
+                'foreign': 0,
+                'invalid': 0,
+                'valid': 0,
+                'in_flight': 0,
+                'queued': 0
+            }
+
+        self._stop_event.clear()
+
+        self._thread = threading.Thread(target=self._run, args=(file_path,))
+        self._thread.daemon = True
+        self._thread.start()
+
+        return True
+
+    ############################################################################
+
+    def stop(self):
+        """
+        Method to stop a running import and to wait until it has stopped.
+        Domains of the file which have not been read yet are dropped.
+        """
+
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    ############################################################################
+
+    def is_running(self):
+        """
+        Method to check if an import is running.
+
+        @return: True if running, False otherwise
+        """
+
+        return self._thread is not None and self._thread.is_alive()
+
+    ############################################################################
+
+    def get_progress(self):
+        """
+        Method to get the progress of the current or last import.
+
+        @return: dictionary of the progress, empty if nothing was imported
+        """
+
+        with self._progress_lock:
+            return dict(self._progress)
+
+    ############################################################################
+
+    def _run(self, file_path):
+        """
+        Method to import the domains of a file chunk by chunk.
+
+        @param file_path: the location of the file
+        """
+
+        state = 'finished'
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            Config.domain_import_workers)
+
+        # the domains of the previous chunk and the futures resolving them
+        previous = None
+
+        try:
+
+            for chunk in self._read_chunks(file_path):
+
+                if self._stop_event.is_set():
+
+                    state = 'stopped'
+
+                    break
+
+                # resolves the chunk while the previous one is added, the
+                # domains of other shards are imported by their own shards
+
+                futures = [executor.submit(self._resolve, domain) \
+                    if self._is_local(domain) else None for domain in chunk]
+
+                if previous:
+                    self._add_chunk(*previous)
+
+                previous = (chunk, futures)
+
+            if previous and state == 'finished':
+                self._add_chunk(*previous)
+
+        except IOError as e:
+
+            self._log.error('Import of {} failed: {}'.format(file_path, e))
+
+            state = 'failed'
+
+        except Exception as e:
+
+            if Config.debug_mode:
+                raise
+
+            self._log.error('Import of {} failed: {}'.format(file_path, e))
+
+            state = 'failed'
+
+        finally:
+
+            # drops the domains which have not been resolved yet
+
+            if previous:
+
+                for future in previous[1]:
+
+                    if future:
+                        future.cancel()
+
+            executor.shutdown()
+
+            with self._progress_lock:
+
+                self._progress['state'] = state
+                self._progress['finished'] = time.time()
+
+                progress = dict(self._progress)
+
+            self._log.info('Import of {} {}: {}'.format(
+                file_path, state, progress))
+
+    ############################################################################
+
+    def _read_chunks(self, file_path):
+        """
+        Method to read the distinct domains of a file in chunks.
+
+        @param file_path: the location of the file
+
+        @return: generator of lists of domains
+        """
+
+        with open(file_path, 'r', encoding='utf-8') as file:
+
+            chunk = []
+            domains = set()
+
+            for entry in file:
+
+                domain = entry.lower().strip()
+
+                if not domain or domain in domains:
+                    continue
+
+                chunk.append(domain)
+                domains.add(domain)
+
+                if len(chunk) >= Config.domain_import_chunk_size:
+
+                    yield chunk
+
+                    chunk = []
+                    domains = set()
+
+            if chunk:
+                yield chunk
+
+    ############################################################################
+
+    def _add_chunk(self, chunk, futures):
+        """
+        Method to add the resolvable domains of a chunk to the database and to
+        the queue, unless a valid entry exists or they are in flight.
+
+        @param chunk:   the domains of the chunk
+        @param futures: the futures resolving the domains, None for the
+                        domains of other shards
+        """
+
+        foreign = futures.count(None)
+
+        domains = [domain for domain, future in zip(chunk, futures) \
+            if future and future.result()]
+
+        invalid = len(chunk) - foreign - len(domains)
+        valid = 0
+        in_flight = 0
+        queued = 0
+
+        ########################################################################
+
+        if domains:
+
+            # gets the existing domain entries and their most recently request
+            result = self._db.select_data('''
+                SELECT domains.name, domains.id, domains.updated,
+                       MAX(requests.created)
+                FROM domains
+                LEFT JOIN requests ON requests.domain_id = domains.id
+                WHERE domains.name IN ({})
+                GROUP BY domains.id'''.format(
+                    ', '.join(['%s'] * len(domains))), domains)
+
+            # domain ids of the domains to queue
+            domain_ids = {}
+
+            for name, domain_id, domain_updated, request_created in result:
+
+                if Expiration.is_expired(domain_updated, request_created):
+                    domain_ids[name] = domain_id
+
+                else:
+                    valid += 1
+
+            # creates the domains without an entry
+
+            existing = set(row[0] for row in result)
+
+            new_domains = [domain for domain in domains \
+                if domain not in existing]
+
+            domain_ids.update(self._add_domains(new_domains))
+
+            ####################################################################
+
+            # skips domains which are already queued or being scanned
+
+            added = self._in_flight_index.add_many(list(domain_ids))
+
+            in_flight = len(domain_ids) - len(added)
+
+            queued = self._add_requests(
+                [(domain, domain_ids[domain]) for domain in added])
+
+        ########################################################################
+
+        with self._progress_lock:
+
+            self._progress['read'] += len(chunk)
+            self._progress['foreign'] += foreign
+            self._progress['invalid'] += invalid
+            self._progress['valid'] += valid
+            self._progress['in_flight'] += in_flight
+            self._progress['queued'] += queued
+
+            progress = dict(self._progress)
+
+        self._log.info('Import of {} in progress: {}'.format(
+            progress['file'], progress))
+
+    ############################################################################
+
+    def _add_domains(self, domains):
+        """
+        Method to create domain entries with a single query.
+
+        @param domains: the domains to create
+
+        @return: dictionary of the domain ids by domain
+        """
+
+        if not domains:
+            return {}
+
+        # creates the new domain entries, entries created meanwhile are kept
+        self._db.insert_many_data('''
+            INSERT INTO domains (name)
+            VALUES(%s)
+            ON DUPLICATE KEY UPDATE name = name''',
+            [(domain,) for domain in domains])
+
+        result = self._db.select_data('''
+            SELECT name, id
+            FROM domains
+            WHERE name IN ({})'''.format(', '.join(['%s'] * len(domains))),
+            domains)
+
+        return dict(result)
+
+    ############################################################################
+
+    def _add_requests(self, entries):
+        """
+        Method to create new requests with a single query and to add them to
+        the queue. The domains which could not be queued are removed from the
+        in-flight index again.
+
+        @param entries: list of (domain, domain_id)
+
+        @return: the number of queued domains
+        """
+
+        if not entries:
+            return 0
+
+        # the number of domains added to the queue
+        queued = 0
+
+        try:
+
+            domain_ids = [domain_id for domain, domain_id in entries]
+
+            # creates the new request entries
+            self._db.insert_many_data('''
+                INSERT INTO requests (domain_id)
+                VALUES(%s)''', [(domain_id,) for domain_id in domain_ids])
+
+            # gets the ids of the new request entries
+            result = self._db.select_data('''
+                SELECT domain_id, MAX(id)
+                FROM requests
+                WHERE domain_id IN ({})
+                GROUP BY domain_id'''.format(
+                    ', '.join(['%s'] * len(domain_ids))), domain_ids)
+
+            request_ids = dict(result)
+
+            for domain, domain_id in entries:
+
+                self._queued_domain_request_queue.put(
+                    (request_ids[domain_id], domain, Priority.IMPORT))
+
+                queued += 1
+
+        except Exception:
+
+            # allows the domains which have not been queued to be queued again
+            self._in_flight_index.remove_many(
+                [domain for domain, domain_id in entries[queued:]])
+
+            raise
+
+        return queued
+
+    ############################################################################
+
+    def _is_local(self, domain):
+        """
+        Method to check if a domain belongs to this server.
+
+        @param domain: the domain to check
+
+        @return: True if it belongs to this shard or the server is no shard,
+                 False otherwise
+        """
+
+        return self._shard_router is None or \
+            self._shard_router.is_local(domain)
+
+    ############################################################################
+
+    def _resolve(self, domain):
+        """
+        Method to check if a domain can be resolved.
+
+        @param domain: the domain to resolve
+
+        @return: True if resolvable, False otherwise
+        """
+
+        try:
+
+            socket.getaddrinfo(domain, None, family=socket.AF_INET,
+                proto=socket.IPPROTO_TCP)
+
+        except (socket.gaierror, UnicodeError):
+            return False
+
+        return True
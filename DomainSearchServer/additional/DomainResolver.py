@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+The DomainResolver validates requested domains in the background.
+"""
+
+"""
+################################################################################
+
+Queue structur:
+
+    pending_queue = domain
+
+        domain = str
+
+################################################################################
+"""
+
+import time
+import queue
+import socket
+import threading
+import collections
+
+from additional import Config
+from additional.Logging import Logging
+
+################################################################################
+
+class DomainResolver:
+    """
+    This class checks if domains can be resolved without blocking the caller.
+    A bounded number of worker threads takes the submitted domains from a
+    bounded queue. Resolvable domains are collected and handed over to the
+    callback in batches. Unresolvable domains are kept in a negative cache for
+    a while, so repeated requests can be rejected without a further lookup.
+    """
+
+    def __init__(self, callback, workers=None, queue_size=None):
+        """
+        @param callback:   function called with a list of resolvable domains
+        @param workers:    the number of worker threads
+        @param queue_size: the maximal number of domains waiting to be resolved
+        """
+
+        self._callback = callback
+
+        self._workers = workers or Config.domain_resolver_workers
+        self._queue = queue.Queue(
+            queue_size or Config.domain_resolver_queue_size)
+
+        # domains which are waiting, being resolved or not yet handed over
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+        # resolvable domains not yet handed over to the callback
+        self._resolved = []
+        self._resolved_lock = threading.Lock()
+
+        # unresolvable domains and the time they have been resolved
+        self._negative_cache = collections.OrderedDict()
+        self._negative_cache_lock = threading.Lock()
+
+        self._running_event = threading.Event()
+        self._threads = []
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+    ############################################################################
+
+    def start(self):
+        """
+        Method to start the worker threads.
+        """
+
+        self._running_event.set()
+
+        for _ in range(self._workers):
+
+            thread = threading.Thread(target=self._run)
+            thread.start()
+
+            self._threads.append(thread)
+
+    ############################################################################
+
+    def stop(self):
+        """
+        Method to stop the worker threads. Domains which have not been
+        resolved yet are dropped.
+        """
+
+        self._running_event.clear()
+
+        for thread in self._threads:
+            thread.join()
+
+        self._threads = []
+
+        # hands over the domains resolved last
+        self._flush(True)
+
+    ############################################################################
+
+    def submit(self, domain):
+        """
+        Method to add a domain to the resolver queue.
+
+        @param domain: the domain to resolve
+
+        @return: True if the domain has been queued, False if it is already
+                 pending or the queue is full
+        """
+
+        return bool(self.submit_many([domain]))
+
+    ############################################################################
+
+    def submit_many(self, domains):
+        """
+        Method to add several domains to the resolver queue.
+
+        @param domains: the domains to resolve
+
+        @return: list of the queued domains, without the ones already pending
+                 or not fitting into the queue
+        """
+
+        queued = []
+
+        with self._pending_lock:
+
+            for domain in domains:
+
+                if domain in self._pending:
+                    continue
+
+                try:
+                    self._queue.put_nowait(domain)
+
+                except queue.Full:
+
+                    self._log.error('Resolver queue is full: {}'
+                        .format(domain))
+
+                    break
+
+                self._pending.add(domain)
+
+                queued.append(domain)
+
+        return queued
+
+    ############################################################################
+
+    def is_invalid(self, domain):
+        """
+        Method to check if a domain has recently been found unresolvable.
+
+        @param domain: the domain to check
+
+        @return: True if the domain is in the negative cache, False otherwise
+        """
+
+        with self._negative_cache_lock:
+
+            resolved = self._negative_cache.get(domain)
+
+            if resolved is None:
+                return False
+
+            # drops the entry if the time to live is exceeded
+            if time.monotonic() - resolved > \
+                Config.domain_resolver_negative_cache_ttl:
+
+                del self._negative_cache[domain]
+
+                return False
+
+            return True
+
+    ############################################################################
+
+    def _run(self):
+        """
+        Method to resolve queued domains until the resolver is stopped.
+        """
+
+        while self._running_event.is_set():
+
+            try:
+                domain = self._queue.get(timeout=1)
+
+            except queue.Empty:
+
+                # hands over the domains left by the other workers
+                self._flush(True)
+
+                continue
+
+            if self._resolve(domain):
+
+                with self._resolved_lock:
+                    self._resolved.append(domain)
+
+            else:
+
+                self._log.info('Invalid domain: {}'.format(domain))
+
+                self._add_invalid(domain)
+
+                with self._pending_lock:
+                    self._pending.discard(domain)
+
+            self._queue.task_done()
+
+            # hands over a full batch or the last domains of the queue
+            self._flush(self._queue.empty())
+
+    ############################################################################
+
+    def _flush(self, force):
+        """
+        Method to hand the resolvable domains over to the callback.
+
+        @param force: True to hand over fewer domains than a whole batch
+        """
+
+        with self._resolved_lock:
+
+            if not self._resolved or (not force and \
+                len(self._resolved) < Config.domain_resolver_batch_size):
+
+                return
+
+            domains = self._resolved
+            self._resolved = []
+
+        try:
+            self._callback(domains)
+
+        except Exception as e:
+
+            self._log.error('Processing of {} failed: {}'.format(domains, e))
+
+        finally:
+
+            with self._pending_lock:
+                self._pending.difference_update(domains)
+
+    ############################################################################
+
+    def _resolve(self, domain):
+        """
+        Method to check if a domain can be resolved.
+
+        @param domain: the domain to resolve
+
+        @return: True if resolvable, False otherwise
+        """
+
+        try:
+
+            socket.getaddrinfo(domain, None, family=socket.AF_INET,
+                proto=socket.IPPROTO_TCP)
+
+        except (socket.gaierror, UnicodeError):
+            return False
+
+        return True
+
+    ############################################################################
+
+    def _add_invalid(self, domain):
+        """
+        Method to add an unresolvable domain to the negative cache.
+
+        @param domain: the unresolvable domain
+        """
+
+        with self._negative_cache_lock:
+
+            self._negative_cache[domain] = time.monotonic()
+            self._negative_cache.move_to_end(domain)
+
+            # evicts the oldest entries
+            while len(self._negative_cache) > \
+                Config.domain_resolver_negative_cache_size:
+
+                self._negative_cache.popitem(last=False)
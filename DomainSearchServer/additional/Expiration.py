@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+The expiration of domain entries, shared by the rating requests, the import
+and the console.
+"""
+
+from datetime import datetime
+
+from additional import Config
+
+################################################################################
+
+def is_expired(domain_updated, request_created):
+    """
+    Method to check if a domain entry and its most recently request are
+    expired.
+
+    @param domain_updated:  the time the domain entry has been updated
+    @param request_created: the time the most recently request has been
+                            created, None if there is no request
+
+    @return: True if expired, False otherwise
+    """
+
+    # checks if the domain entry is expired
+
+    timedelta = datetime.now() - domain_updated
+
+    if timedelta.days < Config.domain_expiration_time:
+        return False
+
+    # checks if the request entry is expired
+
+    if request_created: # request found
+
+        timedelta = datetime.now() - request_created
+
+        if timedelta.days < Config.request_expiration_time:
+            return False
+
+    return True
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""
+The HashRing assigns keys to nodes by consistent hashing.
+"""
+
+import bisect
+import hashlib
+
+################################################################################
+
+class HashRing:
+    """
+    This class places several points of every node on a ring of hash values.
+    A key belongs to the node of the first point following the hash value of
+    the key. Adding or removing a node only moves the keys of its points.
+    """
+
+    def __init__(self, nodes, replicas):
+        """
+        @param nodes:    the names of the nodes
+        @param replicas: the number of points of every node
+        """
+
+        # (hash value, node) sorted by the hash value
+        points = sorted((self._hash('{}-{}'.format(node, replica)), node) \
+            for node in nodes for replica in range(replicas))
+
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+
+    ############################################################################
+
+    def get_node(self, key):
+        """
+        Method to get the node a key belongs to.
+
+        @param key: the key
+
+        @return: the name of the node
+        """
+
+        index = bisect.bisect(self._hashes, self._hash(key))
+
+        # the ring continues with the first point
+        if index == len(self._hashes):
+            index = 0
+
+        return self._nodes[index]
+
+    ############################################################################
+
+    def _hash(self, key):
+        """
+        Method to calculate the position of a key on the ring.
+
+        @param key: the key
+
+        @return: the hash value
+        """
+
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
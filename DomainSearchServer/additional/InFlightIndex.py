@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+The InFlightIndex holds the domains which are queued or being scanned.
+"""
+
+import time
+import threading
+import collections
+
+from additional import Config
+
+################################################################################
+
+class InFlightIndex:
+    """
+    This class remembers every domain added to the queued-domain-request queue
+    until its scan has finished, so a domain is queued at most once at a time.
+    Domains whose scan has not finished within the expiration time may be
+    queued again.
+    """
+
+    def __init__(self, expiration_time=None):
+        """
+        @param expiration_time: the time in days until a domain may be queued
+                                again without a finished scan
+        """
+
+        if expiration_time is None:
+            expiration_time = Config.in_flight_expiration_time
+
+        self._ttl = expiration_time * 24 * 60 * 60
+
+        self._lock = threading.Lock()
+
+        # domains and the time they have been queued, the oldest in front
+        self._domains = collections.OrderedDict()
+
+    ############################################################################
+
+    def add(self, domain):
+        """
+        Method to add a domain, unless it is already in flight.
+
+        @param domain: the domain to add
+
+        @return: True if the domain has been added, False if it is in flight
+        """
+
+        return bool(self.add_many([domain]))
+
+    ############################################################################
+
+    def add_many(self, domains):
+        """
+        Method to add several domains, except the ones already in flight.
+
+        @param domains: the domains to add
+
+        @return: list of the added domains
+        """
+
+        added = []
+
+        now = time.monotonic()
+
+        with self._lock:
+
+            # removes the expired domains, so they may be queued again
+            while self._domains:
+
+                domain, queued = next(iter(self._domains.items()))
+
+                if now - queued < self._ttl:
+                    break
+
+                self._domains.popitem(last=False)
+
+            for domain in domains:
+
+                if domain in self._domains:
+                    continue
+
+                self._domains[domain] = now
+
+                added.append(domain)
+
+        return added
+
+    ############################################################################
+
+    def remove(self, domain):
+        """
+        Method to remove a domain whose scan has finished.
+
+        @param domain: the domain to remove
+        """
+
+        self.remove_many([domain])
+
+    ############################################################################
+
+    def remove_many(self, domains):
+        """
+        Method to remove several domains, e.g. whose scan has finished or which
+        could not be queued.
+
+        @param domains: the domains to remove
+        """
+
+        with self._lock:
+
+            for domain in domains:
+                self._domains.pop(domain, None)
+
+    ############################################################################
+
+    def __contains__(self, domain):
+
+        with self._lock:
+
+            queued = self._domains.get(domain)
+
+            return queued is not None and \
+                time.monotonic() - queued < self._ttl
+
+    ############################################################################
+
+    def __len__(self):
+
+        with self._lock:
+            return len(self._domains)
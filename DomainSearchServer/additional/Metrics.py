@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+"""
+The Metrics registry collects the counters and latencies of the server.
+"""
+
+"""
+################################################################################
+
+Metric structur:
+
+    counters = {(name, labels): value}
+
+    latencies = {(name, labels): (count, sum, samples)}
+
+        samples = deque of the most recent durations in seconds
+
+    gauges = {name: history}
+
+        history = deque of (time, value)
+
+    labels = tuple of (label, value)
+
+################################################################################
+"""
+
+import time
+import threading
+import collections
+
+from additional import Config
+from additional.Logging import Logging
+
+################################################################################
+
+class Metrics:
+    """
+    This class is a thread-safe registry of counters, latencies and gauges.
+    Latency percentiles are calculated over the most recent samples. Gauges
+    are sampled periodically in the background and keep a history, so the
+    depth of the queues can be followed over time.
+    """
+
+    def __init__(self, samples=None, history=None, interval=None):
+        """
+        @param samples:  the number of recent samples of every latency
+        @param history:  the number of recent values of every gauge
+        @param interval: the time between two samples of the gauges
+        """
+
+        self._samples = samples or Config.metrics_latency_samples
+        self._history = history or Config.metrics_gauge_history
+        self._interval = interval or Config.metrics_gauge_interval
+
+        self._lock = threading.Lock()
+
+        self._counters = collections.defaultdict(int)
+        self._latencies = {}
+
+        # callbacks and histories of the gauges by their name
+        self._gauge_callbacks = {}
+        self._gauges = {}
+
+        self._started = time.time()
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+    ############################################################################
+
+    def start(self):
+        """
+        Method to start sampling the gauges in the background.
+        """
+
+        self._stop_event.clear()
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    ############################################################################
+
+    def stop(self):
+        """
+        Method to stop sampling the gauges.
+        """
+
+        self._stop_event.set()
+
+        if self._thread:
+
+            self._thread.join()
+            self._thread = None
+
+    ############################################################################
+
+    def increment(self, name, value=1, **labels):
+        """
+        Method to increase a counter.
+
+        @param name:   the name of the counter
+        @param value:  the amount to add
+        @param labels: the labels of the counter
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            self._counters[key] += value
+
+    ############################################################################
+
+    def observe(self, name, duration, **labels):
+        """
+        Method to record the duration of an operation.
+
+        @param name:     the name of the latency
+        @param duration: the duration in seconds
+        @param labels:   the labels of the latency
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+
+            count, total, samples = self._latencies.get(key) or \
+                (0, 0.0, collections.deque(maxlen=self._samples))
+
+            samples.append(duration)
+
+            self._latencies[key] = (count + 1, total + duration, samples)
+
+    ############################################################################
+
+    def add_gauge(self, name, callback):
+        """
+        Method to add a gauge which is sampled periodically.
+
+        @param name:     the name of the gauge
+        @param callback: function returning the current value
+        """
+
+        with self._lock:
+
+            self._gauge_callbacks[name] = callback
+            self._gauges[name] = collections.deque(maxlen=self._history)
+
+    ############################################################################
+
+    def get_stats(self):
+        """
+        Method to get all metrics as a dictionary which can be serialised as
+        JSON.
+
+        @return: the metrics
+        """
+
+        with self._lock:
+
+            counters = [{
+                'name': name,
+                'labels': dict(labels),
+                'value': value
+            } for (name, labels), value in sorted(self._counters.items())]
+
+            latencies = [{
+                'name': name,
+                'labels': dict(labels),
+                'count': count,
+                'sum': total,
+                'p50': self._percentile(samples, 0.5),
+                'p99': self._percentile(samples, 0.99)
+            } for (name, labels), (count, total, samples) in \
+                sorted(self._latencies.items())]
+
+            gauges = {name: [[timestamp, value] \
+                for timestamp, value in history] \
+                for name, history in self._gauges.items()}
+
+        return {
+            'uptime': time.time() - self._started,
+            'counters': counters,
+            'latencies': latencies,
+            'gauges': gauges
+        }
+
+    ############################################################################
+
+    def get_prometheus(self):
+        """
+        Method to get all metrics in the Prometheus text format. Latencies are
+        exported as summaries and gauges with their most recent value.
+
+        @return: the metrics as string
+        """
+
+        stats = self.get_stats()
+
+        lines = []
+        types = set()
+
+        def add_type(name, metric_type):
+
+            if name not in types:
+
+                types.add(name)
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+
+        ########################################################################
+
+        lines.append('# TYPE domainsearch_uptime_seconds gauge')
+        lines.append('domainsearch_uptime_seconds {}'.format(stats['uptime']))
+
+        for counter in stats['counters']:
+
+            name = 'domainsearch_{}_total'.format(counter['name'])
+
+            add_type(name, 'counter')
+
+            lines.append('{}{} {}'.format(name,
+                self._format_labels(counter['labels']), counter['value']))
+
+        for latency in stats['latencies']:
+
+            name = 'domainsearch_{}_seconds'.format(latency['name'])
+
+            add_type(name, 'summary')
+
+            for quantile, key in (('0.5', 'p50'), ('0.99', 'p99')):
+
+                if latency[key] is None:
+                    continue
+
+                labels = dict(latency['labels'], quantile=quantile)
+
+                lines.append('{}{} {}'.format(name,
+                    self._format_labels(labels), latency[key]))
+
+            labels = self._format_labels(latency['labels'])
+
+            lines.append('{}_sum{} {}'.format(name, labels, latency['sum']))
+            lines.append('{}_count{} {}'.format(name, labels, latency['count']))
+
+        for name, history in sorted(stats['gauges'].items()):
+
+            if not history:
+                continue
+
+            name = 'domainsearch_{}'.format(name)
+
+            add_type(name, 'gauge')
+
+            lines.append('{} {}'.format(name, history[-1][1]))
+
+        return '\n'.join(lines) + '\n'
+
+    ############################################################################
+
+    def _run(self):
+        """
+        Method to sample the gauges until the registry is stopped.
+        """
+
+        while not self._stop_event.is_set():
+
+            with self._lock:
+                callbacks = list(self._gauge_callbacks.items())
+
+            now = time.time()
+
+            for name, callback in callbacks:
+
+                try:
+                    value = callback()
+
+                except Exception as e:
+
+                    self._log.error('Sampling of gauge {} failed: {}'
+                        .format(name, e))
+
+                    continue
+
+                with self._lock:
+                    self._gauges[name].append((now, value))
+
+            self._stop_event.wait(self._interval)
+
+    ############################################################################
+
+    def _percentile(self, samples, fraction):
+        """
+        Method to calculate a percentile of the samples.
+
+        @param samples:  the samples
+        @param fraction: the percentile as fraction between 0 and 1
+
+        @return: the percentile or None without samples
+        """
+
+        if not samples:
+            return None
+
+        ordered = sorted(samples)
+
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    ############################################################################
+
+    def _format_labels(self, labels):
+        """
+        Method to format labels in the Prometheus text format.
+
+        @param labels: dictionary of the labels
+
+        @return: the formatted labels
+        """
+
+        if not labels:
+            return ''
+
+        return '{' + ','.join('{}="{}"'.format(key, str(value)
+            .replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) \
+            for key, value in sorted(labels.items())) + '}'
@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+
+"""
+The PersistentQueue is a queue which survives restarts and crashes.
+"""
+
+"""
+################################################################################
+
+Journal structur:
+
+    Every line of the journal is a JSON list describing one operation.
+
+    put = ["p", entry_id, item, queued]
+
+        entry_id = int
+        item = encoded queue item
+        queued = float (seconds since the epoch)
+
+    get = ["g", entry_id]
+
+        entry_id = int
+
+    With acknowledgements, the get record is written as soon as the taken
+    entry has been acknowledged. Taken entries without acknowledgement are
+    queued again when the journal is replayed.
+
+################################################################################
+"""
+
+import os
+import json
+import time
+import queue
+import collections
+
+from additional import Config
+
+################################################################################
+
+class PersistentQueue(queue.Queue):
+    """
+    This class is a queue which writes every put and get to an append-only
+    journal. On startup the journal is replayed, so the queue holds the same
+    entries as before a shutdown or crash. The journal is compacted as soon as
+    it consists mostly of entries which have been taken from the queue already.
+
+    The entries may be divided into priority classes. Lower classes are taken
+    first, entries of the same class in insertion order. With an aging
+    interval, an entry counts as one class lower for every interval it has
+    been waiting, so no class starves.
+
+    With acknowledgements, a taken entry stays in the journal until it is
+    acknowledged, so entries being processed survive a crash as well. A taken
+    entry which can not be processed is released back into the queue.
+    """
+
+    def __init__(self, path, encode=None, decode=None, maxsize=0,
+        priority=None, aging_interval=None, acknowledge=False):
+        """
+        Loads the entries of an existing journal.
+
+        @param path:           the location of the journal
+        @param encode:         function to convert an item into a JSON value
+        @param decode:         function to convert a JSON value back into an
+                               item
+        @param maxsize:        the maximal number of entries, 0 for unlimited
+        @param priority:       function to get the priority class of an item,
+                               all items are in class 0 if not given
+        @param aging_interval: the time in seconds until a waiting entry
+                               counts as one class lower, no aging if not given
+        @param acknowledge:    True to keep taken entries in the journal until
+                               they are acknowledged, False otherwise
+        """
+
+        self._path = path
+        self._encode = encode or list
+        self._decode = decode or tuple
+        self._priority = priority or (lambda item: 0)
+        self._aging_interval = aging_interval
+        self._acknowledge = acknowledge
+
+        self._journal = None
+
+        # calls _init, which replays the journal
+        queue.Queue.__init__(self, maxsize)
+
+        # counts the replayed entries, which Queue.__init__ resets
+        self.unfinished_tasks = self._qsize()
+
+    ############################################################################
+
+    def _init(self, maxsize):
+        """
+        Method to initialise the queue and to replay the journal.
+
+        @param maxsize: the maximal number of entries
+        """
+
+        # queued (item, queued) by their entry id in insertion order, for
+        # every priority class
+        self._classes = collections.defaultdict(collections.OrderedDict)
+
+        # priority classes by entry id
+        self._entry_classes = {}
+
+        # taken but not yet acknowledged (item, queued) by their entry id and
+        # their entry ids by item
+        self._taken = {}
+        self._taken_ids = collections.defaultdict(collections.deque)
+
+        self._next_id = 0
+
+        if os.path.isfile(self._path):
+
+            with open(self._path, 'r', encoding='utf-8') as journal:
+
+                for line in journal:
+
+                    try:
+                        record = json.loads(line)
+
+                    # skips a record which has not been written completely
+                    except ValueError:
+                        continue
+
+                    # skips a malformed record
+                    if not isinstance(record, list) or len(record) < 2 or \
+                        not isinstance(record[1], int) or \
+                        (record[0] == 'p' and len(record) < 3):
+
+                        continue
+
+                    if record[0] == 'p':
+
+                        # journals written without queue times start waiting
+                        # now
+                        queued = record[3] if len(record) > 3 else time.time()
+
+                        self._add_entry(
+                            record[1], self._decode(record[2]), queued)
+
+                    elif record[0] == 'g':
+                        self._remove_entry(record[1])
+
+                    self._next_id = max(self._next_id, record[1] + 1)
+
+        # starts with a journal holding only the queued entries
+        self._compact()
+
+    ############################################################################
+
+    def _qsize(self):
+
+        return len(self._entry_classes)
+
+    ############################################################################
+
+    def _put(self, item):
+
+        entry_id = self._next_id
+        self._next_id += 1
+
+        queued = time.time()
+
+        self._write(['p', entry_id, self._encode(item), queued])
+
+        self._add_entry(entry_id, item, queued)
+
+    ############################################################################
+
+    def _get(self):
+
+        entry_id = self._get_next_entry_id()
+        queued = self._classes[self._entry_classes[entry_id]][entry_id][1]
+        item = self._remove_entry(entry_id)
+
+        if self._acknowledge:
+
+            # keeps the entry in the journal until it is acknowledged
+
+            self._taken[entry_id] = (item, queued)
+            self._taken_ids[item].append(entry_id)
+
+            return item
+
+        self._remove_record(entry_id)
+
+        return item
+
+    ############################################################################
+
+    def _remove_record(self, entry_id):
+        """
+        Method to journal the removal of an entry.
+
+        @param entry_id: the id of the entry
+        """
+
+        self._write(['g', entry_id])
+
+        # rewrites the journal if most of its records are outdated
+        if self._records > Config.queue_journal_compaction_threshold and \
+            self._records > 2 * (len(self._entry_classes) + len(self._taken)):
+
+            self._compact()
+
+    ############################################################################
+
+    def _pop_taken(self, item):
+        """
+        Method to remove the oldest taken entry of an item.
+
+        @param item: the taken item
+
+        @return: (entry_id, queued) or None if the item has not been taken
+        """
+
+        entry_ids = self._taken_ids.get(item)
+
+        if not entry_ids:
+            return None
+
+        entry_id = entry_ids.popleft()
+
+        if not entry_ids:
+            del self._taken_ids[item]
+
+        return entry_id, self._taken.pop(entry_id)[1]
+
+    ############################################################################
+
+    def _get_next_entry_id(self):
+        """
+        Method to determine the entry to take next. The first entry of every
+        priority class is ranked by its class, lowered by the time it has been
+        waiting.
+
+        @return: the entry id
+        """
+
+        now = time.time()
+        best = None
+
+        for priority, entries in self._classes.items():
+
+            if not entries:
+                continue
+
+            entry_id, (item, queued) = next(iter(entries.items()))
+
+            rank = priority
+
+            if self._aging_interval:
+                rank -= (now - queued) / self._aging_interval
+
+            if best is None or (rank, priority) < best[0]:
+                best = ((rank, priority), entry_id)
+
+        return best[1]
+
+    ############################################################################
+
+    def _add_entry(self, entry_id, item, queued):
+        """
+        Method to add an entry to its priority class.
+
+        @param entry_id: the id of the entry
+        @param item:     the queued item
+        @param queued:   the time the item has been queued
+        """
+
+        priority = self._priority(item)
+
+        self._classes[priority][entry_id] = (item, queued)
+        self._entry_classes[entry_id] = priority
+
+    ############################################################################
+
+    def _remove_entry(self, entry_id):
+        """
+        Method to remove an entry from its priority class.
+
+        @param entry_id: the id of the entry
+
+        @return: the item of the entry, None if not queued
+        """
+
+        priority = self._entry_classes.pop(entry_id, None)
+
+        if priority is None:
+            return None
+
+        return self._classes[priority].pop(entry_id)[0]
+
+    ############################################################################
+
+    def _get_entries(self):
+        """
+        Method to get all entries in insertion order.
+
+        @return: list of (entry_id, item, queued)
+        """
+
+        entries = [(entry_id, item, queued) \
+            for entry_id, (item, queued) in self._taken.items()]
+
+        for priority_entries in self._classes.values():
+
+            for entry_id, (item, queued) in priority_entries.items():
+                entries.append((entry_id, item, queued))
+
+        entries.sort(key=lambda entry: entry[0])
+
+        return entries
+
+    ############################################################################
+
+    def _write(self, record):
+        """
+        Method to append a record to the journal.
+
+        @param record: the record to append
+        """
+
+        self._journal.write(json.dumps(record) + '\n')
+        self._journal.flush()
+
+        if Config.queue_journal_sync:
+            os.fsync(self._journal.fileno())
+
+        self._records += 1
+
+    ############################################################################
+
+    def _compact(self):
+        """
+        Method to replace the journal by one containing only the queued
+        entries.
+        """
+
+        if self._journal is not None:
+            self._journal.close()
+
+        temporary_path = self._path + '.tmp'
+
+        with open(temporary_path, 'w', encoding='utf-8') as journal:
+
+            for entry_id, item, queued in self._get_entries():
+
+                journal.write(json.dumps(
+                    ['p', entry_id, self._encode(item), queued]) + '\n')
+
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        os.replace(temporary_path, self._path)
+
+        self._journal = open(self._path, 'a', encoding='utf-8')
+        self._records = len(self._entry_classes) + len(self._taken)
+
+    ############################################################################
+
+    def acknowledge(self, item):
+        """
+        Method to remove a taken entry from the journal after it has been
+        processed.
+
+        @param item: the taken item
+
+        @return: True if the item has been acknowledged, False if it has not
+                 been taken
+        """
+
+        with self.mutex:
+
+            taken = self._pop_taken(item)
+
+            if taken is None:
+                return False
+
+            self._remove_record(taken[0])
+
+            return True
+
+    ############################################################################
+
+    def release(self, item):
+        """
+        Method to add a taken entry back to the queue, e.g. if its consumer
+        has disconnected before acknowledging it. The entry keeps its queue
+        time.
+
+        @param item: the taken item
+
+        @return: True if the item has been released, False if it has not been
+                 taken
+        """
+
+        with self.mutex:
+
+            taken = self._pop_taken(item)
+
+            if taken is None:
+                return False
+
+            self._add_entry(taken[0], item, taken[1])
+
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+            return True
+
+    ############################################################################
+
+    def snapshot(self):
+        """
+        Method to get the queued and taken entries without removing them.
+
+        @return: list of the entries in insertion order
+        """
+
+        with self.mutex:
+            return [entry[1] for entry in self._get_entries()]
+
+    ############################################################################
+
+    def qsizes(self):
+        """
+        Method to get the number of queued entries of every priority class.
+
+        @return: dictionary of the number of entries by priority class
+        """
+
+        with self.mutex:
+
+            return {priority: len(entries) \
+                for priority, entries in self._classes.items() if entries}
+
+    ############################################################################
+
+    def close(self):
+        """
+        Method to compact and close the journal.
+        """
+
+        with self.mutex:
+
+            self._compact()
+
+            self._journal.close()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+The priority classes of the queued-domain-request queue.
+"""
+
+################################################################################
+
+# domains requested by a rating request
+RATING = 0
+
+# expired domains requested by a rating request again
+RESCAN = 1
+
+# domains added by the console
+IMPORT = 2
+
+# names of the priority classes, as shown by the console
+names = {
+    RATING: 'rating',
+    RESCAN: 'rescan',
+    IMPORT: 'import'
+}
+
+################################################################################
+
+def get_priority(request):
+    """
+    Method to get the priority class of a queued domain request. Requests
+    queued by earlier versions have no priority class and are handled like
+    rescans.
+
+    @param request: (request_id, domain, priority) or (request_id, domain)
+
+    @return: the priority class
+    """
+
+    if len(request) > 2:
+        return request[2]
+
+    return RESCAN
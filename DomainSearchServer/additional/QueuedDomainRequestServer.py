@@ -9,7 +9,7 @@ The QueuedDomainRequestServer handles incoming scan_task requests.
 
 Messages:
 
-    DomainSearchScanner -> QueuedDomainRequestServer:
+    DomainSearchScanner -> QueuedDomainRequestServer: single task
 
         "request": "task"
 
@@ -22,31 +22,91 @@ Messages:
             }
         }
 
+    DomainSearchScanner -> QueuedDomainRequestServer: up to count tasks
+
+        "request": "task",
+        "count": 4
+
+    QueuedDomainRequestServer -> DomainSearchScanner: scan requests
+
+        "response": {
+            "tasks": [
+                {
+                    "domain": "example.com",
+                    "request_id": 1
+                },
+                ...
+            ]
+        }
+
+    DomainSearchScanner -> QueuedDomainRequestServer: credit window
+
+        "request": "credit",
+        "count": 8
+
+    QueuedDomainRequestServer -> DomainSearchScanner: pushed scan requests
+
+        "response": {
+            "tasks": [
+                {
+                    "domain": "example.com",
+                    "request_id": 1
+                },
+                ...
+            ]
+        }
+
+    DomainSearchScanner -> QueuedDomainRequestServer: tasks handled
+
+        "request": "ack",
+        "request_ids": [1, ...]
+
+    DomainSearchScanner -> QueuedDomainRequestServer: tasks rejected without
+    a scan, e.g. invalid ones
+
+        "request": "ack",
+        "request_ids": [1, ...],
+        "rejected": true
+
     QueuedDomainRequestServer -> DomainSearchScanner: shutdown triggered
 
         "response": {
             "msg": "shutdown"
         }
 
+    After a credit window has been sent, the server pushes tasks as long as
+    fewer than count tasks are unacknowledged. A new credit window replaces
+    the previous one. Unacknowledged tasks are added back to the queue if the
+    connection is closed.
+
 ################################################################################
 
 Queue structur:
 
-    queued_domain_request_queue = (request_id, domain)
+    queued_domain_request_queue = (request_id, domain, priority)
 
         request_id = int
         domain = str
+        priority = int (see additional.Priority)
+
+    Requests are taken from the queue by their priority class and the time
+    they have been waiting.
 
 ################################################################################
 """
 
-import time
 import json
+import time
 import queue
+import select
 import socketserver
+import collections
 
 from additional import Config
 from additional.Logging import Logging
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
+from additional.Protocol import send_message
 
 ################################################################################
 
@@ -61,9 +121,10 @@ class QueuedDomainRequestServer(BasicThreadedTCPServer):
     def __init__(self, addr, handler, arguments):
 
         self.scanners = arguments[0]
-        self.scanners_lock = arguments[1]
-        self.running_event = arguments[2]
-        self.queued_domain_request_queue = arguments[3]
+        self.running_event = arguments[1]
+        self.queued_domain_request_queue = arguments[2]
+        self.in_flight_index = arguments[3]
+        self.metrics = arguments[4]
 
         self.log = Logging(self.__class__.__name__).get_logger()
 
@@ -82,18 +143,14 @@ class QueuedDomainRequestHandler(socketserver.BaseRequestHandler):
         Method to add a scanner to the list of connected scanners.
         """
 
-        with self.server.scanners_lock:
-
-            self.server.scanners[self.client_address[1]] = (
-                self.client_address[0], time.strftime("%d.%m.%Y %H:%M:%S"))
+        self.server.scanners.add(self.client_address)
 
     def _remove_scanner(self):
         """
         Method to remove a scanner from the list of connected scanners.
         """
 
-        with self.server.scanners_lock:
-            self.server.scanners.pop(self.client_address[1])
+        self.server.scanners.remove(self.client_address)
 
     ############################################################################
 
@@ -105,90 +162,365 @@ class QueuedDomainRequestHandler(socketserver.BaseRequestHandler):
         # adds scanner to the list of connected scanners
         self._add_scanner()
 
-        last_request = None
+        reader = MessageReader(self.request)
+
+        # the requests sent last, they are acknowledged by the next request
+        # and added back to the queue if meanwhile the scanner has
+        # disconnected
+        last_requests = []
 
         while self.server.running_event.is_set():
 
             try:
 
-                data = self.request.recv(1024).decode('UTF-8').strip()
+                message = reader.read_message()
 
                 # detects disconnected scanner
-                if not data:
+                if message is None:
                     raise ConnectionAbortedError
 
-                message = json.loads(data)
-
                 # validates message
-                if 'request' not in message and message['request'] != 'task':
-                    raise ValueError
+                if message.get('request') not in ('task', 'credit'):
+                    raise MessageError(json.dumps(message))
+
+                count = message.get('count', 1)
 
-            except ValueError:
+                if not isinstance(count, int) or count < 0 or \
+                    (count == 0 and message['request'] == 'task'):
 
-                self.server.log.error('Invalid message: {}'.format(data))
+                    raise MessageError(json.dumps(message))
+
+            except MessageError as error:
+
+                self.server.log.error('Invalid message: {}'.format(error.data))
 
                 break
 
             except (ConnectionAbortedError, ConnectionResetError,
                 ConnectionRefusedError):
 
-                # adds the last task back to the queue if not None
-                if last_request:
-                    self.server.queued_domain_request_queue.put(last_request)
-
                 self.server.log.info('Connection aborted: {}:{}'
                     .format(self.client_address[0], self.client_address[1]))
 
                 break
 
+            # the scanner has finished the last tasks
+
+            for request in last_requests:
+                self.server.queued_domain_request_queue.acknowledge(request)
+
+            last_requests = []
+
             ####################################################################
 
             self.server.log.info('Received queued-domain request')
 
+            self.server.metrics.increment('requests', role='queued_domain')
+
             ####################################################################
 
-            while 1:
+            # switches the connection to prefetching
+            if message['request'] == 'credit':
 
-                # checks if server wants to shut down
-                if not self.server.running_event.is_set():
+                self._handle_credit(reader, count)
 
-                    # informs the scanner of an upcoming server shutdown
-                    self.request.sendall(bytes(json.dumps({
-                        'response': {
-                            'msg': 'shutdown'
-                        }
-                    }), 'UTF-8'))
+                break
+
+            ####################################################################
+
+            requests = self._get_requests(
+                min(count, Config.queued_domain_request_server_max_tasks))
 
-                    break
+            # checks if server wants to shut down
+            if requests is None:
 
-                try:
+                # informs the scanner of an upcoming server shutdown
+                send_message(self.request, {
+                    'response': {
+                        'msg': 'shutdown'
+                    }
+                })
 
-                    # tries to get a request from queued-domain-request queue
-                    request = self.server.queued_domain_request_queue.get(
-                        timeout=Config.queued_domain_request_server_timeout)
+                break
+
+            ####################################################################
 
-                    request_id = request[0]
-                    domain = request[1]
+            tasks = [{'domain': request[1], 'request_id': request[0]}
+                for request in requests]
+
+            try:
 
-                    # sends the received domain to the scanner
-                    self.request.sendall(bytes(json.dumps({
+                # sends the received domains to the scanner
+
+                if 'count' in message:
+
+                    send_message(self.request, {
                         'response': {
-                            'task': {
-                                'domain': domain,
-                                'request_id': request_id
-                            }
+                            'tasks': tasks
                         }
-                    }), 'UTF-8'))
+                    })
 
-                    # saves the last request to add it back to the queue if
-                    # meanwhile the scanner has disconnected
-                    last_request = request
+                else:
 
-                    self.server.queued_domain_request_queue.task_done()
+                    send_message(self.request, {
+                        'response': {
+                            'task': tasks[0]
+                        }
+                    })
 
-                    break
+            except (ConnectionAbortedError, ConnectionResetError,
+                BrokenPipeError):
 
-                except queue.Empty:
-                    pass
+                # adds the undelivered tasks back to the queue
+                for request in requests:
+                    self.server.queued_domain_request_queue.release(request)
+
+                self.server.log.info('Connection aborted: {}:{}'
+                    .format(self.client_address[0], self.client_address[1]))
+
+                break
+
+            last_requests = requests
+
+        # adds the unacknowledged tasks back to the queue
+        for request in last_requests:
+            self.server.queued_domain_request_queue.release(request)
 
         self._remove_scanner()
+
+    ############################################################################
+
+    def _handle_credit(self, reader, window):
+        """
+        Method to push tasks to the scanner as long as it has credit left.
+
+        @param reader: the message reader of the connection
+        @param window: the number of tasks the scanner can hold
+        """
+
+        window = min(window, Config.queued_domain_request_server_max_tasks)
+
+        # the tasks pushed but not yet acknowledged by the scanner
+        in_flight = collections.OrderedDict()
+
+        try:
+
+            while self.server.running_event.is_set():
+
+                # handles all buffered messages of the scanner
+
+                message = reader.parse_message()
+
+                if message is not None:
+
+                    window = self._handle_credit_message(
+                        message, in_flight, window)
+
+                    continue
+
+                ################################################################
+
+                timeout = Config.queued_domain_request_server_timeout
+
+                # pushes further tasks if the scanner has credit left
+
+                if len(in_flight) < window:
+
+                    requests = self._poll_requests(window - len(in_flight))
+
+                    for request in requests:
+                        in_flight[request[0]] = request
+
+                    if requests:
+
+                        send_message(self.request, {
+                            'response': {
+                                'tasks': [{
+                                    'domain': request[1],
+                                    'request_id': request[0]
+                                } for request in requests]
+                            }
+                        })
+
+                    timeout = 0
+
+                ################################################################
+
+                # receives messages of the scanner
+
+                readable = select.select([self.request], [], [], timeout)[0]
+
+                if readable and not reader.receive():
+                    raise ConnectionAbortedError
+
+            ####################################################################
+
+            # informs the scanner of an upcoming server shutdown
+            send_message(self.request, {
+                'response': {
+                    'msg': 'shutdown'
+                }
+            })
+
+            self._receive_acks(reader, in_flight)
+
+        except MessageError as error:
+            self.server.log.error('Invalid message: {}'.format(error.data))
+
+        except (ConnectionAbortedError, ConnectionResetError,
+            BrokenPipeError):
+
+            self.server.log.info('Connection aborted: {}:{}'
+                .format(self.client_address[0], self.client_address[1]))
+
+        finally:
+
+            # adds the unacknowledged tasks back to the queue
+            for request in in_flight.values():
+                self.server.queued_domain_request_queue.release(request)
+
+    ############################################################################
+
+    def _receive_acks(self, reader, in_flight):
+        """
+        Method to receive the acknowledgements of the running scans after the
+        shutdown message until the scanner disconnects or the shutdown timeout
+        expires.
+
+        @param reader:    the message reader of the connection
+        @param in_flight: the unacknowledged tasks of the scanner
+        """
+
+        deadline = time.monotonic() + Config.shutdown_timeout
+
+        while in_flight:
+
+            message = reader.parse_message()
+
+            if message is not None:
+
+                self._handle_credit_message(message, in_flight, 0)
+
+                continue
+
+            timeout = deadline - time.monotonic()
+
+            if timeout <= 0:
+                break
+
+            readable = select.select([self.request], [], [], timeout)[0]
+
+            # the scanner closed the connection
+            if readable and not reader.receive():
+                break
+
+    ############################################################################
+
+    def _handle_credit_message(self, message, in_flight, window):
+        """
+        Method to handle a message of a scanner in prefetching mode.
+
+        @param message:   the received message
+        @param in_flight: the unacknowledged tasks of the scanner
+        @param window:    the current number of tasks the scanner can hold
+
+        @return: the new number of tasks the scanner can hold
+        """
+
+        request = message.get('request')
+
+        if request == 'ack' and isinstance(message.get('request_ids'), list):
+
+            for request_id in message['request_ids']:
+
+                task = in_flight.pop(request_id, None)
+
+                if task is None:
+
+                    self.server.log.error('Unknown acknowledgement: {}'
+                        .format(request_id))
+
+                    continue
+
+                # removes the finished task from the journal
+                self.server.queued_domain_request_queue.acknowledge(task)
+
+                # allows a rejected domain to be queued again, the domains of
+                # finished scans are removed by the task notification
+                if message.get('rejected') is True:
+                    self.server.in_flight_index.remove(task[1])
+
+            return window
+
+        if request == 'credit' and isinstance(message.get('count'), int) and \
+            message['count'] >= 0:
+
+            return min(message['count'],
+                Config.queued_domain_request_server_max_tasks)
+
+        raise MessageError(json.dumps(message))
+
+    ############################################################################
+
+    def _get_requests(self, count):
+        """
+        Method to get up to count requests from queued-domain-request queue.
+        Blocks until at least one request is available.
+
+        @param count: the maximal number of requests
+
+        @return: list of requests or None if the server shuts down
+        """
+
+        while self.server.running_event.is_set():
+
+            requests = self._poll_requests(count)
+
+            if requests:
+                return requests
+
+        return None
+
+    ############################################################################
+
+    def _poll_requests(self, count):
+        """
+        Method to get up to count requests from queued-domain-request queue.
+        Waits for the first request until the timeout is reached.
+
+        @param count: the maximal number of requests
+
+        @return: list of requests, empty if the queue stayed empty
+        """
+
+        try:
+
+            # tries to get a request from queued-domain-request queue
+            request = self.server.queued_domain_request_queue.get(
+                timeout=Config.queued_domain_request_server_timeout)
+
+            self.server.queued_domain_request_queue.task_done()
+
+        except queue.Empty:
+            return []
+
+        requests = [request]
+
+        # adds further requests which are available immediately
+
+        while len(requests) < count:
+
+            try:
+                request = self.server.queued_domain_request_queue.get_nowait()
+
+                self.server.queued_domain_request_queue.task_done()
+
+            except queue.Empty:
+                break
+
+            requests.append(request)
+
+        self.server.metrics.increment('tasks_dispatched', len(requests),
+            scanner='{}:{}'.format(self.client_address[0], self.client_address[1]))
+
+        return requests
@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+
+"""
+The Rating determines the verdict for requested domains.
+"""
+
+"""
+################################################################################
+
+Verdict structur:
+
+    rating = {"domain": domain, "access": "permitted"}
+           | {"domain": domain, "access": "denied", "comment": comment}
+           | {"domain": domain, "msg": "invalid domain"}
+           | {"domain": domain, "msg": "shard unavailable"}
+
+################################################################################
+
+Queue structur:
+
+    queued_domain_request_queue = (request_id, domain, priority)
+
+        request_id = int
+        domain = str
+        priority = int (see additional.Priority)
+
+################################################################################
+"""
+
+import json
+from datetime import datetime
+
+from additional import Config
+from additional import Priority
+from additional import Expiration
+from additional.Logging import Logging
+from additional.Protocol import MessageError
+from additional.DomainResolver import DomainResolver
+
+################################################################################
+
+class Rating:
+    """
+    This class searches for existing and valid entries for domains in the
+    verdict cache or the database and builds the response. Domains without an
+    entry are handed over to the domain resolver, which creates the entries
+    and adds them to the queue. Expired entries are added to the queue again,
+    unless the domain is still in flight. It is shared by the rating request
+    servers. If the server is a shard, the domains of other shards are rated
+    by their owners.
+    """
+
+    def __init__(self, db, queued_domain_request_queue, verdict_cache,
+        in_flight_index, shard_router=None):
+
+        self._db = db
+        self._queued_domain_request_queue = queued_domain_request_queue
+        self._verdict_cache = verdict_cache
+        self._in_flight_index = in_flight_index
+        self._shard_router = shard_router
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+        # validates unknown domains without blocking the rating requests
+        self._domain_resolver = DomainResolver(self._add_domains)
+
+    ############################################################################
+
+    def start(self):
+        """
+        Method to start the domain resolver.
+        """
+
+        self._domain_resolver.start()
+
+    ############################################################################
+
+    def stop(self):
+        """
+        Method to stop the domain resolver and to close the connections to the
+        other shards.
+        """
+
+        self._domain_resolver.stop()
+
+        if self._shard_router:
+            self._shard_router.close()
+
+    ############################################################################
+
+    def parse_request(self, message):
+        """
+        Method to validate a rating request and to get its domains.
+
+        @param message: the received message
+
+        @return: (domains, batch, forwarded) with the list of requested
+                 domains, True for a batch request and True for a request
+                 forwarded by another shard
+        """
+
+        request = message.get('request')
+
+        if not isinstance(request, dict):
+            raise MessageError(json.dumps(message))
+
+        forwarded = request.get('forwarded') is True
+
+        ########################################################################
+
+        # single domain
+
+        if isinstance(request.get('rating'), dict) and \
+            isinstance(request['rating'].get('domain'), str):
+
+            return [request['rating']['domain'].lower().strip()], False, \
+                forwarded
+
+        ########################################################################
+
+        # list of domains
+
+        if isinstance(request.get('ratings'), dict) and \
+            isinstance(request['ratings'].get('domains'), list):
+
+            domains = request['ratings']['domains']
+
+            if 0 < len(domains) <= Config.rating_request_max_domains and \
+                all(isinstance(domain, str) for domain in domains):
+
+                return [domain.lower().strip() for domain in domains], True, \
+                    forwarded
+
+        raise MessageError(json.dumps(message))
+
+    ############################################################################
+
+    def respond_cached(self, domains, batch):
+        """
+        Method to build the response from the verdict cache only. Never blocks.
+
+        @param domains: the requested domains
+        @param batch:   True for a batch request
+
+        @return: the response or None if a domain is not cached or expired
+        """
+
+        ratings = []
+
+        for domain in domains:
+
+            entry = self._verdict_cache.get(domain)
+
+            if not entry or Expiration.is_expired(entry[3], entry[4]):
+                return None
+
+            ratings.append(self._get_rating(domain, entry))
+
+        return self._get_response(ratings, batch)
+
+    ############################################################################
+
+    def respond(self, domains, batch, forwarded=False):
+        """
+        Method to build the response for the requested domains. Queries the
+        database if a domain is not cached and adds new or expired domains to
+        the queue.
+
+        @param domains:   the requested domains
+        @param batch:     True for a batch request
+        @param forwarded: True for a request forwarded by another shard
+
+        @return: the response
+        """
+
+        return self._get_response(self.rate_many(domains, forwarded), batch)
+
+    ############################################################################
+
+    def rate_many(self, domains, forwarded=False):
+        """
+        Method to determine the verdicts of several domains. The domains of
+        other shards are rated by their owners, unless the request has been
+        forwarded already. The domains of an unreachable shard are neither
+        rated nor queued by this shard, so every domain is only queued by its
+        owner.
+
+        @param domains:   the requested domains
+        @param forwarded: True for a request forwarded by another shard
+
+        @return: list of ratings in the order of the domains
+        """
+
+        if not self._shard_router or forwarded:
+            return self._rate_local(domains)
+
+        # ratings by domain
+        ratings = {}
+
+        for shard_name, shard_domains in \
+            self._shard_router.split(set(domains)).items():
+
+            shard_ratings = self._shard_router.forward(shard_name,
+                shard_domains)
+
+            if shard_ratings is None:
+
+                shard_ratings = [{
+                    'domain': domain,
+                    'msg': 'shard unavailable'
+                } for domain in shard_domains]
+
+            ratings.update(zip(shard_domains, shard_ratings))
+
+        local_domains = [domain for domain in domains if domain not in ratings]
+
+        ratings.update(zip(local_domains, self._rate_local(local_domains)))
+
+        return [ratings[domain] for domain in domains]
+
+    ############################################################################
+
+    def _rate_local(self, domains):
+        """
+        Method to determine the verdicts of several domains by this server.
+        All domains which are not cached are looked up with a single query.
+
+        @param domains: the requested domains
+
+        @return: list of ratings in the order of the domains
+        """
+
+        if not domains:
+            return []
+
+        # domain entries by domain
+        entries = {}
+
+        # looks up the domains in the verdict cache first
+
+        for domain in domains:
+
+            entry = self._verdict_cache.get(domain)
+
+            if entry:
+                entries[domain] = entry
+
+        uncached = list(set(domains) - set(entries))
+
+        ########################################################################
+
+        if uncached:
+
+            # checks if the domains already exist in the database and gets the
+            # most recently request of every domain
+            result = self._db.select_data('''
+                SELECT domains.name, domains.id, domains.state,
+                       domains.comment, domains.updated, MAX(requests.created)
+                FROM domains
+                LEFT JOIN requests ON requests.domain_id = domains.id
+                WHERE domains.name IN ({})
+                GROUP BY domains.id'''.format(
+                    ', '.join(['%s'] * len(uncached))), uncached)
+
+            for row in result:
+
+                entries[row[0]] = tuple(row[1:])
+
+                self._verdict_cache.put(*row)
+
+        ########################################################################
+
+        # adds expired domains to the queue again
+
+        expired = [(domain, entry) for domain, entry in entries.items() \
+            if Expiration.is_expired(entry[3], entry[4])]
+
+        if expired:
+            self._add_requests(expired, Priority.RESCAN)
+
+        ########################################################################
+
+        ratings = []
+        unknown = []
+
+        for domain in domains:
+
+            if domain in entries: # domain found
+                ratings.append(self._get_rating(domain, entries[domain]))
+
+            # rejects a domain which has recently been found unresolvable
+
+            elif self._domain_resolver.is_invalid(domain):
+
+                self._log.error('Invalid domain: {}'.format(domain))
+
+                ratings.append({
+                    'domain': domain,
+                    'msg': 'invalid domain'
+                })
+
+            # permits an unknown domain
+
+            else:
+
+                ratings.append({
+                    'domain': domain,
+                    'access': 'permitted'
+                })
+
+                unknown.append(domain)
+
+        ########################################################################
+
+        # resolves unknown domains in the background, which adds them to the
+        # database and the queue if they are valid
+        if unknown:
+            self._domain_resolver.submit_many(unknown)
+
+        return ratings
+
+    ############################################################################
+
+    def _get_response(self, ratings, batch):
+        """
+        Method to build the response message from the ratings.
+
+        @param ratings: the ratings of the requested domains
+        @param batch:   True for a batch request
+
+        @return: the response
+        """
+
+        if batch:
+
+            return {
+                'response': {
+                    'ratings': ratings
+                }
+            }
+
+        rating = ratings[0]
+
+        if 'msg' in rating:
+
+            return {
+                'response': {
+                    'msg': rating['msg']
+                }
+            }
+
+        return {
+            'response': {
+                'rating': rating
+            }
+        }
+
+    ############################################################################
+
+    def _get_rating(self, domain, entry):
+        """
+        Method to build the rating for a domain entry.
+
+        @param domain: the requested domain
+        @param entry:  (domain_id, state, comment, updated, created)
+
+        @return: the rating
+        """
+
+        domain_state = entry[1]
+        domain_comment = entry[2]
+
+        # checks the state of the domain entry
+
+        if domain_state == 'permitted':
+
+            # permits the domain
+            return {
+                'domain': domain,
+                'access': 'permitted'
+            }
+
+        # denies the domain with a comment
+        return {
+            'domain': domain,
+            'access': 'denied',
+            'comment': domain_comment
+        }
+
+    ############################################################################
+
+    def _add_requests(self, entries, priority):
+        """
+        Method to create new requests for domain entries with a single query
+        and to add them to the queue.
+
+        @param entries:  list of (domain, entry)
+        @param priority: the priority class of the requests
+        """
+
+        # skips domains which are already queued or being scanned
+
+        domains = set(self._in_flight_index.add_many(
+            [domain for domain, entry in entries]))
+
+        entries = [(domain, entry) for domain, entry in entries \
+            if domain in domains]
+
+        if not entries:
+            return
+
+        # the number of domains added to the queue
+        queued = 0
+
+        try:
+
+            domain_ids = [entry[0] for domain, entry in entries]
+
+            # creates the new request entries
+            self._db.insert_many_data('''
+                INSERT INTO requests (domain_id)
+                VALUES(%s)''', [(domain_id,) for domain_id in domain_ids])
+
+            # gets the ids of the new request entries
+            result = self._db.select_data('''
+                SELECT domain_id, MAX(id)
+                FROM requests
+                WHERE domain_id IN ({})
+                GROUP BY domain_id'''.format(
+                    ', '.join(['%s'] * len(domain_ids))), domain_ids)
+
+            request_ids = dict(result)
+
+            ####################################################################
+
+            now = datetime.now()
+
+            for domain, entry in entries:
+
+                domain_id, domain_state, domain_comment, domain_updated = \
+                    entry[:4]
+
+                # remembers the new request, so that further rating requests
+                # are answered without querying the database
+                self._verdict_cache.put(domain, domain_id, domain_state,
+                    domain_comment, domain_updated, now)
+
+                # adds the domain to the domain queue with its priority class
+                self._queued_domain_request_queue.put(
+                    (request_ids[domain_id], domain, priority))
+
+                queued += 1
+
+                self._log.info('Domain successfully added to the queue: {}'
+                    .format(domain))
+
+        except Exception:
+
+            # allows the domains which have not been queued to be queued again
+            self._in_flight_index.remove_many(
+                [domain for domain, entry in entries[queued:]])
+
+            raise
+
+    ############################################################################
+
+    def _add_domains(self, domains):
+        """
+        Method to add resolvable domains to the database with a single query
+        and to the queue.
+
+        @param domains: the resolved domains
+        """
+
+        # creates the new domain entries, entries created meanwhile are kept
+        self._db.insert_many_data('''
+            INSERT INTO domains (name)
+            VALUES(%s)
+            ON DUPLICATE KEY UPDATE name = name''',
+            [(domain,) for domain in domains])
+
+        # gets the domain entries
+        result = self._db.select_data('''
+            SELECT name, id, state, comment, updated
+            FROM domains
+            WHERE name IN ({})'''.format(', '.join(['%s'] * len(domains))),
+            domains)
+
+        # creates the requests and caches the verdicts of the domain entries
+        self._add_requests([(row[0], tuple(row[1:]) + (None,)) \
+            for row in result], Priority.RATING)
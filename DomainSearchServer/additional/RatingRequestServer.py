@@ -17,12 +17,32 @@ Messages:
             }
         }
 
+    Client -> RatingRequestServer: several domains at once
+
+        "request": {
+            "ratings": {
+                "domains": ["example.com", ...]
+            }
+        }
+
     RatingRequestServer -> Client: invalid request
 
         "response": {
             "msg": "invalid request"
         }
 
+    RatingRequestServer -> Client: recently found unresolvable domain
+
+        "response": {
+            "msg": "invalid domain"
+        }
+
+    RatingRequestServer -> Client: domain of an unreachable shard
+
+        "response": {
+            "msg": "shard unavailable"
+        }
+
     RatingRequestServer -> Client: permitted request
 
         "response": {
@@ -42,25 +62,58 @@ Messages:
             }
         }
 
+    RatingRequestServer -> Client: verdicts in the order of the domains
+
+        "response": {
+            "ratings": [
+                {
+                    "domain": "example.com",
+                    "access": "permitted"
+                },
+                {
+                    "domain": "example.org",
+                    "access": "denied",
+                    "comment": "reason for the denial"
+                },
+                {
+                    "domain": "example.invalid",
+                    "msg": "invalid domain"
+                },
+                ...
+            ]
+        }
+
+    Unknown domains are permitted and resolved in the background. Resolvable
+    domains are added to the database and to the queue afterwards.
+
+    If the server is a shard, the domains of other shards are rated by the
+    owning shards and the responses are merged. Requests forwarded by another
+    shard carry the flag "forwarded" (see ShardRouter). The domains of an
+    unreachable shard are not queued by another shard.
+
 ################################################################################
 
 Queue structur:
 
-    queued_domain_request_queue = (request_id, domain)
+    queued_domain_request_queue = (request_id, domain, priority)
 
         request_id = int
         domain = str
+        priority = int (see additional.Priority)
+
+    Domains of rating requests are queued with the highest priority class,
+    expired domains with the priority class of rescans.
 
 ################################################################################
 """
 
-import json
-import socket
+import time
 import socketserver
-from datetime import datetime
 
-from additional import Config
 from additional.Logging import Logging
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
+from additional.Protocol import send_message
 
 ################################################################################
 
@@ -72,10 +125,15 @@ class RatingRequestServer(BasicThreadedTCPServer):
     # if the server stops/starts quickly, don't fail because of "port in use"
     allow_reuse_address = True
 
+    # clients and other shards keep their connections open, so the server
+    # must not wait for their handlers on shutdown
+    daemon_threads = True
+    block_on_close = False
+
     def __init__(self, addr, handler, arguments):
 
-        self.db = arguments[0]
-        self.queued_domain_request_queue = arguments[1]
+        self.rating = arguments[0]
+        self.metrics = arguments[1]
 
         self.log = Logging(self.__class__.__name__).get_logger()
 
@@ -85,184 +143,63 @@ class RatingRequestServer(BasicThreadedTCPServer):
 
 class RatingRequestHandler(socketserver.BaseRequestHandler):
     """
-    This class searches for an existing and valid entry for the given domain in
-    the database and responds it if one was found. If no entry was found, one
-    will be created and added to the queue.
+    This class responds the verdict for every requested domain of a client.
     """
 
     def handle(self):
         """
-        Method to handle the request.
+        Method to handle the requests of a client.
         """
 
-        try:
-
-            data = self.request.recv(1024).decode('UTF-8').strip()
-            message = json.loads(data)
-
-            # validates message
-            if 'request' not in message and \
-                'rating' not in message['request'] and \
-                'domain' not in message['request']['rating']:
-
-                raise ValueError
-
-            domain = message['request']['rating']['domain']
-            domain = domain.lower().strip()
-
-        except ValueError:
-
-            self.server.log.error('Invalid message: {}'.format(data))
-
-            self.request.sendall(bytes(json.dumps({
-                'response': {
-                    'msg': 'invalid request'
-                }
-            }), 'UTF-8'))
-
-            return
-
-        except (ConnectionAbortedError, ConnectionResetError,
-            ConnectionRefusedError):
-
-            self.server.log.error('Connection aborted: {}'
-                .format(self.client_address))
-
-            return
+        reader = MessageReader(self.request)
 
-        ########################################################################
+        while 1:
 
-        self.server.log.info('Received rating request: {}'.format(domain))
+            try:
 
-        ########################################################################
+                message = reader.read_message()
 
-        try:
-
-            socket.getaddrinfo(domain, None, family=socket.AF_INET,
-                proto=socket.IPPROTO_TCP)
-
-        except socket.gaierror:
-
-            self.server.log.error('Invalid domain: {}'.format(domain))
-
-            self.request.sendall(bytes(json.dumps({
-                'response': {
-                    'msg': 'invalid domain'
-                }
-            }), 'UTF-8'))
-
-            return
-
-        ########################################################################
-
-        # checks if the domain already exists in the database
-        result = self.server.db.select_data('''
-            SELECT id, state, comment, datetime
-            FROM domains
-            WHERE name = %s''', (domain,))
-
-        ########################################################################
-
-        if result: # domain found
-
-            domain_id = result[0][0]
-            domain_state = result[0][1]
-            domain_comment = result[0][2]
-            domain_updated = result[0][3]
-
-            ####################################################################
-
-            # checks the state of the domain entry
-
-            if domain_state == 'permitted':
+                # detects closed connection
+                if message is None:
+                    return
 
-                # sends a response to permit the domain
-                self.request.sendall(bytes(json.dumps({
-                    'response': {
-                        'rating': {
-                            'domain': domain,
-                            'access': 'permitted'
-                        }
-                    }
-                }), 'UTF-8'))
+                # validates message
+                domains, batch, forwarded = \
+                    self.server.rating.parse_request(message)
 
-            ####################################################################
+            except MessageError as error:
 
-            else:
+                self.server.log.error('Invalid message: {}'.format(error.data))
 
-                # sends a response to deny the domain with a comment
-                self.request.sendall(bytes(json.dumps({
+                send_message(self.request, {
                     'response': {
-                        'rating': {
-                            'domain': domain,
-                            'access': 'denied',
-                            'comment': domain_comment
-                        }
+                        'msg': 'invalid request'
                     }
-                }), 'UTF-8'))
+                })
 
-            ####################################################################
+                return
 
-            # checks if the domain entry is expired
+            except (ConnectionAbortedError, ConnectionResetError,
+                ConnectionRefusedError):
 
-            timedelta = datetime.now() - domain_updated
+                self.server.log.error('Connection aborted: {}'
+                    .format(self.client_address))
 
-            if timedelta.days < Config.domain_expiration_time:
                 return
 
             ####################################################################
 
-            # gets the most recently request of the domain from the database
-            result = self.server.db.select_data('''
-                SELECT created
-                FROM requests
-                WHERE domain_id = %s
-                ORDER BY id DESC
-                LIMIT 1''', (domain_id,))
+            self.server.log.info('Received rating request: {}'.format(domains))
 
             ####################################################################
 
-            if result: # request found
-
-                request_created = result[0][0]
-
-                ################################################################
-
-                # checks if the request entry is expired
-
-                timedelta = datetime.now() - request_created
-
-                if timedelta.days < Config.request_expiration_time:
-                    return
-
-        ########################################################################
-
-        else: # domain not found
-
-            # sends a response to permit the domain
-            self.request.sendall(bytes(json.dumps({
-                'response': {
-                    'rating': {
-                        'domain': domain,
-                        'access': 'permitted'
-                    }
-                }
-            }), 'UTF-8'))
-
-            # creates a new domain entry
-            domain_id = self.server.db.insert_data('''
-                INSERT INTO domains (name)
-                VALUES(%s)''', (domain,))
-
-        ########################################################################
+            started = time.monotonic()
 
-        # creates a new request entry
-        request_id = self.server.db.insert_data('''
-            INSERT INTO requests (domain_id)
-            VALUES(%s)''', (domain_id,))
+            response = self.server.rating.respond(domains, batch, forwarded)
 
-        # adds the domain to the domain queue with a priority
-        self.server.queued_domain_request_queue.put((request_id, domain))
+            self.server.metrics.increment('requests', role='rating')
+            self.server.metrics.increment('rated_domains', len(domains))
+            self.server.metrics.observe('rating', time.monotonic() - started)
 
-        self.server.log.info('Domain successfully added to the queue: {}'
-            .format(domain))
+            # sends the verdicts of the domains
+            send_message(self.request, response)
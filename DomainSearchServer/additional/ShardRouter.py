@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+"""
+The ShardRouter forwards rating requests to the shard owning a domain.
+"""
+
+"""
+################################################################################
+
+Messages:
+
+    ShardRouter -> RatingRequestServer of the owning shard:
+
+        "request": {
+            "ratings": {
+                "domains": ["example.com", ...]
+            },
+            "forwarded": true
+        }
+
+    A forwarded request is always rated by the receiving shard, so a request
+    is forwarded at most once, even if the shards disagree about the owner.
+
+################################################################################
+"""
+
+import queue
+import socket
+import threading
+import collections
+
+from additional import Config
+from additional.Logging import Logging
+from additional.HashRing import HashRing
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
+from additional.Protocol import send_message
+
+################################################################################
+
+class ShardRouter:
+    """
+    This class splits the domain space among the shards by consistent hashing
+    of the domain names. Rating requests for domains of other shards are
+    forwarded to their rating-request servers over persistent connections, so
+    every domain is cached, queued and scanned by its own shard only.
+    """
+
+    def __init__(self, shard_name, shards):
+        """
+        @param shard_name: the name of this shard
+        @param shards:     the configuration of every shard by its name
+        """
+
+        self._shard_name = shard_name
+
+        self._hash_ring = HashRing(shards, Config.hash_ring_replicas)
+
+        # address of the rating-request server of every shard
+        self._addresses = {}
+
+        for name, shard in shards.items():
+
+            address = shard['rating_request_server']
+
+            self._addresses[name] = (address['host'] or 'localhost',
+                address['port'])
+
+        # idle connections (sock, reader) of every shard
+        self._connections = collections.defaultdict(queue.LifoQueue)
+        self._connections_lock = threading.Lock()
+
+        self._log = Logging(self.__class__.__name__).get_logger()
+
+    ############################################################################
+
+    def get_owner(self, domain):
+        """
+        Method to get the shard owning a domain.
+
+        @param domain: the domain
+
+        @return: the name of the owning shard
+        """
+
+        return self._hash_ring.get_node(domain)
+
+    ############################################################################
+
+    def is_local(self, domain):
+        """
+        Method to check if a domain belongs to this shard.
+
+        @param domain: the domain to check
+
+        @return: True if the domain belongs to this shard, False otherwise
+        """
+
+        return self.get_owner(domain) == self._shard_name
+
+    ############################################################################
+
+    def split(self, domains):
+        """
+        Method to group the domains of other shards by their owner.
+
+        @param domains: the domains to group
+
+        @return: dictionary of lists of domains by the name of the shard,
+                 without the domains of this shard
+        """
+
+        owners = collections.defaultdict(list)
+
+        for domain in domains:
+
+            owner = self.get_owner(domain)
+
+            if owner != self._shard_name:
+                owners[owner].append(domain)
+
+        return owners
+
+    ############################################################################
+
+    def forward(self, shard_name, domains):
+        """
+        Method to get the ratings of domains from the shard owning them.
+
+        @param shard_name: the name of the owning shard
+        @param domains:    the domains to rate
+
+        @return: list of ratings in the order of the domains or None if the
+                 shard is not reachable
+        """
+
+        connection = None
+
+        try:
+
+            connection = self._acquire(shard_name)
+
+            sock, reader = connection
+
+            send_message(sock, {
+                'request': {
+                    'ratings': {
+                        'domains': domains
+                    },
+                    'forwarded': True
+                }
+            })
+
+            message = reader.read_message()
+
+            if message is None:
+                raise ConnectionAbortedError
+
+            ratings = message['response']['ratings']
+
+            if len(ratings) != len(domains):
+                raise MessageError(str(message))
+
+        except (OSError, MessageError, KeyError, TypeError) as e:
+
+            self._log.error('Forwarding to shard {} failed: {}'
+                .format(shard_name, e))
+
+            if connection:
+                connection[0].close()
+
+            return None
+
+        self._release(shard_name, connection)
+
+        return ratings
+
+    ############################################################################
+
+    def close(self):
+        """
+        Method to close all idle connections.
+        """
+
+        with self._connections_lock:
+
+            for connections in self._connections.values():
+
+                while 1:
+
+                    try:
+                        sock, reader = connections.get_nowait()
+
+                    except queue.Empty:
+                        break
+
+                    sock.close()
+
+    ############################################################################
+
+    def _acquire(self, shard_name):
+        """
+        Method to get an idle connection to a shard or to open a new one.
+
+        @param shard_name: the name of the shard
+
+        @return: (sock, reader)
+        """
+
+        with self._connections_lock:
+            connections = self._connections[shard_name]
+
+        try:
+            return connections.get_nowait()
+
+        except queue.Empty:
+
+            sock = socket.create_connection(self._addresses[shard_name],
+                Config.shard_forward_timeout)
+
+            return (sock, MessageReader(sock))
+
+    ############################################################################
+
+    def _release(self, shard_name, connection):
+        """
+        Method to keep a connection for further requests.
+
+        @param shard_name: the name of the shard
+        @param connection: (sock, reader)
+        """
+
+        with self._connections_lock:
+            self._connections[shard_name].put(connection)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+The StatsServer handles incoming requests for the metrics of the server.
+"""
+
+"""
+################################################################################
+
+Requests:
+
+    The server speaks HTTP, so the metrics can be scraped by Prometheus or be
+    fetched with any HTTP client.
+
+    GET /metrics -> metrics in the Prometheus text format
+
+    GET /stats   -> metrics as JSON
+
+        {
+            "uptime": 3600.0,
+            "counters": [
+                {
+                    "name": "requests",
+                    "labels": {"role": "rating"},
+                    "value": 42
+                },
+                ...
+            ],
+            "latencies": [
+                {
+                    "name": "rating",
+                    "labels": {},
+                    "count": 42,
+                    "sum": 0.42,
+                    "p50": 0.008,
+                    "p99": 0.05
+                },
+                ...
+            ],
+            "gauges": {
+                "queued_domains": [[1500000000.0, 17], ...],
+                ...
+            }
+        }
+
+################################################################################
+"""
+
+import json
+import http.server
+import socketserver
+
+from additional.Logging import Logging
+
+################################################################################
+
+class BasicThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    pass
+
+class StatsServer(BasicThreadedTCPServer):
+
+    # if the server stops/starts quickly, don't fail because of "port in use"
+    allow_reuse_address = True
+
+    daemon_threads = True
+
+    def __init__(self, addr, handler, arguments):
+
+        self.metrics = arguments[0]
+
+        self.log = Logging(self.__class__.__name__).get_logger()
+
+        BasicThreadedTCPServer.__init__(self, addr, handler)
+
+################################################################################
+
+class StatsHandler(http.server.BaseHTTPRequestHandler):
+    """
+    This class responds the metrics of the server in the requested format.
+    """
+
+    def do_GET(self):
+        """
+        Method to handle a GET request.
+        """
+
+        path = self.path.split('?', 1)[0]
+
+        if path == '/metrics':
+
+            body = self.server.metrics.get_prometheus()
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+        elif path == '/stats':
+
+            body = json.dumps(self.server.metrics.get_stats())
+            content_type = 'application/json'
+
+        else:
+
+            self.send_error(404)
+
+            return
+
+        body = body.encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    ############################################################################
+
+    def log_message(self, format, *args):
+        """
+        Method to log the requests with the logger of the server.
+        """
+
+        self.server.log.debug('{}: {}'.format(
+            self.client_address[0], format % args))
@@ -41,6 +41,31 @@ Messages:
             }
         }
 
+    DomainSearchScanner -> TaskNotificationServer: scans finished
+
+        "notification": {
+            "scans": [
+                {
+                    "domain": "example.com",
+                    "request_id": 1
+                },
+                ...
+            ]
+        }
+
+    DomainSearchReviewer -> TaskNotificationServer: reviews finished
+
+        "notification": {
+            "reviews": [
+                {
+                    "domain": "example.com",
+                    "request_id": 1,
+                    "access": "permitted"
+                },
+                ...
+            ]
+        }
+
 ################################################################################
 
 Queue structur:
@@ -57,6 +82,8 @@ import json
 import socketserver
 
 from additional.Logging import Logging
+from additional.Protocol import MessageReader
+from additional.Protocol import MessageError
 
 ################################################################################
 
@@ -72,6 +99,9 @@ class TaskNotificationServer(BasicThreadedTCPServer):
 
         self.db = arguments[0]
         self.scanned_domain_request_queue = arguments[1]
+        self.verdict_cache = arguments[2]
+        self.in_flight_index = arguments[3]
+        self.metrics = arguments[4]
 
         self.log = Logging(self.__class__.__name__).get_logger()
 
@@ -88,111 +118,179 @@ class TaskNotificationHandler(socketserver.BaseRequestHandler):
 
     def handle(self):
         """
-        Method to handle the request.
+        Method to handle the request. A client may send several notifications
+        over one connection.
         """
 
-        try:
+        reader = MessageReader(self.request)
 
-            data = self.request.recv(1024).decode('UTF-8').strip()
-            message = json.loads(data)
+        while 1:
 
-            # accepts only valid messages containing a notification
-            if 'notification' not in message:
-                raise ValueError
+            try:
 
-            message = message['notification']
+                message = reader.read_message()
 
-        except ValueError:
+                # detects closed connection
+                if message is None:
+                    return
 
-            self.server.log.error('Invalid message: {}'.format(data))
+                # accepts only valid messages containing a notification
+                if not isinstance(message.get('notification'), dict):
+                    raise MessageError(json.dumps(message))
 
-            return
+                message = message['notification']
 
-        except (ConnectionAbortedError, ConnectionResetError,
-            ConnectionRefusedError):
+            except MessageError as error:
 
-            self.server.log.error('Connection aborted: {}'
-                .format(self.client_address))
+                self.server.log.error('Invalid message: {}'.format(error.data))
 
-            return
+                return
 
-        ########################################################################
+            except (ConnectionAbortedError, ConnectionResetError,
+                ConnectionRefusedError):
 
-        self.server.log.info('Received task-done notification: {}'
-            .format(message))
+                self.server.log.error('Connection aborted: {}'
+                    .format(self.client_address))
 
-        ########################################################################
+                return
 
-        # checks if message is a finished scan task
+            ####################################################################
 
-        if 'scan' in message and \
-            'domain' in message['scan'] and \
-            'request_id' in message['scan']:
+            self.server.log.info('Received task-done notification: {}'
+                .format(message))
 
-            message = message['scan']
-            domain = message['domain']
-            request_id = message['request_id']
+            self.server.metrics.increment('requests', role='task_notification')
 
-            # validates task in database
-            if not self.server.db.is_request_valid(request_id, domain):
+            ####################################################################
 
-                self.server.log.error('Invalid request: {}'.format(message))
+            # checks if message is a batch of finished scan tasks
 
-                return
+            if isinstance(message.get('scans'), list):
 
-            # updates the request entry
-            self.server.db.update_data('''
-                UPDATE requests
-                SET state = 'scanned',
-                    comment = ''
-                WHERE id = %s''', (request_id,))
+                for scan in message['scans']:
+                    self._handle_scan(scan)
 
-            # adds the domain to the scanned domain request queue
-            self.server.scanned_domain_request_queue.put((request_id, domain))
+            # checks if message is a batch of finished review tasks
 
-        ########################################################################
+            elif isinstance(message.get('reviews'), list):
 
-        # checks if message is a finished review task
+                for review in message['reviews']:
+                    self._handle_review(review)
 
-        elif 'review' in message and \
-            'domain' in message['review'] and \
-            'request_id' in message['review'] and \
-            'access' in message['review']:
+            # checks if message is a finished scan task
 
-            message = message['review']
-            domain = message['domain']
-            request_id = message['request_id']
-            access = message['access']
-            comment = message['comment'] if message['comment'] else ''
+            elif 'scan' in message:
+                self._handle_scan(message['scan'])
 
-            # validates task in database
-            if not self.server.db.is_request_valid(request_id, domain):
+            # checks if message is a finished review task
 
-                self.server.log.error('Invalid request: {}'.format(message))
+            elif 'review' in message:
+                self._handle_review(message['review'])
 
-                return
+            # reject invalid message
+
+            else:
 
-            # updates the request entry
-            self.server.db.update_data('''
-                UPDATE requests
-                SET state = %s,
-                    comment = %s
-                WHERE id = %s''',
-                (access, comment, request_id,))
+                self.server.log.error(
+                    'Received message is not a valid notification: {}'
+                    .format(message))
 
-            # updates the domain entry
-            self.server.db.update_data('''
-                UPDATE domains
-                SET state = %s,
-                    comment = %s
-                WHERE name = %s''', (access, comment, domain,))
+    ############################################################################
 
-        ########################################################################
+    def _handle_scan(self, message):
+        """
+        Method to handle a finished scan task.
 
-        # reject invalid message
+        @param message: the notification of the scan task
+        """
 
-        else:
+        if not (
+            isinstance(message, dict) and \
+            'domain' in message and \
+            'request_id' in message):
 
             self.server.log.error(
                 'Received message is not a valid notification: {}'
-                .format(data))
+                .format(message))
+
+            return
+
+        domain = message['domain']
+        request_id = message['request_id']
+
+        # validates task in database
+        if not self.server.db.is_request_valid(request_id, domain):
+
+            self.server.log.error('Invalid request: {}'.format(message))
+
+            return
+
+        # updates the request entry
+        self.server.db.update_data('''
+            UPDATE requests
+            SET state = 'scanned',
+                comment = ''
+            WHERE id = %s''', (request_id,))
+
+        # adds the domain to the scanned domain request queue
+        self.server.scanned_domain_request_queue.put((request_id, domain))
+
+        # allows the domain to be queued again
+        self.server.in_flight_index.remove(domain)
+
+        self.server.metrics.increment('scans_finished',
+            scanner=self.client_address[0])
+
+    ############################################################################
+
+    def _handle_review(self, message):
+        """
+        Method to handle a finished review task.
+
+        @param message: the notification of the review task
+        """
+
+        if not (
+            isinstance(message, dict) and \
+            'domain' in message and \
+            'request_id' in message and \
+            'access' in message):
+
+            self.server.log.error(
+                'Received message is not a valid notification: {}'
+                .format(message))
+
+            return
+
+        domain = message['domain']
+        request_id = message['request_id']
+        access = message['access']
+        comment = message.get('comment') or ''
+
+        # validates task in database
+        if not self.server.db.is_request_valid(request_id, domain):
+
+            self.server.log.error('Invalid request: {}'.format(message))
+
+            return
+
+        # updates the request entry
+        self.server.db.update_data('''
+            UPDATE requests
+            SET state = %s,
+                comment = %s
+            WHERE id = %s''',
+            (access, comment, request_id,))
+
+        # updates the domain entry
+        self.server.db.update_data('''
+            UPDATE domains
+            SET state = %s,
+                comment = %s
+            WHERE name = %s''', (access, comment, domain,))
+
+        # drops the outdated verdict of the domain
+        self.server.verdict_cache.invalidate(domain)
+
+        self.server.metrics.increment('reviews_finished',
+            reviewer=self.client_address[0])
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+The VerdictCache holds the most recently requested domain verdicts.
+"""
+
+"""
+################################################################################
+
+Cache structur:
+
+    entry = (domain_id, state, comment, updated, created, cached)
+
+        domain_id = int
+        state = str
+        comment = str
+        updated = datetime
+        created = datetime or None
+        cached = float
+
+################################################################################
+"""
+
+import time
+import threading
+import collections
+
+from additional import Config
+
+################################################################################
+
+class VerdictCache:
+    """
+    This class is a bounded least-recently-used cache which maps domains to
+    their verdict. Entries expire after a configurable time to live.
+    """
+
+    def __init__(self, size=None, ttl=None):
+
+        self._size = size if size is not None else Config.verdict_cache_size
+        self._ttl = ttl if ttl is not None else Config.verdict_cache_ttl
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    ############################################################################
+
+    def get(self, domain):
+        """
+        Method to get the cached verdict of a domain.
+
+        @param domain: the domain to look up
+
+        @return: (domain_id, state, comment, updated, created) or None
+        """
+
+        with self._lock:
+
+            entry = self._entries.get(domain)
+
+            if entry is None:
+                return None
+
+            # drops the entry if the time to live is exceeded
+            if time.monotonic() - entry[5] > self._ttl:
+
+                del self._entries[domain]
+
+                return None
+
+            self._entries.move_to_end(domain)
+
+            return entry[:5]
+
+    ############################################################################
+
+    def put(self, domain, domain_id, state, comment, updated, created):
+        """
+        Method to add or replace the verdict of a domain.
+
+        @param domain:    the domain of the verdict
+        @param domain_id: the id of the domain entry
+        @param state:     the state of the domain entry
+        @param comment:   the comment of the domain entry
+        @param updated:   the last update of the domain entry
+        @param created:   the creation of the most recent request entry
+        """
+
+        if self._size <= 0:
+            return
+
+        with self._lock:
+
+            self._entries[domain] = (
+                domain_id, state, comment, updated, created, time.monotonic())
+
+            self._entries.move_to_end(domain)
+
+            # evicts the least recently used entries
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    ############################################################################
+
+    def invalidate(self, domain):
+        """
+        Method to remove the verdict of a domain from the cache.
+
+        @param domain: the domain to remove
+        """
+
+        with self._lock:
+            self._entries.pop(domain, None)
+
+    ############################################################################
+
+    def clear(self):
+        """
+        Method to remove all verdicts from the cache.
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    ############################################################################
+
+    def __len__(self):
+
+        with self._lock:
+            return len(self._entries)
@@ -16,4 +16,11 @@ database_connection = {
     'host': 'localhost',
     'db': 'domainSearch',
     'charset': 'utf8'
+}
+
+# parameter for the database connection pool
+database_pool = {
+    'min_size': 1,
+    'max_size': 10,
+    'health_check_interval': 30 # second(s)
 }
\ No newline at end of file